@@ -0,0 +1,5 @@
+"""Benchmarks of h5browse on synthetic HDF5 files.
+
+Run with `python -m benchmarks run` from the top of the source tree,
+see `python -m benchmarks --help`.
+"""
@@ -0,0 +1,180 @@
+# __main__.py --- 
+# 
+# Filename: __main__.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:30:24 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:30:24 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Command line of the benchmarks: 
+# 
+# python -m benchmarks generate synthetic.h5 -s 0.1
+# 
+# python -m benchmarks run -s 0.1 -o results.json
+# 
+# python -m benchmarks compare before.json after.json
+# 
+# python -m benchmarks startup --budget 0.45
+# 
+# `run` generates a synthetic file of the given scale in a temporary
+# directory unless one is given with -f, runs the benchmarks and
+# prints the latency percentiles, optionally saving everything as
+# JSON for `compare`.
+# 
+# `startup` measures the time from launching h5browse to its window
+# being shown in fresh processes (see startup.py) and exits with
+# status 1 if the median is over the budget or if a module meant to
+# be loaded on first use was imported.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+
+# No window is shown, do not require a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from benchmarks import synthetic
+from benchmarks import harness
+
+
+def run(args):
+    from pyqtgraph import QtGui
+    from benchmarks import suite
+    app = QtGui.QApplication.instance() or QtGui.QApplication([])
+    tmpdir = None
+    path = args.file
+    if path is None:
+        tmpdir = tempfile.mkdtemp(prefix='h5browse-bench')
+        path = os.path.join(tmpdir, 'synthetic.h5')
+        print('Generating {} at scale {}'.format(path, args.scale))
+        synthetic.generate(path, args.scale, args.seed, args.compression)
+    results = {}
+    try:
+        for name, setup in suite.benchmarks.items():
+            if args.only and not re.search(args.only, name):
+                continue
+            results[name] = result = harness.measure(
+                lambda: setup(path, args.count))
+            print('{:28s} n={:4d} p50={:.3g}s p90={:.3g}s p99={:.3g}s peak={:.3g}MB'.format(
+                name, result['count'], result.get('p50', 0), result.get('p90', 0),
+                result.get('p99', 0), result['peakBytes'] / 1e6))
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+    if args.output:
+        meta = harness.metadata(file=args.file, scale=args.scale, seed=args.seed,
+                                compression=args.compression, count=args.count)
+        harness.save(args.output, meta, results)
+    return 0
+
+
+def startupCheck(args):
+    from benchmarks import startup
+    budget = startup.budget if args.budget is None else args.budget
+    summary, problems = startup.check(args.count, budget)
+    for key in ('total', 'import', 'window'):
+        print('{:8s} median={:.3f}s max={:.3f}s'.format(
+            key, summary[key]['median'], summary[key]['max']))
+    for problem in problems:
+        print('FAIL:', problem)
+    if args.output:
+        meta = harness.metadata(count=args.count, budget=budget)
+        harness.save(args.output, meta, {'startup': summary})
+    return 1 if len(problems) > 0 else 0
+
+
+def compare(args):
+    for line in harness.compare(harness.load(args.old), harness.load(args.new), args.key):
+        print(line)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks of h5browse')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    generate = commands.add_parser('generate', add_help=False,
+                                   help='generate a synthetic file')
+    generate.add_argument('args', nargs=argparse.REMAINDER)
+    runner = commands.add_parser('run', help='run the benchmarks')
+    runner.add_argument('-f', '--file', default=None,
+                        help='synthetic file to use instead of generating one')
+    runner.add_argument('-s', '--scale', type=float, default=0.05,
+                        help='scale of the generated file')
+    runner.add_argument('--seed', type=int, default=0)
+    runner.add_argument('-c', '--compression', default=None,
+                        help='filter for the large datasets of the generated file')
+    runner.add_argument('-n', '--count', type=int, default=50,
+                        help='number of operations per benchmark')
+    runner.add_argument('-k', '--only', default=None,
+                        help='run only the benchmarks matching this regular expression')
+    runner.add_argument('-o', '--output', default=None,
+                        help='save results to this JSON file')
+    starter = commands.add_parser('startup', help='check the startup time')
+    starter.add_argument('-n', '--count', type=int, default=5,
+                         help='number of launches')
+    starter.add_argument('--budget', type=float, default=None,
+                         help='seconds to the window being shown (default: startup.budget)')
+    starter.add_argument('-o', '--output', default=None,
+                         help='save results to this JSON file')
+    comparer = commands.add_parser('compare', help='compare two results files')
+    comparer.add_argument('old')
+    comparer.add_argument('new')
+    comparer.add_argument('--key', default='p50',
+                          help='statistic to compare (default: p50)')
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        return synthetic.main(args.args)
+    elif args.command == 'run':
+        return run(args)
+    elif args.command == 'startup':
+        return startupCheck(args)
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# __main__.py ends here
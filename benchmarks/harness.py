@@ -0,0 +1,194 @@
+# harness.py --- 
+# 
+# Filename: harness.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:30:24 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:30:24 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Timing and memory measurement for the benchmarks, and the results
+# file format.
+# 
+# A benchmark sets up what it needs and returns a list of callables,
+# each one an operation to time (for example filling one viewport of
+# a table), with an optional cleanup. Each operation is timed
+# separately, so that the percentiles show the latency a user sees,
+# not just the average. The peak of Python heap allocations (numpy
+# buffers included) is measured with tracemalloc over the whole
+# benchmark, the process maximum resident set size is reported as
+# well.
+# 
+# Results are written as JSON: metadata identifying the revision and
+# environment, and one entry per benchmark with the number of
+# operations, total, mean, min, max and percentiles of the latency in
+# seconds and the peak memory in bytes.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Latency percentiles and peak memory of benchmark operations"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+
+percentiles = [50, 90, 99]
+
+
+def maxRSS():
+    """Maximum resident set size of this process in bytes, None if not
+    available"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def summarize(latencies):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    ret = {'count': int(len(latencies)),
+           'total': float(latencies.sum()),
+           'mean': float(latencies.mean()),
+           'min': float(latencies.min()),
+           'max': float(latencies.max())}
+    for pp in percentiles:
+        ret['p{}'.format(pp)] = float(np.percentile(latencies, pp))
+    return ret
+
+
+def measure(setup):
+    """Run the operations returned by `setup()`, timing each.
+
+    `setup` returns a list of callables, or a pair of such a list and
+    a callable to clean up after them. The setup itself is timed on
+    its own and reported as `setup`. Returns the summary of the
+    operation latencies.
+
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        operations = setup()
+        setupTime = time.perf_counter() - start
+        cleanup = None
+        if isinstance(operations, tuple):
+            operations, cleanup = operations
+        latencies = []
+        try:
+            for operation in operations:
+                start = time.perf_counter()
+                operation()
+                latencies.append(time.perf_counter() - start)
+        finally:
+            if cleanup is not None:
+                cleanup()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    ret = summarize(latencies) if latencies else {'count': 0}
+    ret['setup'] = setupTime
+    ret['peakBytes'] = int(peak)
+    ret['maxRSS'] = maxRSS()
+    return ret
+
+
+def revision():
+    """Git revision of the source tree, None outside a git checkout"""
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+def metadata(**extra):
+    import h5py as h5
+    import pyqtgraph as pg
+    from pyqtgraph import QtCore
+    ret = {'revision': revision(),
+           'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+           'python': platform.python_version(),
+           'platform': platform.platform(),
+           'numpy': np.__version__,
+           'h5py': h5.version.version,
+           'hdf5': h5.version.hdf5_version,
+           'pyqtgraph': pg.__version__,
+           'qt': QtCore.QT_VERSION_STR}
+    ret.update(extra)
+    return ret
+
+
+def save(path, meta, results):
+    with open(path, 'w') as out:
+        json.dump({'meta': meta, 'results': results}, out, indent=1, sort_keys=True)
+
+
+def load(path):
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def compare(old, new, key='p50'):
+    """Lines comparing statistic `key` of the benchmarks in results
+    `old` and `new` (as loaded by `load`)"""
+    lines = ['{:40s} {:>12s} {:>12s} {:>8s}'.format('benchmark', 'old', 'new', 'ratio')]
+    for name in sorted(set(old['results']) | set(new['results'])):
+        before = old['results'].get(name, {}).get(key)
+        after = new['results'].get(name, {}).get(key)
+        ratio = after / before if before and after is not None else float('nan')
+        lines.append('{:40s} {:>12} {:>12} {:8.2f}'.format(
+            name, '-' if before is None else '{:.6g}'.format(before),
+            '-' if after is None else '{:.6g}'.format(after), ratio))
+    return lines
+
+
+# 
+# harness.py ends here
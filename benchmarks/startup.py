@@ -0,0 +1,136 @@
+# startup.py --- 
+# 
+# Filename: startup.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:38:14 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:38:14 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Cold start time of the browser: each run starts a fresh Python
+# process that imports h5browse, creates the main window and shows
+# it. The time from launching the process to the window being shown
+# is checked against `budget`, and the modules that should only be
+# loaded on first use (`deferred`) must not have been imported by
+# then.
+# 
+# With the lazy imports, the window is shown about 0.3 s into the
+# script (0.4 s when everything was imported upfront), about 0.36 s
+# after launch counting the interpreter. The budget leaves some room
+# for slower machines; raise it only with a reason.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Startup time of h5browse against a budget"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+
+
+# Seconds from process launch to the main window being shown
+budget = 0.45
+
+# Modules that must be imported on first use, not at startup
+deferred = ['pyqtgraph', 'datasetplot', 'imageview', 'statswidget',
+            'synstatwidget', 'nodedialogs', 'profilerwidget', 'exportdialog']
+
+sourceDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'h5browse')
+
+# Run in the child process. Times are from the start of the script.
+child = '''
+import sys
+import time
+import json
+start = time.perf_counter()
+sys.path.insert(0, {sourceDir!r})
+import h5browse
+from qtcompat import QtGui
+imported = time.perf_counter()
+app = QtGui.QApplication(sys.argv[:1])
+window = h5browse.DataViz()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'window': shown - imported,
+                  'modules': [name for name in {deferred!r} if name in sys.modules]}}))
+'''
+
+
+def measure():
+    """Start the browser once. Returns a dict with the total time to
+    the window being shown (`total`), the time for imports (`import`)
+    and for creating and showing the window (`window`) in seconds,
+    and the deferred modules found imported (`modules`)."""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    script = child.format(sourceDir=sourceDir, deferred=deferred)
+    start = time.perf_counter()
+    out = subprocess.check_output([sys.executable, '-c', script], env=env,
+                                  stderr=subprocess.DEVNULL)
+    # Includes interpreter startup and exit, which are small and
+    # roughly constant
+    ret = json.loads(out.decode().strip().splitlines()[-1])
+    ret['total'] = time.perf_counter() - start
+    return ret
+
+
+def check(count=5, limit=budget):
+    """Measure startup `count` times. Returns the summary (median and
+    maximum of each time, the deferred modules imported) and a list
+    of the problems found, empty if the median total is within
+    `limit` and no deferred module was imported."""
+    runs = [measure() for ii in range(count)]
+    summary = {}
+    for key in ('total', 'import', 'window'):
+        values = np.array([run[key] for run in runs])
+        summary[key] = {'median': float(np.median(values)), 'max': float(values.max())}
+    summary['budget'] = limit
+    summary['modules'] = sorted(set(name for run in runs for name in run['modules']))
+    problems = []
+    if summary['total']['median'] > limit:
+        problems.append('startup took {:.3f} s, budget is {:.3f} s'.format(
+            summary['total']['median'], limit))
+    if len(summary['modules']) > 0:
+        problems.append('imported at startup: {}'.format(', '.join(summary['modules'])))
+    return summary, problems
+
+
+# 
+# startup.py ends here
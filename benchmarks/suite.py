@@ -0,0 +1,261 @@
+# suite.py --- 
+# 
+# Filename: suite.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:30:24 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:30:24 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# The benchmarks: the tree, dataset and attribute models and the
+# data extraction of the plot parameter trees, run on a file made by
+# synthetic.generate. Nothing is shown, the views are emulated by
+# asking the models for the cells a view would display. A
+# QApplication is still needed for the parameter trees, run with
+# QT_QPA_PLATFORM=offscreen when there is no display (__main__ does
+# this).
+# 
+# Each benchmark is a function of (path, count) returning the
+# operations for harness.measure; `count` is the number of
+# operations to time. They are registered in `benchmarks` by name.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Benchmarks of the h5browse models"""
+
+import os
+import sys
+from collections import OrderedDict
+import numpy as np
+import h5py as h5
+
+# The h5browse modules import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'h5browse'))
+
+from pyqtgraph import QtCore
+
+import blockcache
+from hdftreemodel import HDFTreeModel
+from hdfdatasetmodel import (ScalarDatasetModel, OneDDatasetModel,
+                             CompoundDatasetModel, TwoDDatasetModel,
+                             NDDatasetModel)
+from hdfattributemodel import HDFAttributeModel
+from datasetplot import (OneDPlotParamTree, CompoundPlotParamTree,
+                         TwoDPlotParamTree, NDPlotParamTree)
+
+
+# Size of the emulated table view in cells
+viewRows = 40
+viewColumns = 12
+
+benchmarks = OrderedDict()
+
+
+def benchmark(name):
+    def register(function):
+        benchmarks[name] = function
+        return function
+    return register
+
+
+def openTree(path):
+    model = HDFTreeModel([])
+    model.openFile(path, 'r')
+    return model
+
+
+def closeTree(model):
+    while model.rowCount(QtCore.QModelIndex()) > 0:
+        model.closeFile(model.index(0, 0, QtCore.QModelIndex()))
+
+
+def childIndex(model, parent, name):
+    """Index of child `name` of `parent`, fetching children as needed"""
+    while True:
+        for row in range(model.rowCount(parent)):
+            index = model.index(row, 0, parent)
+            if model.data(index, QtCore.Qt.DisplayRole) == name:
+                return index
+        if not model.canFetchMore(parent):
+            raise KeyError(name)
+        model.fetchMore(parent)
+
+
+def nodeIndex(model, path):
+    index = model.index(0, 0, QtCore.QModelIndex())
+    for name in path.strip('/').split('/'):
+        index = childIndex(model, index, name)
+    return index
+
+
+def readView(model, row, column):
+    """Ask `model` for the cells a view scrolled to (row, column)
+    would show"""
+    rows = model.rowCount(None)
+    columns = model.columnCount(None)
+    for rr in range(row, min(row + viewRows, rows)):
+        for cc in range(column, min(column + viewColumns, columns)):
+            model.data(model.index(rr, cc), QtCore.Qt.DisplayRole)
+
+
+@benchmark('tree.open')
+def treeOpen(path, count):
+    """Open the file in a new tree model and list the top level"""
+    def operation():
+        model = openTree(path)
+        root = model.index(0, 0, QtCore.QModelIndex())
+        for row in range(model.rowCount(root)):
+            model.data(model.index(row, 0, root), QtCore.Qt.DisplayRole)
+        closeTree(model)
+    return [operation] * count
+
+
+@benchmark('tree.wide')
+def treeWide(path, count):
+    """Expand the group with many members, one batch per operation"""
+    model = openTree(path)
+    wide = nodeIndex(model, '/wide')
+
+    def operation():
+        first = model.rowCount(wide)
+        model.fetchMore(wide)
+        for row in range(first, model.rowCount(wide)):
+            index = model.index(row, 0, wide)
+            model.data(index, QtCore.Qt.DisplayRole)
+            model.hasChildren(index)
+    batches = -(-len(model.getItem(wide).h5node) // model.fetchBatch)
+    return [operation] * min(count, batches), lambda: closeTree(model)
+
+
+@benchmark('tree.deep')
+def treeDeep(path, count):
+    """Expand one level of the deep hierarchy per operation"""
+    model = openTree(path)
+    state = {'index': nodeIndex(model, '/deep')}
+
+    def operation():
+        parent = state['index']
+        model.fetchMore(parent)
+        state['index'] = model.index(0, 0, parent)
+        model.hasChildren(state['index'])
+    with h5.File(path, 'r') as fd:
+        levels = int(fd.attrs['deepLevels'])
+    return [operation] * min(count, levels), lambda: closeTree(model)
+
+
+def datasetModelBenchmark(modelClass, name, scroll):
+    def setup(path, count):
+        fd = h5.File(path, 'r')
+        blockcache.defaultCache.invalidate()
+        model = modelClass(fd[name])
+        rows = model.rowCount(None)
+        columns = model.columnCount(None)
+        rng = np.random.default_rng(0)
+        if scroll:
+            # Page down from the top, as when scrolling through
+            positions = [(min(ii * viewRows, max(rows - 1, 0)), 0) for ii in range(count)]
+        else:
+            positions = zip(rng.integers(0, max(rows, 1), count),
+                            rng.integers(0, max(columns, 1), count))
+        operations = [lambda row=int(row), column=int(column): readView(model, row, column)
+                      for row, column in positions]
+        return operations, fd.close
+    setup.__doc__ = 'Fill a view of {} at {} positions'.format(
+        name, 'successive' if scroll else 'random')
+    return setup
+
+
+for kind, modelClass, name in [('scalar', ScalarDatasetModel, '/data/scalar'),
+                               ('oned', OneDDatasetModel, '/data/oned'),
+                               ('twod', TwoDDatasetModel, '/data/twod'),
+                               ('nd', NDDatasetModel, '/data/threed'),
+                               ('compound', CompoundDatasetModel, '/data/table')]:
+    for scroll in (False, True):
+        benchmarks['model.{}.{}'.format(kind, 'scroll' if scroll else 'random')] = \
+            datasetModelBenchmark(modelClass, name, scroll)
+
+
+@benchmark('attributes')
+def attributes(path, count):
+    """Snapshot and display the attributes of one node per operation"""
+    fd = h5.File(path, 'r')
+    nodes = list(fd['/attributes'].values())
+
+    def operation(node):
+        model = HDFAttributeModel(node)
+        for row in range(model.rowCount(None)):
+            for column in range(model.columnCount(None)):
+                model.data(model.index(row, column), QtCore.Qt.DisplayRole)
+    operations = [lambda node=nodes[ii % len(nodes)]: operation(node)
+                  for ii in range(count)]
+    return operations, fd.close
+
+
+def plotBenchmark(treeClass, name, configure):
+    def setup(path, count):
+        fd = h5.File(path, 'r')
+        tree = treeClass(dataset=fd[name])
+        configure(tree)
+
+        def operation():
+            xdata, ydata = tree.getXY()
+            np.asarray(xdata)
+            np.asarray(ydata)
+        return [operation] * count, fd.close
+    setup.__doc__ = 'Extract plot data from {}'.format(name)
+    return setup
+
+
+def configureCompound(tree):
+    tree.xsource.setValue('x')
+    tree.ysource.setValue('y')
+
+
+def configureND(tree):
+    tree.dataDim.setValue(2)
+    tree.ysource.param('dim0').setValue(1)
+    tree.ysource.param('dim1').setValue(3)
+
+
+benchmarks['plot.oned'] = plotBenchmark(OneDPlotParamTree, '/data/oned', lambda tree: None)
+benchmarks['plot.compound'] = plotBenchmark(CompoundPlotParamTree, '/data/table',
+                                            configureCompound)
+benchmarks['plot.twod'] = plotBenchmark(TwoDPlotParamTree, '/data/twod', lambda tree: None)
+benchmarks['plot.nd'] = plotBenchmark(NDPlotParamTree, '/data/threed', configureND)
+
+
+# 
+# suite.py ends here
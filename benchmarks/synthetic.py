@@ -0,0 +1,196 @@
+# synthetic.py --- 
+# 
+# Filename: synthetic.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:30:24 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:30:24 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Generate HDF5 files with the kinds of structure that stress the
+# browser: groups with many members, deep hierarchies, large chunked
+# 1D, 2D and N-D datasets, large compound tables and nodes with many
+# attributes. Sizes scale linearly with `scale`; scale=1 gives a file
+# of about 1 GiB (uncompressed). The data are written in slabs so
+# that generating a large file does not need the memory for it.
+# 
+# The contents are pseudo-random with a fixed seed, so files
+# generated with the same parameters are identical.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Synthetic HDF5 workloads for benchmarking"""
+
+import sys
+import argparse
+import numpy as np
+import h5py as h5
+
+
+tableDtype = np.dtype([('id', np.int64),
+                       ('name', 'S16'),
+                       ('x', np.float64),
+                       ('y', np.float64),
+                       ('z', np.float32),
+                       ('flag', np.int8),
+                       ('count', np.uint32)])
+
+
+def layout(scale=1.0):
+    """Sizes of the parts of a synthetic file at `scale`.
+
+    The number of members and attributes grows with the square root
+    of the scale, as do the 2D and N-D sizes per dimension, so that
+    the data volume is roughly linear in `scale`.
+
+    """
+    root = np.sqrt(scale)
+    return {'wideMembers': max(10, int(5000 * root)),
+            'deepLevels': max(2, int(100 * root)),
+            'oned': max(1000, int(64 * 1024 * 1024 * scale)),
+            'twod': (max(100, int(8192 * root)), max(100, int(4096 * root))),
+            'threed': (16, max(32, int(1024 * root)), max(32, int(1024 * root))),
+            'tableRows': max(1000, int(2 * 1024 * 1024 * scale)),
+            'attributeNodes': max(2, int(50 * root)),
+            'attributesPerNode': max(10, int(500 * root))}
+
+
+def writeSlabs(dataset, fill, slabBytes=64*1024*1024):
+    """Fill `dataset` along the first dimension in slabs of about
+    `slabBytes`. `fill(start, stop)` returns the data for rows start
+    to stop."""
+    rowBytes = dataset.dtype.itemsize * int(np.prod(dataset.shape[1:]))
+    rows = max(1, slabBytes // max(rowBytes, 1))
+    for start in range(0, dataset.shape[0], rows):
+        stop = min(start + rows, dataset.shape[0])
+        dataset[start:stop] = fill(start, stop)
+
+
+def generate(path, scale=1.0, seed=0, compression=None):
+    """Create the synthetic file at `path` (overwriting it) and return
+    the layout used.
+
+    compression: filter for the large datasets, e.g. 'gzip'. None
+    leaves them uncompressed.
+
+    """
+    sizes = layout(scale)
+    rng = np.random.default_rng(seed)
+    with h5.File(path, 'w') as fd:
+        fd.attrs['scale'] = scale
+        fd.attrs['seed'] = seed
+        fd.attrs['deepLevels'] = sizes['deepLevels']
+        wide = fd.create_group('wide')
+        for ii in range(sizes['wideMembers']):
+            name = 'member_{:06d}'.format(ii)
+            if ii % 10 == 0:
+                wide.create_group(name)
+            else:
+                wide.create_dataset(name, data=rng.random(8))
+        node = fd.create_group('deep')
+        for ii in range(sizes['deepLevels']):
+            node = node.create_group('level_{}'.format(ii))
+            node.attrs['depth'] = ii
+        node.create_dataset('leaf', data=np.arange(100))
+        data = fd.create_group('data')
+        oned = data.create_dataset('oned', shape=(sizes['oned'],), dtype=np.float64,
+                                   chunks=(min(64 * 1024, sizes['oned']),), compression=compression)
+        writeSlabs(oned, lambda start, stop: np.sin(np.arange(start, stop) * 1e-4)
+                   + 0.1 * rng.standard_normal(stop - start))
+        twod = data.create_dataset('twod', shape=sizes['twod'], dtype=np.float32,
+                                   chunks=tuple(min(256, size) for size in sizes['twod']),
+                                   compression=compression)
+        writeSlabs(twod, lambda start, stop: rng.random(
+            (stop - start, sizes['twod'][1]), dtype=np.float32))
+        threed = data.create_dataset('threed', shape=sizes['threed'], dtype=np.float32,
+                                     chunks=(1,) + tuple(min(256, size) for size in sizes['threed'][1:]),
+                                     compression=compression)
+        writeSlabs(threed, lambda start, stop: rng.random(
+            (stop - start,) + sizes['threed'][1:], dtype=np.float32))
+        data.create_dataset('scalar', data=np.float64(scale))
+        table = data.create_dataset('table', shape=(sizes['tableRows'],),
+                                    dtype=tableDtype, chunks=(min(16 * 1024, sizes['tableRows']),),
+                                    compression=compression)
+
+        def tableRows(start, stop):
+            rows = np.zeros(stop - start, dtype=tableDtype)
+            rows['id'] = np.arange(start, stop)
+            rows['name'] = np.char.add(b'row_', np.arange(start, stop).astype('S10'))
+            rows['x'] = rng.standard_normal(stop - start)
+            rows['y'] = rng.standard_normal(stop - start)
+            rows['z'] = rng.random(stop - start)
+            rows['flag'] = rng.integers(0, 2, stop - start)
+            rows['count'] = rng.integers(0, 1000, stop - start)
+            return rows
+
+        writeSlabs(table, tableRows)
+        attrs = fd.create_group('attributes')
+        for ii in range(sizes['attributeNodes']):
+            node = attrs.create_group('node_{}'.format(ii))
+            for jj in range(sizes['attributesPerNode']):
+                kind = jj % 4
+                name = 'attr_{}'.format(jj)
+                if kind == 0:
+                    node.attrs[name] = jj
+                elif kind == 1:
+                    node.attrs[name] = rng.random()
+                elif kind == 2:
+                    node.attrs[name] = 'text value {}'.format(jj)
+                else:
+                    node.attrs[name] = rng.random(16)
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic HDF5 file')
+    parser.add_argument('path', help='output file, overwritten if it exists')
+    parser.add_argument('-s', '--scale', type=float, default=1.0,
+                        help='size relative to the default (about 1 GiB)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-c', '--compression', default=None,
+                        help='filter for the large datasets, e.g. gzip')
+    args = parser.parse_args(argv)
+    sizes = generate(args.path, args.scale, args.seed, args.compression)
+    for key, value in sizes.items():
+        print('{}: {}'.format(key, value))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# synthetic.py ends here
@@ -0,0 +1,244 @@
+# blockcache.py --- 
+# 
+# Filename: blockcache.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 15:59:03 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 15:59:03 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Reading a single element from an HDF5 dataset decompresses the
+# whole chunk containing it. The table views ask for one cell (and
+# one role) at a time, so without a cache the same chunk is read
+# over and over again while scrolling.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Chunk aligned block cache for HDF5 datasets"""
+
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+
+import profiler
+
+
+def datasetKey(dataset):
+    """Key identifying `dataset` in the cache.
+
+    Uses (filename, path) so that all the views on the same dataset
+    share the cached blocks.
+
+    """
+    return (dataset.file.filename, dataset.name)
+
+
+def computeBlockShape(shape, chunks, itemsize, targetBytes, dims=None):
+    """Compute the shape of blocks to be read from a dataset.
+
+    Starting from the chunk shape (or a single element for contiguous
+    datasets), the block is doubled along every dimension in `dims`
+    (all dimensions if None) until it holds at least
+    `targetBytes`. Thus each block covers a whole number of chunks and
+    a chunk is never split between two blocks.
+
+    """
+    if len(shape) == 0:
+        return ()
+    if chunks is None:
+        block = [1] * len(shape)
+    else:
+        block = list(chunks)
+    if dims is None:
+        dims = range(len(shape))
+    limit = [max(1, size) for size in shape]
+    block = [min(size, lim) for size, lim in zip(block, limit)]
+    while np.prod(block) * itemsize < targetBytes:
+        grown = [min(2 * size, lim) if dim in dims else size
+                 for dim, (size, lim) in enumerate(zip(block, limit))]
+        if grown == block:
+            break
+        block = grown
+    return tuple(block)
+
+
+class BlockCache(object):
+    """Byte-bounded LRU cache of dataset blocks.
+
+    Blocks are aligned to the chunk layout of the dataset (see
+    `computeBlockShape`). A block is identified by the key of the
+    dataset and its block index, i.e., the position of the block in
+    the grid of blocks over the dataset.
+
+    The cache may be filled from worker threads (see
+    `prefetch.BlockPrefetcher`). The lock only guards the bookkeeping,
+    blocks are read from the file outside it.
+
+    maxBytes: upper limit on the total size of cached blocks.
+
+    targetBytes: approximate size of a single block.
+
+    """
+    def __init__(self, maxBytes=256*1024*1024, targetBytes=512*1024):
+        super(BlockCache, self).__init__()
+        self.maxBytes = maxBytes
+        self.targetBytes = targetBytes
+        self.nbytes = 0
+        self.blocks = OrderedDict()
+        self.blockShapes = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def blockShape(self, dataset, key, dims=None):
+        """Block shape for `key`. It is computed on first call, with
+        blocks growing along `dims` (see computeBlockShape)."""
+        try:
+            return self.blockShapes[key]
+        except KeyError:
+            # Size blocks of resizable datasets by the maximum shape
+            # so that they do not stay small as the dataset grows
+            maxshape = dataset.maxshape
+            if maxshape is None:
+                maxshape = dataset.shape
+            limits = tuple(sys.maxsize if size is None else size
+                           for size in maxshape)
+            shape = computeBlockShape(limits, dataset.chunks,
+                                      dataset.dtype.itemsize,
+                                      self.targetBytes, dims=dims)
+            self.blockShapes[key] = shape
+            return shape
+
+    def blockIndex(self, dataset, key, index):
+        """Return the index of the block containing element at `index`
+        and the position of the element within that block."""
+        shape = self.blockShape(dataset, key)
+        block = tuple(ii // size for ii, size in zip(index, shape))
+        offset = tuple(ii % size for ii, size in zip(index, shape))
+        return block, offset
+
+    def blockSelection(self, dataset, key, block):
+        """Selection tuple for reading `block` from `dataset`"""
+        shape = self.blockShape(dataset, key)
+        return tuple(slice(bb * size, min((bb + 1) * size, dimsize))
+                     for bb, size, dimsize in zip(block, shape, dataset.shape))
+
+    def readBlock(self, dataset, key, block):
+        if len(block) == 0:
+            return np.asarray(profiler.read(dataset, ()))
+        return profiler.read(dataset, self.blockSelection(dataset, key, block))
+
+    def contains(self, key, block):
+        with self.lock:
+            return (key, block) in self.blocks
+
+    def peekBlock(self, key, block):
+        """Return cached `block` or None if it is not in the cache.
+
+        This never touches the file.
+
+        """
+        with self.lock:
+            try:
+                data = self.blocks[(key, block)]
+            except KeyError:
+                self.misses += 1
+                profiler.cacheAccess(key, False)
+                return None
+            self.blocks.move_to_end((key, block))
+            self.hits += 1
+        profiler.cacheAccess(key, True)
+        return data
+
+    def getBlock(self, dataset, key, block):
+        """Return cached `block` of `dataset`, reading it on a miss"""
+        data = self.peekBlock(key, block)
+        if data is None:
+            data = self.readBlock(dataset, key, block)
+            self.insert(key, block, data)
+        return data
+
+    def insert(self, key, block, data):
+        with self.lock:
+            old = self.blocks.pop((key, block), None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self.blocks[(key, block)] = data
+            self.nbytes += data.nbytes
+            # Always keep the latest block even if it alone exceeds the limit
+            while self.nbytes > self.maxBytes and len(self.blocks) > 1:
+                _, evicted = self.blocks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def getValue(self, dataset, key, index):
+        """Return the element at `index` (a tuple) of dataset"""
+        block, offset = self.blockIndex(dataset, key, index)
+        return self.getBlock(dataset, key, block)[offset]
+
+    def invalidateEdge(self, key):
+        """Drop the blocks of dataset `key` that were cut short by the
+        extent of the dataset. They are stale once the dataset has
+        grown."""
+        with self.lock:
+            shape = self.blockShapes.get(key)
+            for blockKey in list(self.blocks.keys()):
+                if blockKey[0] == key and self.blocks[blockKey].shape != shape:
+                    self.nbytes -= self.blocks.pop(blockKey).nbytes
+
+    def invalidate(self, key=None, filename=None):
+        """Drop cached blocks of dataset `key` or of all datasets in
+        `filename`. Drop everything if neither is specified."""
+        with self.lock:
+            if key is None and filename is None:
+                self.blocks.clear()
+                self.blockShapes.clear()
+                self.nbytes = 0
+                return
+            for blockKey in list(self.blocks.keys()):
+                dkey = blockKey[0]
+                if dkey == key or (filename is not None and dkey[0] == filename):
+                    self.nbytes -= self.blocks.pop(blockKey).nbytes
+            for dkey in list(self.blockShapes.keys()):
+                if dkey == key or (filename is not None and dkey[0] == filename):
+                    self.blockShapes.pop(dkey)
+
+
+# Cache shared by all the dataset models
+defaultCache = BlockCache()
+
+
+# 
+# blockcache.py ends here
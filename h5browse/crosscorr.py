@@ -0,0 +1,380 @@
+# crosscorr.py --- 
+# 
+# Filename: crosscorr.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:23:35 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:23:35 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Pairwise cross-correlograms of the spike trains under /spikes, for
+# inferring connectivity.
+# 
+# The spike trains are binned and the correlogram of cells i and j at
+# lag k is the number of spike pairs with the spike of j k bins after
+# that of i. It is computed for all lags at once from the cross
+# spectrum conj(F_i) * F_j, summed over short segments of the trains
+# (see correlograms).
+# 
+# The N x N pairs are cut into tiles of blockSize x blockSize cells.
+# Only tiles on or above the diagonal are computed, the one below is
+# the transpose with reversed lags. The tiles are computed on a pool
+# of worker processes, each reading the spike trains of its cells
+# from the file, and written into a chunked, compressed dataset as
+# they come in. blockSize is chosen so that a tile fits in
+# `maxBytes`, and the number of tiles in flight is limited, so that
+# memory use does not grow with the number of cells.
+# 
+# The result is an N x N x lags dataset which can be looked at in the
+# browser: as an image of the cell pairs at a given lag, or as the
+# correlogram of a single pair in a plot.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""FFT based pairwise cross-correlograms of spike trains"""
+
+import os
+import sys
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import h5py as h5
+
+import spikerate
+
+
+def fastLength(n):
+    """Smallest integer >= n with no prime factor larger than 5, for
+    which the FFT is fast"""
+    best = 1
+    while best < n:
+        best *= 2
+    power5 = 1
+    while power5 < best:
+        power3 = power5
+        while power3 < best:
+            length = power3
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power3 *= 3
+        power5 *= 5
+    return best
+
+
+def binTrains(spikes, lengths, start, end, binsize):
+    """Bin the spike trains concatenated in `spikes`, `lengths` giving
+    the number of spikes in each train. Spikes outside [start, end)
+    are dropped. Returns a (trains, bins) array of spike counts."""
+    bins = int(np.ceil((end - start) / binsize))
+    cell = np.repeat(np.arange(len(lengths)), lengths)
+    index = np.floor((spikes - start) / binsize).astype(np.int64)
+    valid = (spikes >= start) & (spikes < end) & (index < bins)
+    counts = np.bincount(cell[valid] * bins + index[valid],
+                         minlength=len(lengths) * bins)
+    return counts.reshape(len(lengths), bins).astype(np.float64)
+
+
+def segmentLength(maxlag):
+    """Length of the segments the trains are cut into for
+    `correlograms`, about 4 * maxlag with a fast FFT length"""
+    return fastLength(6 * maxlag + 1) - 2 * maxlag
+
+
+def segmentSpectra(binned, maxlag, extend):
+    """Spectra of the segments of the trains in `binned`.
+
+    Segment s of a train covers bins [s * S, (s + 1) * S). If `extend`
+    is True, it is extended by maxlag bins of the train on each side.
+    Segments are zero-padded to nfft = S + 2 * maxlag (a fast FFT
+    length, see segmentLength). The circular correlation of a plain
+    segment with an extended one then has lags -maxlag to maxlag at
+    indices 0 to 2 * maxlag, without wrapping around.
+
+    Returns an array of shape (trains, segments, nfft // 2 + 1).
+
+    """
+    length = segmentLength(maxlag)
+    nfft = length + 2 * maxlag
+    segments = max(1, -(-binned.shape[1] // length))
+    padded = np.zeros((len(binned), segments * length + 2 * maxlag))
+    padded[:, maxlag:maxlag + binned.shape[1]] = binned
+    if extend:
+        index = np.arange(segments)[:, np.newaxis] * length + np.arange(nfft)
+        data = padded[:, index]
+    else:
+        data = np.zeros((len(binned), segments, nfft))
+        data[:, :, :length] = padded[:, maxlag:maxlag + segments * length].reshape(
+            len(binned), segments, length)
+    return np.fft.rfft(data, nfft, axis=2)
+
+
+def correlograms(binnedA, binnedB, maxlag, maxBytes=64*1024*1024):
+    """Cross-correlograms of each train in `binnedA` with each train
+    in `binnedB` for lags -maxlag to maxlag bins.
+
+    Returns an array of shape (len(binnedA), len(binnedB), 2 * maxlag
+    + 1). Entry [i, j, maxlag + k] counts the pairs of spikes where
+    the spike of train j is k bins after that of train i.
+
+    Transforming the whole trains would take an FFT of the length of
+    the recording for every pair, although only 2 * maxlag + 1 lags
+    are needed. Instead the trains are cut into short segments, those
+    of `binnedB` extended by maxlag bins on each side, and the cross
+    spectra summed over the segments. For each frequency the sum over
+    segments of all pairs is one matrix product, and then there is
+    one short inverse FFT per pair.
+
+    """
+    specA = np.conj(segmentSpectra(binnedA, maxlag, False)).transpose(2, 0, 1)
+    specB = segmentSpectra(binnedB, maxlag, True).transpose(2, 1, 0)
+    nfft = segmentLength(maxlag) + 2 * maxlag
+    ret = np.empty((len(binnedA), len(binnedB), 2 * maxlag + 1))
+    # Rows at a time, to keep the cross spectra within maxBytes
+    rows = max(1, maxBytes // (16 * len(binnedB) * specA.shape[0]))
+    for start in range(0, len(binnedA), rows):
+        cross = np.matmul(specA[:, start:start + rows], specB)
+        cc = np.fft.irfft(cross, nfft, axis=0)
+        ret[start:start + rows] = cc[:2 * maxlag + 1].transpose(1, 2, 0)
+    return ret
+
+
+# Side of the chunks of the output in cells
+chunkSide = 32
+
+
+def blockSize(cells, bins, maxlag, maxBytes):
+    """Number of cells per tile so that computing a tile takes about
+    `maxBytes` of memory"""
+    # binned trains and segment spectra (which are about twice the
+    # size of the trains) of both blocks
+    perCell = 2 * 8 * 4 * (bins + 2 * segmentLength(maxlag))
+    size = max(1, maxBytes // perCell)
+    # the tile itself
+    size = min(size, max(1, int(np.sqrt(maxBytes / (16.0 * (2 * maxlag + 1))))))
+    if size >= chunkSide:
+        size = size // chunkSide * chunkSide
+    return int(min(size, cells))
+
+
+def readTrains(filename, group, names):
+    with h5.File(filename, 'r') as fd:
+        _, spikes, lengths = spikerate.readSpikes(fd[group], names)
+    return spikes, lengths
+
+
+def computeTile(filename, group, rowNames, colNames, start, end, binsize,
+                maxlag, normalize=False):
+    """Worker entry point: correlograms of the cells `rowNames` with
+    the cells `colNames` in `group` of `filename`. Returns the tile as
+    float32."""
+    spikes, lengths = readTrains(filename, group, rowNames)
+    rows = binTrains(spikes, lengths, start, end, binsize)
+    if colNames == rowNames:
+        cols = rows
+    else:
+        spikes, lengths = readTrains(filename, group, colNames)
+        cols = binTrains(spikes, lengths, start, end, binsize)
+    tile = np.rint(correlograms(rows, cols, maxlag))
+    if normalize:
+        norm = np.sqrt(np.outer(rows.sum(axis=1), cols.sum(axis=1)))
+        tile = np.divide(tile, norm[:, :, np.newaxis], out=np.zeros_like(tile),
+                         where=norm[:, :, np.newaxis] > 0)
+    return tile.astype(np.float32)
+
+
+def spikeNames(group):
+    return [name for name, node in group.items() if isinstance(node, h5.Dataset)]
+
+
+def crossCorrelate(infile, outfile, binsize=1e-3, maxlag=50, start=0.0,
+                   end=-1.0, normalize=False, executor=None,
+                   maxBytes=256*1024*1024, group='/spikes', progress=None):
+    """Compute cross-correlograms of all pairs of spike trains in
+    `group` of `infile` and save them in `outfile`.
+
+    binsize: bin width in seconds.
+
+    maxlag: largest lag in bins, the correlograms cover -maxlag to
+    maxlag.
+
+    start, end: time range of the spikes considered. If `end` is
+    negative, the simulation time of the data file is used (or the
+    last spike if it is not recorded).
+
+    normalize: divide the correlograms by sqrt(n_i * n_j), n being
+    the spike counts in the time range.
+
+    executor: a concurrent.futures executor to run the tiles on. If
+    None, they are computed in this process.
+
+    maxBytes: approximate memory for computing one tile.
+
+    progress: callable taking (tiles done, total tiles).
+
+    The output file gets datasets `correlogram` (cells x cells x
+    lags), `cells` (names of the spike trains), `lag` (lag times in
+    seconds) and `spikecount`, and attributes binsize, maxlag, start,
+    end, normalized and datasource.
+
+    """
+    with h5.File(infile, 'r') as fd:
+        names = sorted(spikeNames(fd[group]))
+        _, spikes, lengths = spikerate.readSpikes(fd[group], names)
+        if end < 0:
+            end = spikerate.simulationTime(fd)
+        if end is None or end < 0:
+            end = spikes.max() + binsize if len(spikes) > 0 else start + binsize
+        filename = fd.filename
+    counts = binTrains(spikes, lengths, start, end, binsize).sum(axis=1)
+    bins = int(np.ceil((end - start) / binsize))
+    size = blockSize(len(names), bins, maxlag, maxBytes)
+    blocks = [(ii, min(ii + size, len(names))) for ii in range(0, len(names), size)]
+    tiles = [(row, col) for ii, row in enumerate(blocks) for col in blocks[ii:]]
+    lags = 2 * maxlag + 1
+    out = h5.File(outfile, 'w-') if isinstance(outfile, str) else outfile
+    try:
+        side = max(1, min(chunkSide, len(names)))
+        dset = out.create_dataset('correlogram', shape=(len(names), len(names), lags),
+                                  dtype=np.float32, chunks=(side, side, lags),
+                                  compression='gzip', shuffle=True)
+        out.create_dataset('cells', data=np.array(names, dtype=h5.string_dtype()))
+        out.create_dataset('lag', data=np.arange(-maxlag, maxlag + 1) * binsize)
+        out.create_dataset('spikecount', data=counts)
+        out.attrs['binsize'] = float(binsize)
+        out.attrs['maxlag'] = int(maxlag)
+        out.attrs['start'] = float(start)
+        out.attrs['end'] = float(end)
+        out.attrs['normalized'] = bool(normalize)
+        out.attrs['datasource'] = filename
+
+        def store(row, col, tile):
+            dset[row[0]:row[1], col[0]:col[1], :] = tile
+            if row != col:
+                dset[col[0]:col[1], row[0]:row[1], :] = tile.transpose(1, 0, 2)[:, :, ::-1]
+
+        def args(row, col):
+            return (filename, group, names[row[0]:row[1]], names[col[0]:col[1]],
+                    start, end, binsize, maxlag, normalize)
+
+        done = 0
+        if executor is None:
+            for row, col in tiles:
+                store(row, col, computeTile(*args(row, col)))
+                done += 1
+                if progress is not None:
+                    progress(done, len(tiles))
+            return out.filename
+        # Keep a bounded number of tiles in flight so that finished
+        # tiles do not pile up in memory while we write
+        pending = {}
+        remaining = list(tiles)
+        inFlight = 2 * getattr(executor, '_max_workers', 1)
+        while remaining or pending:
+            while remaining and len(pending) < inFlight:
+                row, col = remaining.pop(0)
+                pending[executor.submit(computeTile, *args(row, col))] = (row, col)
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                row, col = pending.pop(future)
+                store(row, col, future.result())
+                done += 1
+                if progress is not None:
+                    progress(done, len(tiles))
+        return out.filename
+    finally:
+        if out is not outfile:
+            out.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compute pairwise cross-correlograms of spike trains')
+    parser.add_argument('-i', dest='infile', required=True, help='input file')
+    parser.add_argument('-o', dest='outfile', required=True,
+                        help='output file, must not exist')
+    parser.add_argument('-b', dest='binsize', type=float, default=1e-3,
+                        help='bin width in seconds')
+    parser.add_argument('-l', dest='maxlag', type=int, default=50,
+                        help='largest lag in bins')
+    parser.add_argument('-s', dest='start', type=float, default=0.0,
+                        help='ignore spikes before this time')
+    parser.add_argument('-e', dest='end', type=float, default=-1.0,
+                        help='ignore spikes after this time, simulation time if negative')
+    parser.add_argument('-n', dest='normalize', action='store_true',
+                        help='normalize by sqrt of the product of spike counts')
+    parser.add_argument('-j', dest='jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('-m', dest='memory', type=int, default=256,
+                        help='memory per tile in MiB')
+    parser.add_argument('--show', action='store_true',
+                        help='open the result in h5browse')
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        sys.stdout.write('\r{}/{} tiles'.format(done, total))
+        sys.stdout.flush()
+
+    executor = None
+    if args.jobs > 1:
+        executor = ProcessPoolExecutor(args.jobs,
+                                       mp_context=multiprocessing.get_context('spawn'))
+    try:
+        crossCorrelate(args.infile, args.outfile, args.binsize, args.maxlag,
+                       args.start, args.end, args.normalize, executor,
+                       args.memory * 1024 * 1024, progress=report)
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        return 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print()
+    if args.show:
+        subprocess.Popen([sys.executable,
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                       'h5browse.py'),
+                          args.outfile])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# crosscorr.py ends here
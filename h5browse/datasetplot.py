@@ -44,13 +44,18 @@
 
 # Code:
 
-import numpy as np
+import threading
 from collections import defaultdict
-from pyqtgraph import QtCore
+import numpy as np
+from pyqtgraph import (QtCore, QtGui)
 import pyqtgraph as pg
 from pyqtgraph import parametertree as ptree
-import numpy as np
 from hdfdatasetmodel import datasetType
+from decimate import MinMaxPyramid
+from hyperslab import readSeries
+import sidecar
+import follow
+import profiler
 
 class DatasetPlotParamTree(ptree.ParameterTree):
     """Base class for ParameterTree to select plotting parameters specific
@@ -72,6 +77,17 @@ class DatasetPlotParamTree(ptree.ParameterTree):
     def setDataset(self, dataset):
         self.dataset = dataset
 
+    def dataDimension(self):
+        """Dimension of the dataset along which the plotted data run"""
+        return 0
+
+    def getTail(self, start):
+        """Return x and y data from index `start` along the data
+        dimension on, as arrays. Used for appending to the plot when
+        the dataset grows."""
+        xdata, ydata = self.getXY()
+        return np.asarray(xdata)[start:], np.asarray(ydata)[start:]
+
 
 class OneDPlotParamTree(DatasetPlotParamTree):
     """1D datasets can only be plotted as x or y, with the other axis
@@ -104,6 +120,17 @@ class OneDPlotParamTree(DatasetPlotParamTree):
         else:
             ydata = self.dataset
         return xdata, ydata
+
+    def getTail(self, start):
+        index = np.arange(start, self.dataset.shape[0])
+        if self.xsource.value() == 'index' and self.ysource.value() == 'index':
+            return index, index
+        data = profiler.read(self.dataset, slice(start, None))
+        if self.xsource.value() == 'index':
+            return index, data
+        if self.ysource.value() == 'index':
+            return data, index
+        return data, data
         
 class CompoundPlotParamTree(OneDPlotParamTree):
     """Compound dataset is tabulated data. One can choose row index or a
@@ -134,12 +161,21 @@ class CompoundPlotParamTree(OneDPlotParamTree):
         if self.xsource.value() == 'index':
             xdata = range(self.dataset.shape[0])
         else:
-            xdata = self.dataset[self.xsource.value()]
+            xdata = profiler.read(self.dataset, self.xsource.value())
         if self.ysource.value() == 'index':
             ydata = range(self.dataset.shape[0])
         else:
-            ydata = self.dataset[self.ysource.value()]
+            ydata = profiler.read(self.dataset, self.ysource.value())
         return xdata, ydata
+
+    def getTail(self, start):
+        ret = []
+        for source in (self.xsource.value(), self.ysource.value()):
+            if source == 'index':
+                ret.append(np.arange(start, self.dataset.shape[0]))
+            else:
+                ret.append(profiler.read(self.dataset, (slice(start, None), source)))
+        return tuple(ret)
     
 
 class TwoDPlotParamTree(DatasetPlotParamTree):
@@ -205,22 +241,38 @@ class TwoDPlotParamTree(DatasetPlotParamTree):
             if xdim == 'index':
                 xdata = range(ds.shape[1])
             else:
-                xdata = ds[xdim,:]
+                xdata = profiler.read(ds, (xdim, slice(None)))
             if ydim == 'index':
                 ydata = range(ds.shape[1])
             else:
-                ydata = ds[ydim, :]
+                ydata = profiler.read(ds, (ydim, slice(None)))
         elif self.dataDim.value() == 'columns':
             if xdim == 'index':
                 xdata = range(ds.shape[0])
             else:
-                xdata = ds[:, xdim]
+                xdata = profiler.read(ds, (slice(None), xdim))
             if ydim == 'index':
                 ydata = range(ds.shape[0])
             else:
-                ydata = ds[:, ydim]        
+                ydata = profiler.read(ds, (slice(None), ydim))
         return xdata, ydata
 
+    def dataDimension(self):
+        return 1 if self.dataDim.value() == 'rows' else 0
+
+    def getTail(self, start):
+        ds = self.dataset
+        dataDim = self.dataDimension()
+        ret = []
+        for source in (self.xsource.value(), self.ysource.value()):
+            if source == 'index':
+                ret.append(np.arange(start, ds.shape[dataDim]))
+            elif dataDim == 1:
+                ret.append(profiler.read(ds, (source, slice(start, None))))
+            else:
+                ret.append(profiler.read(ds, (slice(start, None), source)))
+        return tuple(ret)
+
 
 class NDPlotParamTree(DatasetPlotParamTree):
     """Class to allow the user to choose parameters for plotting."""
@@ -239,9 +291,15 @@ class NDPlotParamTree(DatasetPlotParamTree):
                                            type='group')
         self.ysource = ptree.Parameter.create(name='y-data',
                                            type='group')
+        self.step = ptree.Parameter.create(name='step',
+                                           title='Take every',
+                                           type='int',
+                                           value=1,
+                                           limits=(1, None))
         self.dataSources = ptree.Parameter.create(name='Data sources',
                                                   type='group',
                                                   children=[self.dataDim,
+                                                            self.step,
                                                             self.xsource,
                                                             self.ysource])
         self.addParameters(self.dataSources)            
@@ -276,51 +334,115 @@ class NDPlotParamTree(DatasetPlotParamTree):
         self.ysource.clearChildren()
         self.ysource.addChildren(dimChoices)
 
-    def getXY(self):
-        # print('NDPlotParamTree: xsource: {}, ysource: {}'.format(
-        #     self.xsource.value(), self.ysource.value()))
-        dims = range(len(self.dataset.shape))
-        xindex = []
-        yindex = []
+    def dataDimension(self):
+        return self.dataDim.value()
+
+    def getXY(self, start=0):
+        """Read x and y along the data dimension at the chosen indices
+        of the other dimensions, from index `start` on (rounded up to
+        a multiple of the step). If both come from the same chunks,
+        they are read in a single pass."""
         dataDim = self.dataDim.value()
-        for dim in dims:
+        step = self.step.value()
+        start = -(-start // step) * step
+        xfixed = {}
+        yfixed = {}
+        for dim in range(len(self.dataset.shape)):
             if dim == dataDim:
-                xindex.append(slice(self.dataset.shape[dim]))
-                yindex.append(slice(self.dataset.shape[dim]))
                 continue
-            xparam = self.xsource.param('dim{}'.format(dim))
-            xindex.append(xparam.value())
-            yparam = self.ysource.param('dim{}'.format(dim))
-            yindex.append(yparam.value())
-        # data = np.asarray(self.dataset)
-        if 'index' in  xindex:
-            xdata = range(self.dataset.shape[dataDim])
+            xfixed[dim] = self.xsource.param('dim{}'.format(dim)).value()
+            yfixed[dim] = self.ysource.param('dim{}'.format(dim)).value()
+        index = range(start, self.dataset.shape[dataDim], step)
+        sources = [fixed for fixed in (xfixed, yfixed)
+                   if 'index' not in fixed.values()]
+        series = readSeries(self.dataset, dataDim, sources, step, start)
+        if 'index' in xfixed.values():
+            xdata = index
         else:
-            # This fancy indexing does not work with h5py dataset
-            # xdata = self.dataset[xindex] 
-            # Therefore using hack
-            xdata = eval('self.dataset{}'.format(xindex))
-            # xdata = data[xindex]
-        if 'index' in  yindex:
-            ydata = range(self.dataset.shape[dataDim])
+            xdata = series.pop(0)
+        if 'index' in yfixed.values():
+            ydata = index
         else:
-            ydata = eval('self.dataset{}'.format(yindex))
-            # ydata = data[yindex]
+            ydata = series.pop(0)
         return (xdata, ydata)
-        
-        
-            
+
+    def getTail(self, start):
+        xdata, ydata = self.getXY(start)
+        return np.asarray(xdata), np.asarray(ydata)
+
+
+class PyramidBuilder(QtCore.QRunnable):
+    """Runnable building a MinMaxPyramid for a line of a DatasetPlot"""
+    def __init__(self, plot, plotDataItem, pyramid, cancelled):
+        super(PyramidBuilder, self).__init__()
+        self.plot = plot
+        self.plotDataItem = plotDataItem
+        self.pyramid = pyramid
+        self.cancelled = cancelled
+
+    def run(self):
+        try:
+            if not self.pyramid.build(self.cancelled.is_set):
+                return
+            self.pyramid.storeCached()
+        except Exception as e:
+            # An exception escaping a QRunnable aborts the application
+            print(e)
+            return
+        try:
+            self.plot.sigPyramidBuilt.emit(self.plotDataItem, self.pyramid)
+        except RuntimeError:
+            pass    # the plot has been deleted
+
+
 class DatasetPlot(pg.PlotWidget):
     """PlotWidget with some minor modifications for dataviz.
+
+    Series plotted against index with more than `decimateThreshold`
+    points are not passed to pyqtgraph as they are. A MinMaxPyramid is
+    built for each of them and only the envelope at the resolution
+    matching the visible range and the width of the plot is drawn. It
+    is refined (down to the raw data read from the file) when the
+    view range changes. Unless its levels are in the sidecar cache,
+    the pyramid is built on a worker thread, and the first
+    `decimateThreshold` points are drawn until it is ready.
+
+    Datasets in files opened for SWMR reading are followed: when the
+    dataset grows only the new tail is read and appended to the
+    plot. At most the last `followWindow` points are kept.
+
+    The x and y of each line, at full resolution, can be exported from
+    the context menu of the plot (see exportdialog.py).
     
     """
     # TODO: multiple dataset in same plotwidget? cannot attach to a
     # specific dataset. Update `name` with something more meaningful. Also, allow option of plo
+    decimateThreshold = 100000
+    followWindow = 1000000
+    sigPyramidBuilt = QtCore.pyqtSignal(object, object)
+
     def __init__(self, parent=None, background='default', **kwargs):
         super(DatasetPlot, self).__init__(parent=parent, background=background, **kwargs)
         self.name = ''        
         self.plotToParams = {}
         self.paramsToPlots = {}
+        self.pyramids = {}
+        self.building = {}    # plotDataItem -> (pyramid, cancel event)
+        building = self.building
+        self.destroyed.connect(
+            lambda *args: [event.set() for _, event in building.values()])
+        self.sigPyramidBuilt.connect(self.pyramidBuilt)
+        self.following = {}   # plotDataItem -> [key, params, length, x, y]
+        # Avoid refining on every mouse move while panning/zooming
+        self.refineTimer = QtCore.QTimer(self)
+        self.refineTimer.setSingleShot(True)
+        self.refineTimer.setInterval(50)
+        self.refineTimer.timeout.connect(self.refineView)
+        self.getPlotItem().sigXRangeChanged.connect(self.refineTimer.start)
+        self.exportAction = QtGui.QAction(QtGui.QIcon(), 'Export data', self,
+                                          statusTip='Export the x and y data of a plotted line to a file',
+                                          triggered=self.exportData)
+        self.getPlotItem().getViewBox().menu.addAction(self.exportAction)
 
     def plotLine(self, dataset):
         self.setToolTip(dataset.name)
@@ -340,32 +462,166 @@ class DatasetPlot(pg.PlotWidget):
         #A better idea may be to keep all the params under a single tree
         # self.params[dataset].append(params)
         params.show()
-        xdata, ydata = params.getXY()
+        self.name = '{}:{}'.format(dataset.file.filename,
+                                   dataset.name)
         # try: # This is my data dump sepcific ... crashes in h5py on python3/cygwin?
         #     sched = dataset.file['/runconfig/scheduling']
         #     print('sched:', sched)
         #     xdata = np.arange(len(dataset)) * float(sched['simtime']) / len(dataset)
         # except KeyError:
         #     xdata = np.arange(len(dataset))
-        plotDataItem = self.plot(xdata, ydata)
+        plotDataItem = self.plot()
         self.plotToParams[plotDataItem] = params
+        with profiler.activity('plot', self.name):
+            if follow.isFollowable(dataset):
+                self.follow(plotDataItem, params, dataset)
+            else:
+                xdata, ydata = params.getXY()
+                self.setPlotData(plotDataItem, xdata, ydata)
         self.paramsToPlots[params] = plotDataItem
         # print('Plot=', plot)
-        self.name = '{}:{}'.format(dataset.file.filename,
-                                   dataset.name)
         return plotDataItem, params
 
     def updatePlotData(self):
         if self.sender() != 0:
-            x, y = self.sender().getXY()
             plotDataItem = self.paramsToPlots[self.sender()]
-            plotDataItem.setData(x, y)
+            with profiler.activity('plot', self.name):
+                if plotDataItem in self.following:
+                    self.resetFollowing(plotDataItem)
+                    return
+                x, y = self.sender().getXY()
+                self.setPlotData(plotDataItem, x, y)
+
+    def follow(self, plotDataItem, params, dataset):
+        """Plot the tail of `dataset` and append to it as it grows"""
+        follower = follow.defaultFollower()
+        if len(self.following) == 0:
+            follower.sigGrown.connect(self.datasetGrown)
+        key = follower.follow(dataset, owner=self)
+        self.following[plotDataItem] = [key, params, 0, None, None]
+        # pyqtgraph decimates the window for display by itself
+        plotDataItem.setDownsampling(auto=True, method='peak')
+        plotDataItem.setClipToView(True)
+        self.resetFollowing(plotDataItem)
+
+    def resetFollowing(self, plotDataItem):
+        """Read the last `followWindow` points afresh, e.g. after the
+        plot parameters changed"""
+        entry = self.following[plotDataItem]
+        params = entry[1]
+        length = params.dataset.shape[params.dataDimension()]
+        x, y = params.getTail(max(0, length - self.followWindow))
+        entry[2:] = [length, x, y]
+        plotDataItem.setData(x, y)
+
+    def datasetGrown(self, key, oldShape, newShape):
+        """Append the new tail of dataset `key` to the plots following
+        it, dropping points beyond `followWindow`"""
+        with profiler.activity('follow', self.name):
+            for plotDataItem, entry in self.following.items():
+                if entry[0] != key:
+                    continue
+                _, params, length, x, y = entry
+                newLength = newShape[params.dataDimension()]
+                if newLength < length:
+                    self.resetFollowing(plotDataItem)
+                    continue
+                if newLength == length:
+                    continue
+                xtail, ytail = params.getTail(length)
+                x = np.concatenate((x, xtail))[-self.followWindow:]
+                y = np.concatenate((y, ytail))[-self.followWindow:]
+                entry[2:] = [newLength, x, y]
+                plotDataItem.setData(x, y)
+
+    def paintEvent(self, event):
+        with profiler.activity('paint', self.name):
+            super(DatasetPlot, self).paintEvent(event)
+
+    def exportSources(self):
+        """The plotted lines, as a dict of description to a callable
+        returning an exporter source of their x and y. These are read
+        again from the dataset, not taken from the (decimated) plot."""
+        import exporter
+        sources = {}
+        for params in self.paramsToPlots:
+            def source(params=params):
+                xdata, ydata = params.getXY()
+                return exporter.SeriesSource([('x', xdata), ('y', ydata)])
+            label = 'x, y of {}'.format(params.name)
+            if label in sources:
+                label += ' ({})'.format(len(sources) + 1)
+            sources[label] = source
+        return sources
+
+    def exportData(self):
+        sources = self.exportSources()
+        if len(sources) == 0:
+            return
+        from exportdialog import startExport
+        startExport(self, sources, self.name.rpartition(':')[-1])
+
+    def pixelWidth(self):
+        width = self.getPlotItem().getViewBox().width()
+        if width <= 0:
+            return 1000
+        return int(width)
+
+    def setPlotData(self, plotDataItem, xdata, ydata):
+        """Set data of `plotDataItem`, via a decimation pyramid for long
+        series against index"""
+        previous = self.building.pop(plotDataItem, None)
+        if previous is not None:
+            previous[1].set()
+        if isinstance(xdata, range) and xdata.start == 0 and xdata.step == 1 \
+           and len(ydata) > self.decimateThreshold:
+            pyramid = MinMaxPyramid(ydata, sidecar=sidecar.defaultCache(), build=False)
+            if len(pyramid.levels) > 0:
+                self.pyramids[plotDataItem] = pyramid
+                plotDataItem.setData(*pyramid.select(0, pyramid.length, self.pixelWidth()))
+                return
+            # Reading the whole series takes long: draw its beginning
+            # until the pyramid is ready
+            self.pyramids.pop(plotDataItem, None)
+            cancelled = threading.Event()
+            self.building[plotDataItem] = (pyramid, cancelled)
+            QtCore.QThreadPool.globalInstance().start(
+                PyramidBuilder(self, plotDataItem, pyramid, cancelled))
+            plotDataItem.setData(*pyramid.select(0, self.decimateThreshold, 0))
+        else:
+            self.pyramids.pop(plotDataItem, None)
+            plotDataItem.setData(xdata, ydata)
+
+    def pyramidBuilt(self, plotDataItem, pyramid):
+        """Draw `plotDataItem` from `pyramid` built in the background,
+        unless its data has been replaced meanwhile"""
+        entry = self.building.get(plotDataItem)
+        if entry is None or entry[0] is not pyramid:
+            return
+        del self.building[plotDataItem]
+        self.pyramids[plotDataItem] = pyramid
+        self.refineView()
 
+    def refineView(self):
+        """Redraw decimated series for the current view range"""
+        if len(self.pyramids) == 0:
+            return
+        with profiler.activity('refine', self.name):
+            viewBox = self.getPlotItem().getViewBox()
+            width = self.pixelWidth()
+            xmin, xmax = viewBox.viewRange()[0]
+            autoRange = viewBox.autoRangeEnabled()[0]
+            for plotDataItem, pyramid in self.pyramids.items():
+                if autoRange:
+                    # Drawing only the visible part would make the auto
+                    # range shrink to it
+                    plotDataItem.setData(*pyramid.select(0, pyramid.length, width))
+                else:
+                    # Include half a view on each side for smooth panning
+                    margin = (xmax - xmin) / 2.0
+                    plotDataItem.setData(*pyramid.select(xmin - margin, xmax + margin,
+                                                         2 * width))
 
-import h5py as h5
-from hdfdatasetmodel import (CompoundDatasetModel, NDDatasetModel, TwoDDatasetModel, OneDDatasetModel, create_default_model)
-from pyqtgraph import QtGui
-import sys
 
 def testDatasetPlotParams(fd):
     widget = QtGui.QWidget()
@@ -405,6 +661,8 @@ def testDatasetPlot(fd):
     return widget
     
 if __name__ == '__main__':
+    import sys
+    import h5py as h5
     app = QtGui.QApplication(sys.argv)
     with h5.File('poolroom.h5', 'r') as fd:
         dparamw = testDatasetPlotParams(fd)
@@ -0,0 +1,321 @@
+# datasetstats.py --- 
+# 
+# Filename: datasetstats.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:15:50 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:15:50 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Summary statistics of datasets too large to load at once.
+# 
+# The dataset is cut into slabs of whole chunks along the first
+# dimension. Each slab is reduced to a partial aggregate (count of
+# finite values, NaN and Inf counts, min, max, mean and sum of
+# squared deviations) and the partial aggregates are merged with the
+# pairwise update of Chan et al., so the slabs can be processed in
+# any order on a pool of worker processes.
+# 
+# The histogram needs the range of the data, so it is computed in a
+# second pass over the slabs once the first pass has found min and
+# max.
+# 
+# This module does not depend on Qt so that the worker processes
+# start fast. See statswidget.py for the GUI.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Mergeable statistics of HDF5 datasets computed over chunks"""
+
+import numpy as np
+import h5py as h5
+
+import sidecar
+import profiler
+
+
+def numericFields(dtype):
+    """Names of the numeric fields of compound `dtype`, [''] for a
+    numeric dtype and [] if there is nothing to compute"""
+    if dtype.names is None:
+        return [''] if dtype.kind in 'biuf' else []
+    return [name for name in dtype.names
+            if dtype.fields[name][0].kind in 'biuf'
+            and dtype.fields[name][0].shape == ()]
+
+
+def slabs(shape, chunks, itemsize, targetBytes=8*1024*1024):
+    """Return selections cutting a dataset of `shape` into slabs of
+    whole chunks along the first dimension, each about `targetBytes`
+    in size."""
+    if len(shape) == 0:
+        return [()]
+    rowBytes = itemsize * int(np.prod(shape[1:]))
+    rows = max(1, targetBytes // max(rowBytes, 1))
+    if chunks is not None:
+        rows = max(chunks[0], rows // chunks[0] * chunks[0])
+    return [(slice(start, min(start + rows, shape[0])),)
+            for start in range(0, shape[0], rows)]
+
+
+# Most indices along an axis to compute statistics for separately:
+# each keeps a histogram of `bins` counts
+maxGroups = 4096
+
+
+def groupCount(shape, axis):
+    """Number of separate aggregates for statistics along `axis`"""
+    if axis is None:
+        return 1
+    if shape[axis] > maxGroups:
+        raise ValueError('dimension {} has {} indices, statistics are computed'
+                         ' for each of at most {}'.format(axis, shape[axis], maxGroups))
+    return shape[axis]
+
+
+def emptyAggregate(groups, bins):
+    """Identity element for `merge`"""
+    return {'count': np.zeros(groups, dtype=np.int64),
+            'nan': np.zeros(groups, dtype=np.int64),
+            'inf': np.zeros(groups, dtype=np.int64),
+            'min': np.full(groups, np.inf),
+            'max': np.full(groups, -np.inf),
+            'mean': np.zeros(groups),
+            'm2': np.zeros(groups),
+            'hist': np.zeros((groups, bins), dtype=np.int64)}
+
+
+def partial(data, axis=None, edges=None):
+    """Aggregate of `data` (array), for each index along `axis` or for
+    the whole array if `axis` is None.
+
+    If `edges` is given, only the histogram over those bin edges is
+    computed.
+
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if axis is None or data.ndim == 0:
+        data = data.reshape(1, -1)
+    else:
+        data = np.moveaxis(data, axis, 0).reshape(data.shape[axis], -1)
+    groups = data.shape[0]
+    finite = np.isfinite(data)
+    if edges is not None:
+        bins = len(edges) - 1
+        index = np.clip(np.searchsorted(edges, data, side='right') - 1, 0, bins - 1)
+        index += np.arange(groups)[:, np.newaxis] * bins
+        hist = np.bincount(index[finite], minlength=groups * bins)
+        return {'hist': hist.reshape(groups, bins)}
+    count = finite.sum(axis=1)
+    total = np.where(finite, data, 0).sum(axis=1)
+    mean = np.divide(total, count, out=np.zeros(groups), where=count > 0)
+    deviation = np.where(finite, data - mean[:, np.newaxis], 0)
+    return {'count': count,
+            'nan': np.isnan(data).sum(axis=1),
+            'inf': np.isinf(data).sum(axis=1),
+            'min': np.where(finite, data, np.inf).min(axis=1),
+            'max': np.where(finite, data, -np.inf).max(axis=1),
+            'mean': mean,
+            'm2': (deviation * deviation).sum(axis=1)}
+
+
+def merge(total, part, groups=slice(None)):
+    """Merge aggregate `part` into `total` in place. `groups` selects
+    the groups of `total` that `part` covers."""
+    if 'hist' in part:
+        total['hist'][groups] += part['hist']
+    if 'count' not in part:
+        return total
+    na = total['count'][groups]
+    nb = part['count']
+    n = na + nb
+    delta = part['mean'] - total['mean'][groups]
+    ratio = np.divide(nb, n, out=np.zeros(len(n)), where=n > 0)
+    total['mean'][groups] = total['mean'][groups] + delta * ratio
+    total['m2'][groups] = total['m2'][groups] + part['m2'] + delta * delta * na * ratio
+    total['count'][groups] = n
+    total['nan'][groups] = total['nan'][groups] + part['nan']
+    total['inf'][groups] = total['inf'][groups] + part['inf']
+    total['min'][groups] = np.minimum(total['min'][groups], part['min'])
+    total['max'][groups] = np.maximum(total['max'][groups], part['max'])
+    return total
+
+
+def histogramEdges(aggregate, bins):
+    """Common bin edges covering all groups of `aggregate`"""
+    valid = aggregate['count'] > 0
+    if not np.any(valid):
+        return np.linspace(0, 1, bins + 1)
+    lo = aggregate['min'][valid].min()
+    hi = aggregate['max'][valid].max()
+    if hi <= lo:
+        hi = lo + 1
+    return np.linspace(lo, hi, bins + 1)
+
+
+def groupSlice(selection, axis):
+    """Groups of the total aggregate covered by a slab read with
+    `selection`. Only slabs along axis 0 split the groups."""
+    if axis == 0 and len(selection) > 0:
+        return selection[0]
+    return slice(None)
+
+
+def slabPartials(dataset, selection, fields, axis, edges=None):
+    """Partial aggregates of `fields` over the slab of `dataset` at
+    `selection`. `edges` maps field to histogram bin edges for the
+    second pass."""
+    data = profiler.read(dataset, selection)
+    ret = {}
+    for field in fields:
+        values = data[field] if field else data
+        ret[field] = partial(values, axis,
+                             None if edges is None else edges[field])
+    return ret
+
+
+def computeSlab(filename, name, selection, fields, axis, edges=None):
+    """Worker process entry point: `slabPartials` for dataset `name` in
+    `filename`. The file is not kept open between slabs, the worker
+    would otherwise hold a lock on it after the job."""
+    with h5.File(filename, 'r') as fd:
+        return slabPartials(fd[name], selection, fields, axis, edges)
+
+
+def finalize(aggregate, edges):
+    """Add derived statistics (variance, std) to a merged aggregate"""
+    count = aggregate['count']
+    variance = np.divide(aggregate['m2'], count, out=np.full(len(count), np.nan),
+                         where=count > 0)
+    result = dict(aggregate)
+    result['var'] = variance
+    result['std'] = np.sqrt(variance)
+    result['edges'] = edges
+    for key in ('min', 'max', 'mean'):
+        result[key] = np.where(count > 0, aggregate[key], np.nan)
+    return result
+
+
+def datasetStatistics(dataset, axis=None, bins=64, executor=None):
+    """Compute statistics of all numeric fields of `dataset`.
+
+    axis: compute separately for each index along this dimension,
+    None for the whole dataset.
+
+    executor: a concurrent.futures executor to run the slabs on. If
+    None, they are processed in this process.
+
+    Returns a dict mapping field name ('' for non-compound datasets)
+    to a dict of arrays with one entry per group: count (finite
+    values), nan, inf, min, max, mean, var, std, hist (groups x bins)
+    and the common bin edges.
+
+    """
+    fields = numericFields(dataset.dtype)
+    selections = slabs(dataset.shape, dataset.chunks, dataset.dtype.itemsize)
+    groups = groupCount(dataset.shape, axis)
+    totals = {field: emptyAggregate(groups, bins) for field in fields}
+
+    def run(edges):
+        if executor is None:
+            parts = (slabPartials(dataset, selection, fields, axis, edges)
+                     for selection in selections)
+        else:
+            parts = executor.map(computeSlab,
+                                 *zip(*[(dataset.file.filename, dataset.name,
+                                         selection, fields, axis, edges)
+                                        for selection in selections]))
+        for selection, part in zip(selections, parts):
+            for field in fields:
+                merge(totals[field], part[field], groupSlice(selection, axis))
+
+    run(None)
+    edges = {field: histogramEdges(totals[field], bins) for field in fields}
+    run(edges)
+    return {field: finalize(totals[field], edges[field]) for field in fields}
+
+
+def toArrays(stats):
+    """Flatten result of datasetStatistics into a dict of arrays for
+    storing in the sidecar cache"""
+    arrays = {'fields': np.array(list(stats.keys()), dtype=str)}
+    for ii, field in enumerate(stats):
+        for key, value in stats[field].items():
+            arrays['{}_{}'.format(key, ii)] = value
+    return arrays
+
+
+def fromArrays(arrays):
+    """Inverse of toArrays"""
+    stats = {}
+    for ii, field in enumerate(arrays['fields']):
+        suffix = '_{}'.format(ii)
+        stats[str(field)] = {name[:-len(suffix)]: value
+                             for name, value in arrays.items()
+                             if name.endswith(suffix)}
+    return stats
+
+
+def cachedStatistics(dataset, axis=None, bins=64, cache=None):
+    """Statistics of `dataset` from the sidecar cache, None if they
+    have not been computed"""
+    if cache is None:
+        cache = sidecar.defaultCache()
+    arrays = cache.load(dataset, 'stats', axis=axis, bins=bins)
+    if arrays is None:
+        return None
+    return fromArrays(arrays)
+
+
+def storeStatistics(dataset, stats, axis=None, bins=64, cache=None):
+    if cache is None:
+        cache = sidecar.defaultCache()
+    return cache.store(dataset, 'stats', toArrays(stats), axis=axis, bins=bins)
+
+
+def summary(stats):
+    """One line text summary per field of whole-dataset statistics"""
+    lines = []
+    for field, values in stats.items():
+        text = 'min {:g}, max {:g}, mean {:g}, std {:g}'.format(
+            values['min'][0], values['max'][0], values['mean'][0], values['std'][0])
+        if values['nan'][0] or values['inf'][0]:
+            text += ', {} NaN, {} Inf'.format(values['nan'][0], values['inf'][0])
+        lines.append('{}: {}'.format(field, text) if field else text)
+    return '\n'.join(lines)
+
+
+# 
+# datasetstats.py ends here
@@ -0,0 +1,208 @@
+# decimate.py --- 
+# 
+# Filename: decimate.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:06:38 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:06:38 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Line plots of long series (hundreds of millions of samples) cannot
+# be drawn by passing all the points to pyqtgraph. We keep min/max
+# envelopes at several resolutions and draw only the level matching
+# the visible range and the width of the plot in pixels. When zoomed
+# in enough, the raw samples are read from the file.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Min/max decimation pyramid for plotting long series"""
+
+import numpy as np
+
+import profiler
+
+
+def binMinMax(data, binSize):
+    """Min and max of consecutive bins of `binSize` entries of
+    `data`. The last bin may be partial. NaNs are ignored unless a bin
+    has nothing else."""
+    nfull = len(data) // binSize * binSize
+    full = data[:nfull].reshape(-1, binSize)
+    mins = np.fmin.reduce(full, axis=1)
+    maxs = np.fmax.reduce(full, axis=1)
+    if nfull < len(data):
+        rest = data[nfull:]
+        mins = np.append(mins, np.fmin.reduce(rest))
+        maxs = np.append(maxs, np.fmax.reduce(rest))
+    return mins, maxs
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max summary of a 1-D series.
+
+    source: 1-D array-like supporting len() and slicing, e.g. an h5py
+    dataset. It is read `readSize` entries at a time (rounded to
+    whole chunks of the dataset), so the full series is never loaded
+    in memory.
+
+    Level 0 holds min and max of bins of `baseBin` entries, each
+    further level combines `factor` bins of the previous one, until a
+    level has fewer than `minBins` bins.
+
+    sidecar: a sidecar.SidecarCache. If the source is an HDF5 dataset
+    the levels are loaded from there when available and stored after
+    they are computed.
+
+    build: if False, only the cached levels are loaded. Call `build`
+    and `storeCached` (e.g. in a worker thread) if `levels` is empty.
+
+    """
+    def __init__(self, source, baseBin=256, factor=4, minBins=1024,
+                 readSize=1024*1024, sidecar=None, build=True):
+        self.source = source
+        self.length = len(source)
+        self.baseBin = baseBin
+        self.factor = factor
+        self.minBins = minBins
+        self.readSize = readSize
+        self.sidecar = sidecar
+        self.levels = []    # list of (binSize, mins, maxs)
+        if not self.loadCached() and build:
+            self.build()
+            self.storeCached()
+
+    def cacheParams(self):
+        return {'baseBin': self.baseBin, 'factor': self.factor,
+                'minBins': self.minBins, 'length': self.length}
+
+    def loadCached(self):
+        if self.sidecar is None or not hasattr(self.source, 'file'):
+            return False
+        arrays = self.sidecar.load(self.source, 'minmax', **self.cacheParams())
+        if arrays is None:
+            return False
+        binSizes = sorted(int(name[3:]) for name in arrays if name.startswith('min'))
+        self.levels = [(binSize, arrays['min{}'.format(binSize)],
+                        arrays['max{}'.format(binSize)])
+                       for binSize in binSizes]
+        return True
+
+    def storeCached(self):
+        if self.sidecar is None or not hasattr(self.source, 'file') \
+           or len(self.levels) == 0:
+            return
+        arrays = {}
+        for binSize, mins, maxs in self.levels:
+            arrays['min{}'.format(binSize)] = mins
+            arrays['max{}'.format(binSize)] = maxs
+        self.sidecar.store(self.source, 'minmax', arrays, **self.cacheParams())
+
+    def readStep(self):
+        """Number of entries to read at a time, a multiple of the
+        chunk size of the source"""
+        step = self.readSize
+        chunks = getattr(self.source, 'chunks', None)
+        if chunks:
+            step = max(step // chunks[0], 1) * chunks[0]
+        return step
+
+    def build(self, cancelled=None):
+        """Compute the levels from the source. `cancelled` is a
+        callable checked between reads: if it returns True the levels
+        are left empty and False returned."""
+        mins, maxs = [], []
+        step = self.readStep()
+        leftover = np.zeros(0)
+        for start in range(0, self.length, step):
+            if cancelled is not None and cancelled():
+                return False
+            block = np.asarray(profiler.read(self.source, slice(start, start + step)),
+                               dtype=float)
+            block = np.concatenate((leftover, block))
+            if start + step < self.length:
+                # Keep the partial last bin for the next read
+                nfull = len(block) // self.baseBin * self.baseBin
+                block, leftover = block[:nfull], block[nfull:]
+            bmin, bmax = binMinMax(block, self.baseBin)
+            mins.append(bmin)
+            maxs.append(bmax)
+        if len(mins) > 0:
+            self.setLevels(np.concatenate(mins), np.concatenate(maxs))
+        return True
+
+    def setLevels(self, mins, maxs):
+        """Create all levels starting from the base level `mins`,
+        `maxs`"""
+        binSize = self.baseBin
+        self.levels = [(binSize, mins, maxs)]
+        while len(mins) > self.minBins:
+            mins = binMinMax(mins, self.factor)[0]
+            maxs = binMinMax(maxs, self.factor)[1]
+            binSize *= self.factor
+            self.levels.append((binSize, mins, maxs))
+
+    def select(self, start, stop, width):
+        """Return x and y arrays for drawing entries `start` to `stop`
+        on `width` pixels.
+
+        If there are less than `baseBin` entries per pixel the raw data
+        is read from the source. Otherwise the coarsest level with at
+        least one bin per pixel is used and each bin is drawn as a
+        vertical segment from its min to its max.
+
+        """
+        start = int(max(0, np.floor(start)))
+        stop = int(min(self.length, np.ceil(stop) + 1))
+        if stop <= start:
+            return np.zeros(0), np.zeros(0)
+        perPixel = (stop - start) / max(width, 1)
+        if perPixel < self.baseBin or len(self.levels) == 0:
+            ydata = np.asarray(profiler.read(self.source, slice(start, stop)))
+            return np.arange(start, stop), ydata
+        binSize, mins, maxs = self.levels[0]
+        for level in self.levels:
+            if level[0] > perPixel:
+                break
+            binSize, mins, maxs = level
+        first = start // binSize
+        last = min(-(-stop // binSize), len(mins))
+        centers = np.arange(first, last) * binSize + binSize / 2.0
+        xdata = np.repeat(centers, 2)
+        ydata = np.column_stack((mins[first:last], maxs[first:last])).ravel()
+        return xdata, ydata
+
+
+# 
+# decimate.py ends here
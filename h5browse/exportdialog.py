@@ -0,0 +1,236 @@
+# exportdialog.py --- 
+# 
+# Filename: exportdialog.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 17:01:20 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 17:01:20 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Export from the dataset tables and plots (see exporter.py). The
+# widget offers what it can export as factories of exporter sources,
+# e.g. the whole dataset, the selected cells or the plotted series.
+# After the user picks one and the file in ExportDialog, an ExportJob
+# creates the source and writes it on a worker thread, so that the
+# browser stays usable, with a progress dialog that can cancel it.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Dialog and background job to export datasets and plots"""
+
+import os
+import time
+import shutil
+import threading
+from pyqtgraph import (QtCore, QtGui)
+from pyqtgraph import parametertree as ptree
+
+import exporter
+
+
+# Jobs and their progress dialogs, kept until done
+_running = set()
+
+
+class ExportDialog(QtGui.QDialog):
+    """Dialog to choose what to export (one of `choices`), to which
+    file and in which format"""
+    def __init__(self, choices, name='', parent=None):
+        super(ExportDialog, self).__init__(parent)
+        self.setWindowTitle('Export data')
+        self.params = ptree.Parameter.create(
+            name='exportParameters', title='Export parameters', type='group',
+            children=[{'name': 'what', 'title': 'export', 'type': 'list',
+                       'values': list(choices), 'value': choices[0]},
+                      {'name': 'file', 'type': 'str',
+                       'value': name.strip('/').replace('/', '_') + '.csv'},
+                      {'name': 'browse', 'title': 'Browse...', 'type': 'action'},
+                      {'name': 'format', 'type': 'list',
+                       'values': ['auto'] + exporter.formats, 'value': 'auto'},
+                      {'name': 'delimiter', 'title': 'delimiter (CSV)', 'type': 'str',
+                       'value': ''}])
+        self.params.child('browse').sigActivated.connect(self.browse)
+        layout = QtGui.QVBoxLayout()
+        paramTree = ptree.ParameterTree(showHeader=False)
+        paramTree.setParameters(self.params)
+        layout.addWidget(paramTree)
+        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.setLayout(layout)
+
+    def browse(self):
+        path = QtGui.QFileDialog.getSaveFileName(
+            self, 'Export to', self.params['file'],
+            'CSV files (*.csv *.tsv *.txt);;NumPy files (*.npy);;'
+            'Column directories (*)',
+            options=QtGui.QFileDialog.DontConfirmOverwrite)
+        if isinstance(path, tuple):     # PyQt5 returns (path, filter)
+            path = path[0]
+        if path:
+            # startExport asks before overwriting
+            self.params['file'] = str(path)
+
+    def getExportParams(self):
+        """The choice, output path, format (None for the default for
+        the path) and delimiter (None for the default)"""
+        return {'what': self.params['what'],
+                'path': self.params['file'],
+                'format': None if self.params['format'] == 'auto' else self.params['format'],
+                'delimiter': self.params['delimiter'] or None}
+
+
+class ExportTask(QtCore.QRunnable):
+    """Run an ExportJob on a worker thread"""
+    def __init__(self, job):
+        super(ExportTask, self).__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        try:
+            source = job.sourceFactory()
+            path = exporter.exportData(source, job.path, job.format, job.delimiter,
+                                       progress=job.sigProgress.emit,
+                                       cancelled=job.cancelEvent.is_set)
+        except (IOError, OSError, ValueError, TypeError, KeyError) as e:
+            print(e)
+            job.sigFailed.emit(str(e))
+            return
+        job.sigFinished.emit(path)
+
+
+class ExportJob(QtCore.QObject):
+    """Export the source made by `sourceFactory` to `path` in the
+    background (see exporter.exportData).
+
+    Signals
+    -------
+
+    sigProgress(done, total): bytes of the source read so far and in
+    all.
+
+    sigFinished(path): the export is complete, or was cancelled if
+    path is None.
+
+    sigFailed(message): creating the source or writing failed.
+
+    """
+    sigProgress = QtCore.pyqtSignal(object, object)
+    sigFinished = QtCore.pyqtSignal(object)
+    sigFailed = QtCore.pyqtSignal(str)
+
+    def __init__(self, sourceFactory, path, format=None, delimiter=None, parent=None):
+        super(ExportJob, self).__init__(parent)
+        self.sourceFactory = sourceFactory
+        self.path = path
+        self.format = format
+        self.delimiter = delimiter
+        self.cancelEvent = threading.Event()
+
+    def start(self):
+        QtCore.QThreadPool.globalInstance().start(ExportTask(self))
+
+    def cancel(self):
+        """Stop after the current block and delete the output"""
+        self.cancelEvent.set()
+
+
+def startExport(parent, sources, name=''):
+    """Ask which of `sources` to export and where, and start exporting
+    it with a progress dialog. Returns the ExportJob, None if the
+    dialog was cancelled.
+
+    sources: dict of description to a callable returning an exporter
+    source. It is called on the worker thread.
+
+    name: used for the default file name, e.g. the dataset path.
+
+    """
+    dialog = ExportDialog(list(sources), name, parent)
+    if dialog.exec_() != QtGui.QDialog.Accepted:
+        return None
+    params = dialog.getExportParams()
+    path = params['path']
+    if not path:
+        return None
+    if os.path.exists(path):
+        choice = QtGui.QMessageBox.question(parent, 'Confirm overwrite',
+                                            '{} exists. Replace it?'.format(path),
+                                            buttons=QtGui.QMessageBox.Yes | QtGui.QMessageBox.No)
+        if choice != QtGui.QMessageBox.Yes:
+            return None
+        if os.path.isdir(path):
+            if not os.path.exists(os.path.join(path, exporter.columnsIndex)):
+                QtGui.QMessageBox.warning(parent, 'Export failed',
+                                          '{} is not an exported directory'.format(path))
+                return None
+            shutil.rmtree(path)
+    job = ExportJob(sources[params['what']], path, params['format'],
+                    params['delimiter'])
+    # Not owned by the widget, so the export goes on if it is closed
+    progress = QtGui.QProgressDialog('Exporting to {}'.format(path), 'Cancel', 0, 1000)
+    progress.setWindowTitle('Export data')
+    progress.setMinimumDuration(500)
+    _running.add((job, progress))
+    start = time.perf_counter()
+
+    def report(done, total):
+        seconds = time.perf_counter() - start
+        progress.setLabelText('Exporting to {}\n{:.1f} of {:.1f} MB, {:.1f} MB/s'.format(
+            path, done / 1e6, total / 1e6, done / 1e6 / max(seconds, 1e-9)))
+        progress.setValue(int(1000.0 * done / max(total, 1)))
+
+    def stop():
+        _running.discard((job, progress))
+        # reset, else it may show itself again after its minimum duration
+        progress.reset()
+        progress.close()
+
+    def failed(message):
+        stop()
+        QtGui.QMessageBox.warning(None, 'Export failed', message)
+
+    progress.canceled.connect(job.cancel)
+    job.sigProgress.connect(report)
+    job.sigFailed.connect(failed)
+    job.sigFinished.connect(lambda path: stop())
+    job.start()
+    return job
+
+
+# 
+# exportdialog.py ends here
@@ -0,0 +1,536 @@
+# exporter.py --- 
+# 
+# Filename: exporter.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 17:01:20 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 17:01:20 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Export of datasets, parts of them or plotted series to CSV, .npy and
+# a columnar format without loading the whole data in memory. The
+# counterpart of importer.py.
+# 
+# A source reads its data in blocks of rows: DatasetSource a
+# hyperslab (and some fields) of a dataset, SeriesSource columns that
+# are arrays, ranges or 1D datasets, such as the x and y of a plot.
+# `exportData` reads one block while a writer thread writes the
+# previous ones, through a queue of `queueBlocks`, so that reading
+# from HDF5 and formatting or writing the output overlap and at most
+# a few blocks are in memory.
+# 
+# CSV is written with the csv module from per-column lists of values
+# of one block at a time (`csvItems` values), so that the text of the
+# whole table is never built. Compound fields and the dimensions
+# after the first are flattened into columns. Floats are written in
+# their shortest exact form, fixed-length strings decoded as UTF-8.
+# 
+# The columnar format is a directory of one .npy file per column
+# (field of a compound type, or column of a 2D selection) with
+# `columnsIndex` listing them in order, as the sidecar cache keeps
+# its entries. The index is written last, so a directory without it
+# is an incomplete export. Each column can be loaded memory-mapped
+# (see loadColumns).
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Streaming export of datasets and plotted data to CSV, .npy and
+columnar files"""
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import threading
+import numpy as np
+import h5py as h5
+
+import importer
+import profiler
+
+
+formats = ['csv', 'npy', 'columns']
+
+# Blocks read ahead of the writer
+queueBlocks = 2
+
+# Values formatted at a time for CSV
+csvItems = 1 << 18
+
+# Name of the index of a columnar export
+columnsIndex = 'columns.json'
+
+
+def plainDtype(dtype):
+    """`dtype` without the metadata h5py attaches to it (e.g. string
+    encoding), which .npy files cannot keep"""
+    dtype = np.dtype(dtype)
+    if dtype.subdtype is not None:
+        base, shape = dtype.subdtype
+        return np.dtype((plainDtype(base), shape))
+    if dtype.names is None:
+        return np.dtype(dtype.str)
+    return np.dtype({'names': list(dtype.names),
+                     'formats': [plainDtype(dtype.fields[name][0]) for name in dtype.names],
+                     'offsets': [dtype.fields[name][1] for name in dtype.names],
+                     'itemsize': dtype.itemsize})
+
+
+class DatasetSource(object):
+    """Part of `dataset` to export.
+
+    selection: tuple with an integer index, a slice (of step 1) or a
+    list of increasing indices for each dimension, the missing ones
+    taken whole. The rows are along the first dimension that is not
+    an integer index, which has to be a slice.
+
+    fields: names of the fields of a compound dataset to export, all
+    if None.
+
+    """
+    def __init__(self, dataset, selection=(), fields=None):
+        self.dataset = dataset
+        self.fields = None if fields is None else list(fields)
+        selection = tuple(selection) + (slice(None),) * (len(dataset.shape) - len(selection))
+        indices = []
+        dims = []
+        shape = []
+        for dim, (index, size) in enumerate(zip(selection, dataset.shape)):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(size)
+                if step != 1:
+                    raise ValueError('{}: cannot export slices with steps'.format(dataset.name))
+                index = slice(start, max(start, stop))
+                shape.append(index.stop - index.start)
+                dims.append(dim)
+            elif isinstance(index, (list, tuple, np.ndarray)):
+                index = [int(ii) for ii in index]
+                shape.append(len(index))
+                dims.append(dim)
+            else:
+                index = int(index)
+            indices.append(index)
+        if len(dims) > 0 and not isinstance(indices[dims[0]], slice):
+            raise ValueError('{}: the rows to export must be a range'.format(dataset.name))
+        self.selection = tuple(indices)
+        self.rowDim = dims[0] if len(dims) > 0 else None
+        dtype = dataset.dtype
+        if self.fields is not None:
+            dtype = np.dtype([(name, dtype.fields[name][0]) for name in self.fields])
+        self.dtype = dtype
+        # A single value is exported as one row
+        self.shape = tuple(shape) if len(dims) > 0 else (1,)
+        self.rows = self.shape[0]
+        self.nbytes = dtype.itemsize * int(np.prod(self.shape))
+        self.chunks = None
+        if dataset.chunks is not None and len(dims) > 0:
+            self.chunks = tuple(dataset.chunks[dim] for dim in dims)
+        self.names = None
+        if dtype.names is None and len(dims) == 2:
+            columns = indices[dims[1]]
+            if isinstance(columns, slice):
+                columns = range(columns.start, columns.stop)
+            self.names = [str(column) for column in columns]
+
+    def read(self, start, stop):
+        """Rows `start` to `stop` of the selection"""
+        fields = () if self.fields is None else tuple(self.fields)
+        if self.rowDim is None:
+            data = profiler.read(self.dataset, fields + self.selection)
+            return np.asarray(data).reshape(1)
+        selection = list(self.selection)
+        first = selection[self.rowDim].start
+        selection[self.rowDim] = slice(first + start, first + stop)
+        return profiler.read(self.dataset, fields + tuple(selection))
+
+
+class SeriesSource(object):
+    """Equally long 1D `columns`, given as a list of (name, data)
+    where data is an array, a range or a 1D dataset, exported as a
+    table with a field for each"""
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.dtype = np.dtype([(name, self.columnDtype(data))
+                               for name, data in self.columns])
+        self.rows = min(len(data) for name, data in self.columns)
+        self.shape = (self.rows,)
+        self.nbytes = self.rows * self.dtype.itemsize
+        self.chunks = None
+        self.names = None
+
+    @staticmethod
+    def columnDtype(data):
+        if isinstance(data, range):
+            return np.dtype(np.int64)
+        if isinstance(data, h5.Dataset):
+            return data.dtype
+        return np.asarray(data).dtype
+
+    def read(self, start, stop):
+        block = np.empty(stop - start, dtype=self.dtype)
+        for name, data in self.columns:
+            if isinstance(data, range):
+                block[name] = data[start: stop]
+            elif isinstance(data, h5.Dataset):
+                block[name] = profiler.read(data, slice(start, stop))
+            else:
+                block[name] = np.asarray(data)[start: stop]
+        return block
+
+
+def flatColumns(block):
+    """1D arrays for the columns of a block of rows: one for each
+    field of a compound type and each entry of the dimensions after
+    the first"""
+    if block.dtype.names is not None:
+        return [column for name in block.dtype.names
+                for column in flatColumns(block[name])]
+    flat = block.reshape(len(block), -1)
+    return [flat[:, ii] for ii in range(flat.shape[1])]
+
+
+def columnNames(dtype, shape=(), prefix=''):
+    """Names of the columns flatColumns gives for rows of `shape` and
+    `dtype`, e.g. pos[0], pos[1] for a field pos of two values"""
+    dtype = np.dtype(dtype)
+    if dtype.subdtype is not None:
+        base, subshape = dtype.subdtype
+        return columnNames(base, tuple(shape) + subshape, prefix)
+    if dtype.names is not None:
+        return [name for field in dtype.names
+                for name in columnNames(dtype.fields[field][0], shape,
+                                        prefix + '.' + field if prefix else field)]
+    return [prefix + ''.join('[{}]'.format(ii) for ii in index)
+            for index in np.ndindex(*shape)]
+
+
+def textColumn(column):
+    """Values of `column` as a list for the csv module"""
+    kind = column.dtype.kind
+    if kind == 'S':
+        try:
+            return column.astype(str).tolist()
+        except UnicodeDecodeError:
+            # astype only takes ASCII
+            return np.char.decode(column, 'utf-8', 'replace').tolist()
+    elif kind == 'O':
+        return [value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+                for value in column.tolist()]
+    elif kind == 'f' and column.dtype.itemsize < 8:
+        # Shortest text that reads back as the same float32
+        return column.astype(str).tolist()
+    elif kind == 'b':
+        return column.astype(np.uint8).tolist()
+    return column.tolist()
+
+
+class CsvWriter(object):
+    """CSV file with a header line of column names if the source has
+    them"""
+    def __init__(self, path, source, delimiter=','):
+        self.path = path
+        self.outfile = open(path, 'w', newline='')
+        self.writer = csv.writer(self.outfile, delimiter=delimiter)
+        if source.names is not None:
+            self.writer.writerow(source.names)
+        elif source.dtype.names is not None:
+            self.writer.writerow(columnNames(source.dtype, source.shape[1:]))
+
+    def write(self, block):
+        self.writer.writerows(zip(*[textColumn(column) for column in flatColumns(block)]))
+
+    def close(self):
+        self.outfile.close()
+
+    def abort(self):
+        self.outfile.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class NpyWriter(object):
+    """.npy file of `shape` and `dtype`, written a block of rows at a
+    time"""
+    def __init__(self, path, dtype, shape):
+        self.path = path
+        self.dtype = plainDtype(dtype)
+        if self.dtype.hasobject:
+            raise ValueError('{}: cannot write variable-length data to .npy'.format(path))
+        header = {'descr': np.lib.format.dtype_to_descr(self.dtype),
+                  'fortran_order': False, 'shape': tuple(shape)}
+        self.outfile = open(path, 'wb')
+        try:
+            np.lib.format.write_array_header_1_0(self.outfile, header)
+        except ValueError:
+            # Header of a compound type with many fields
+            np.lib.format.write_array_header_2_0(self.outfile, header)
+
+    def write(self, block):
+        if block.dtype != self.dtype:
+            block = block.astype(self.dtype)
+        np.ascontiguousarray(block).tofile(self.outfile)
+
+    def close(self):
+        self.outfile.close()
+
+    def abort(self):
+        self.outfile.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ColumnsWriter(object):
+    """Directory of .npy files, one per column, with an index of them
+    (see loadColumns)"""
+    def __init__(self, path, source):
+        self.path = path
+        dtype = source.dtype
+        if dtype.names is not None:
+            # Subarray fields are stored with their dimensions
+            columns = [(name, dtype.fields[name][0], lambda block, name=name: block[name])
+                       for name in dtype.names]
+        elif len(source.shape) > 1:
+            names = source.names or [str(ii) for ii in range(source.shape[1])]
+            columns = [(name, dtype, lambda block, ii=ii: block[:, ii])
+                       for ii, name in enumerate(names)]
+        else:
+            columns = [('data', dtype, lambda block: block)]
+        os.mkdir(path)
+        self.columns = []
+        self.writers = []
+        try:
+            files = set()
+            for name, columnDtype, select in columns:
+                shape = source.shape[:1] + source.shape[2 if dtype.names is None else 1:]
+                if columnDtype.subdtype is not None:
+                    columnDtype, subshape = columnDtype.subdtype
+                    shape += subshape
+                filename = re.sub(r'[^\w.-]', '_', name) or 'column'
+                while filename in files:
+                    filename += '_'
+                files.add(filename)
+                self.writers.append(NpyWriter(os.path.join(path, filename + '.npy'),
+                                              columnDtype, shape))
+                self.columns.append({'name': name, 'file': filename + '.npy',
+                                     'select': select})
+        except Exception:
+            self.abort()
+            raise
+
+    def write(self, block):
+        for column, writer in zip(self.columns, self.writers):
+            writer.write(column['select'](block))
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        with open(os.path.join(self.path, columnsIndex), 'w') as out:
+            json.dump({'columns': [{'name': column['name'], 'file': column['file']}
+                                   for column in self.columns]}, out)
+
+    def abort(self):
+        for writer in self.writers:
+            writer.outfile.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def loadColumns(path):
+    """Columns of a columnar export at `path` as a dict of name to
+    array (memory-mapped), in order"""
+    with open(os.path.join(path, columnsIndex)) as infile:
+        index = json.load(infile)
+    return {column['name']: np.load(os.path.join(path, column['file']), mmap_mode='r')
+            for column in index['columns']}
+
+
+def guessFormat(path):
+    """Format for file `path` from its extension: .npy, CSV for .csv,
+    .txt and .tsv, columns otherwise"""
+    ext = os.path.splitext(path)[1].lower()
+    return {'.npy': 'npy', '.csv': 'csv', '.txt': 'csv', '.tsv': 'csv'}.get(ext, 'columns')
+
+
+def openWriter(path, source, format, delimiter=None):
+    if format == 'csv':
+        if delimiter is None:
+            delimiter = '\t' if path.lower().endswith('.tsv') else ','
+        return CsvWriter(path, source, delimiter)
+    elif format == 'npy':
+        return NpyWriter(path, source.dtype, source.shape)
+    elif format == 'columns':
+        return ColumnsWriter(path, source)
+    raise ValueError('unknown format {}'.format(format))
+
+
+def exportData(source, path, format=None, delimiter=None, blockBytes=16*1024*1024,
+               progress=None, cancelled=None):
+    """Write `source` to `path` in `format` (one of `formats`, by
+    default `guessFormat(path)`). Returns `path`.
+
+    delimiter: for CSV, by default tab for .tsv files and comma
+    otherwise.
+
+    blockBytes: approximate amount of data read at a time for the
+    binary formats. CSV is formatted `csvItems` values at a time.
+
+    progress: callable taking (bytes of the source read, total bytes).
+
+    cancelled: callable returning True if the export should be
+    abandoned, in which case the output is deleted and None is
+    returned.
+
+    """
+    if format is None:
+        format = guessFormat(path)
+    rowBytes = source.dtype.itemsize * int(np.prod(source.shape[1:]))
+    if format == 'csv':
+        rowItems = len(columnNames(source.dtype, source.shape[1:]))
+        blockBytes = rowBytes * max(1, csvItems // max(rowItems, 1))
+    rows = importer.blockRows(source.chunks, rowBytes, blockBytes)
+    writer = openWriter(path, source, format, delimiter)
+    blocks = queue.Queue(queueBlocks)
+    failures = []
+
+    def write():
+        while True:
+            block = blocks.get()
+            if block is None:
+                return
+            if len(failures) > 0:
+                continue        # let the reader see it
+            try:
+                writer.write(block)
+            except Exception as e:
+                failures.append(e)
+
+    thread = threading.Thread(target=write, name='export writer', daemon=True)
+    thread.start()
+    stopped = False
+    try:
+        try:
+            done = 0
+            for start in range(0, source.rows, rows):
+                if len(failures) > 0:
+                    break
+                if cancelled is not None and cancelled():
+                    stopped = True
+                    break
+                block = source.read(start, min(start + rows, source.rows))
+                blocks.put(block)
+                done += block.nbytes
+                if progress is not None:
+                    progress(done, source.nbytes)
+        finally:
+            blocks.put(None)
+            thread.join()
+        if len(failures) > 0:
+            raise failures[0]
+        if stopped:
+            writer.abort()
+            return None
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    return path
+
+
+def parseSelection(text):
+    """Selection tuple from text such as 0:1000,:,5"""
+    selection = []
+    for part in text.split(','):
+        part = part.strip()
+        if ':' in part:
+            start, stop = part.split(':', 1)
+            selection.append(slice(int(start) if start else None,
+                                   int(stop) if stop else None))
+        else:
+            selection.append(int(part))
+    return tuple(selection)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Export an HDF5 dataset or part of it to CSV, .npy or columnar files')
+    parser.add_argument('infile', help='HDF5 file')
+    parser.add_argument('dataset', help='path of the dataset')
+    parser.add_argument('outfile', help='file to write, a directory for columns')
+    parser.add_argument('-f', dest='format', choices=formats, default=None,
+                        help='output format, by default from the extension of outfile')
+    parser.add_argument('-s', dest='selection', default='',
+                        help='part of the dataset, e.g. 0:1000,:,5')
+    parser.add_argument('-F', dest='fields', default=None,
+                        help='fields of a compound dataset, comma separated')
+    parser.add_argument('-d', dest='delimiter', default=None,
+                        help='CSV delimiter')
+    args = parser.parse_args(argv)
+    try:
+        with h5.File(args.infile, 'r') as fd:
+            selection = parseSelection(args.selection) if args.selection else ()
+            fields = args.fields.split(',') if args.fields else None
+            source = DatasetSource(fd[args.dataset], selection, fields)
+            start = time.perf_counter()
+            last = [start]
+
+            def report(done, total):
+                now = time.perf_counter()
+                if now - last[0] >= 1.0:
+                    last[0] = now
+                    print('{:.0f}% {:.1f} MB/s'.format(100.0 * done / max(total, 1),
+                                                      done / 1e6 / (now - start)))
+
+            exportData(source, args.outfile, args.format, args.delimiter,
+                       progress=report)
+            seconds = time.perf_counter() - start
+            print('{}: shape {} {}, {:.1f} MB in {:.1f} s ({:.1f} MB/s)'.format(
+                args.outfile, source.shape, source.dtype, source.nbytes / 1e6, seconds,
+                source.nbytes / 1e6 / max(seconds, 1e-9)))
+    except (IOError, OSError, ValueError, KeyError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# exporter.py ends here
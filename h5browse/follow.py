@@ -0,0 +1,188 @@
+# follow.py --- 
+# 
+# Filename: follow.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:13:17 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:13:17 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Following datasets that are being appended to by another process
+# (e.g. a running simulation) using HDF5 single-writer/multiple-reader
+# (SWMR) mode. The file has to be opened with swmr=True for reading,
+# which needs HDF5 >= 1.10 and a file written with libver='latest'.
+# 
+# The extent of a dataset seen by a SWMR reader is only updated on
+# refresh, so we poll the followed datasets on a timer and announce
+# the new shape. Views then read only the new tail.
+# 
+# Refreshing one handle of a dataset does not update other open
+# handles of the same dataset (they may even read wrong chunks), so
+# views must use the dataset object of the tree item rather than
+# opening their own.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Polling datasets of files opened in SWMR mode for growth"""
+
+import h5py as h5
+from qtcompat import QtCore
+
+import blockcache
+
+
+def isFollowable(dataset):
+    """True if `dataset` is in a file opened for SWMR reading"""
+    try:
+        intent = dataset.file.id.get_intent()
+    except (AttributeError, ValueError):
+        return False
+    return bool(intent & h5.h5f.ACC_SWMR_READ)
+
+
+class DatasetFollower(QtCore.QObject):
+    """Poll the extent of followed datasets every `interval` ms.
+
+    Datasets are identified by blockcache.datasetKey. Each call to
+    `follow` should be matched by a call to `unfollow`, or be tied to
+    the lifetime of an `owner` QObject.
+
+    Signals
+    -------
+
+    sigGrown(key, oldShape, newShape): emitted when the shape of the
+    dataset identified by `key` has changed.
+
+    """
+    sigGrown = QtCore.pyqtSignal(object, object, object)
+
+    def __init__(self, interval=1000, parent=None):
+        super(DatasetFollower, self).__init__(parent)
+        self.datasets = {}   # key -> [dataset, shape, number of followers]
+        self.connections = {}   # (key, id of owner) -> destroyed connections
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+
+    def setInterval(self, interval):
+        """Set polling interval in ms"""
+        self.timer.setInterval(interval)
+
+    def interval(self):
+        return self.timer.interval()
+
+    def follow(self, dataset, owner=None):
+        """Start polling `dataset`. If `owner` is a QObject, unfollow
+        when it is destroyed. Returns the key of the dataset."""
+        key = blockcache.datasetKey(dataset)
+        try:
+            self.datasets[key][2] += 1
+        except KeyError:
+            self.datasets[key] = [dataset, dataset.shape, 1]
+        if owner is not None:
+            ownerId = id(owner)
+            connection = owner.destroyed.connect(
+                lambda *args: self.ownerDestroyed(key, ownerId))
+            self.connections.setdefault((key, ownerId), []).append(connection)
+        if not self.timer.isActive():
+            self.timer.start()
+        return key
+
+    def unfollow(self, key, owner=None):
+        """Undo one `follow` of dataset `key`, with the same `owner` if
+        one was given"""
+        if owner is not None:
+            connections = self.connections.get((key, id(owner)))
+            if connections:
+                owner.destroyed.disconnect(connections.pop())
+                if len(connections) == 0:
+                    del self.connections[(key, id(owner))]
+        self.release(key)
+
+    def ownerDestroyed(self, key, ownerId):
+        connections = self.connections.get((key, ownerId))
+        if connections:
+            connections.pop()
+            if len(connections) == 0:
+                del self.connections[(key, ownerId)]
+        self.release(key)
+
+    def release(self, key):
+        entry = self.datasets.get(key)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] <= 0:
+            self.datasets.pop(key)
+        if len(self.datasets) == 0:
+            self.stop()
+
+    def stop(self):
+        try:
+            self.timer.stop()
+        except RuntimeError:
+            pass    # deleted at exit before the owners
+
+    def poll(self):
+        for key, entry in list(self.datasets.items()):
+            dataset, oldShape, _ = entry
+            try:
+                # Also clears the shape cached by h5py for read-only files
+                dataset.refresh()
+                newShape = dataset.shape
+            except (OSError, IOError, ValueError) as e:
+                # File closed under us
+                print(e)
+                self.datasets.pop(key)
+                continue
+            if newShape != oldShape:
+                entry[1] = newShape
+                self.sigGrown.emit(key, oldShape, newShape)
+        if len(self.datasets) == 0:
+            self.stop()
+
+
+_defaultFollower = None
+
+def defaultFollower():
+    """Follower shared by all views, created on first use"""
+    global _defaultFollower
+    if _defaultFollower is None:
+        _defaultFollower = DatasetFollower()
+    return _defaultFollower
+
+
+# 
+# follow.py ends here
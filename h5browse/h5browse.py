@@ -48,12 +48,12 @@
 # Code:
 
 import os
-from pyqtgraph import QtCore
-from pyqtgraph import QtGui
+import sys
+from qtcompat import (QtCore, QtGui)
 from hdftreewidget import HDFTreeWidget
-from hdfdatasetwidget import HDFDatasetWidget
-from datasetplot import (DatasetPlot, DatasetPlotParamTree)
-from pyqtgraph import FileDialog
+from searchwidget import SearchWidget
+import sidecar
+import follow
 
 
 class DataViz(QtGui.QMainWindow):
@@ -67,7 +67,7 @@ class DataViz(QtGui.QMainWindow):
 
     sigOpen: Emitted when a set of files have been selected in the open
           files dialog. Sends out the list of file paths selected and the 
-          mode string.
+          mode string ('swmr' for following files being written).
     
     sigCloseFiles: Emitted when the user triggers closeFilesAction. This
                 is passed on to the HDFTreeWidget which decides which
@@ -92,6 +92,10 @@ class DataViz(QtGui.QMainWindow):
                  that the DataViz widget can incorporate it as an mdi
                  child window.
 
+    sigDatasetStats: Emitted when datasetStatsAction is
+                  triggered. Connected to HDFTreeWidget's
+                  showStatistics function.
+
     sigPlotDataset: Emitted when plotDatasetAction is
                   triggered. Connected to HDFTreeWidget's plotDataset
                   function which creates a widget for displaying teh
@@ -103,6 +107,7 @@ class DataViz(QtGui.QMainWindow):
     sigShowAttributes = QtCore.pyqtSignal()
     sigShowDataset = QtCore.pyqtSignal()
     sigPlotDataset = QtCore.pyqtSignal()
+    sigDatasetStats = QtCore.pyqtSignal()
 
     def __init__(self, parent=None, flags=QtCore.Qt.WindowFlags(0)):
         super(DataViz, self).__init__(parent=parent, flags=flags)
@@ -113,6 +118,7 @@ class DataViz(QtGui.QMainWindow):
         self.mdiArea.subWindowActivated.connect(self.switchPlotParamPanel)
         self.setCentralWidget(self.mdiArea)
         self.createTreeDock()
+        self.createProfilerDock()
         self.createActions()
         self.createMenus()
 
@@ -131,17 +137,33 @@ class DataViz(QtGui.QMainWindow):
         if isinstance(size, QtCore.QVariant):
             size = size.toPyObject()
         self.resize(size)
+        # Disk budget for cached overviews of datasets (in MiB)
+        budget = settings.value('sidecarBudgetMB', 1024, int)
+        sidecar.defaultCache().maxBytes = budget * 1024 * 1024
+        # Polling interval for datasets in files opened in follow mode
+        interval = settings.value('followIntervalMs', 1000, int)
+        follow.defaultFollower().setInterval(interval)
 
     def writeSettings(self):
         settings = QtCore.QSettings('dataviz', 'dataviz')
         settings.setValue('lastDir', self.lastDir)
+        settings.setValue('sidecarBudgetMB',
+                          sidecar.defaultCache().maxBytes // (1024 * 1024))
+        settings.setValue('followIntervalMs', follow.defaultFollower().interval())
         settings.setValue('pos', self.pos())
         settings.setValue('size', self.size())
 
+    def createFileDialog(self, title):
+        """Create `fileDialog` for choosing HDF5 files, starting in
+        `lastDir`. pyqtgraph is imported here on first use, not at
+        startup."""
+        from pyqtgraph import FileDialog
+        self.fileDialog = FileDialog(None, title, self.lastDir,
+                                     'HDF5 file (*.h5 *.hdf);;All files (*)')
+
     def openFilesReadOnly(self, filePaths=None):
         if filePaths is None or filePaths is False:
-            self.fileDialog = FileDialog(None, 'Open file(s) read-only', self.lastDir, 
-                                                 'HDF5 file (*.h5 *.hdf);;All files (*)')
+            self.createFileDialog('Open file(s) read-only')
             self.fileDialog.show()
             self.fileDialog.filesSelected.connect(self.openFilesReadOnly)
             return
@@ -158,8 +180,7 @@ class DataViz(QtGui.QMainWindow):
     def openFilesReadWrite(self, filePaths=None):
         # print(filePaths)
         if filePaths is None or filePaths is False:
-            self.fileDialog = FileDialog(None, 'Open file(s) read/write', self.lastDir, 
-                                                 'HDF5 file (*.h5 *.hdf);;All files (*)')
+            self.createFileDialog('Open file(s) read/write')
             self.fileDialog.filesSelected.connect(self.openFilesReadWrite)
             self.fileDialog.show()
             return
@@ -173,10 +194,24 @@ class DataViz(QtGui.QMainWindow):
         # TODO handle recent files
         self.sigOpen.emit(filePaths, 'r+')
 
+    def openFilesFollow(self, filePaths=None):
+        """Open files for reading while another process writes to them
+        in SWMR mode. Open plots and tables are updated as the
+        datasets grow."""
+        if filePaths is None or filePaths is False:
+            self.createFileDialog('Follow file(s)')
+            self.fileDialog.filesSelected.connect(self.openFilesFollow)
+            self.fileDialog.show()
+            return
+        filePaths = [str(path) for path in filePaths]
+        if len(filePaths) == 0:
+            return
+        self.lastDir = QtCore.QFileInfo(filePaths[-1]).dir().absolutePath()
+        self.sigOpen.emit(filePaths, 'swmr')
+
     def openFileOverwrite(self, filePath=None, startDir=None):
         if filePath is None or filePaths is False:
-            self.fileDialog = FileDialog(None, 'Open file(s) read/write', self.lastDir, 
-                                                 'HDF5 file (*.h5 *.hdf);;All files (*)')
+            self.createFileDialog('Open file(s) read/write')
             self.fileDialog.show()
             self.fileDialog.fileSelected.connect(self.openFileOverwrite)
             return
@@ -191,8 +226,7 @@ class DataViz(QtGui.QMainWindow):
 
     def createFile(self, filePath=None, startDir=None):
         if filePath is None or filePaths is False:
-            self.fileDialog = FileDialog(None, 'Open file(s) read/write', self.lastDir, 
-                                                 'HDF5 file (*.h5 *.hdf);;All files (*)')
+            self.createFileDialog('Open file(s) read/write')
             self.fileDialog.show()
             self.fileDialog.fileSelected.connect(self.createFile)
             return
@@ -217,6 +251,11 @@ class DataViz(QtGui.QMainWindow):
             # shortcut=QtGui.QKeySequence.Open,
             statusTip='Open an HDF5 file for editing',
             triggered=self.openFilesReadWrite)
+        self.openFileFollowAction = QtGui.QAction(
+            QtGui.QIcon(), 'Follow file(s) being written', self,
+            statusTip='Open HDF5 files written in SWMR mode and follow'
+            ' the growing datasets',
+            triggered=self.openFilesFollow)
         self.openFileOverwriteAction = QtGui.QAction(
             QtGui.QIcon(), 'Overwrite file', self,
             # shortcut=QtGui.QKeySequence.Open,
@@ -253,12 +292,22 @@ class DataViz(QtGui.QMainWindow):
             shortcut=QtGui.QKeySequence(QtCore.Qt.ALT + QtCore.Qt.Key_P),
             statusTip='Plot dataset',
             triggered=self.sigPlotDataset)
+        self.datasetStatsAction = QtGui.QAction(
+            QtGui.QIcon(), 'Dataset statistics', self,
+            statusTip='Compute summary statistics and histogram of dataset',
+            triggered=self.sigDatasetStats)
+        self.findAction = QtGui.QAction(
+            QtGui.QIcon(), '&Find', self,
+            shortcut=QtGui.QKeySequence.Find,
+            statusTip='Search the paths, types and attributes of the open files',
+            triggered=self.showSearch)
         
     def createMenus(self):
         self.menuBar().setVisible(True)
         self.fileMenu = self.menuBar().addMenu('&File')
         self.fileMenu.addAction(self.openFileReadWriteAction)
         self.fileMenu.addAction(self.openFileReadOnlyAction)
+        self.fileMenu.addAction(self.openFileFollowAction)
         self.fileMenu.addAction(self.openFileOverwriteAction)
         self.fileMenu.addAction(self.createFileAction)
         self.fileMenu.addAction(self.closeFileAction)
@@ -266,17 +315,30 @@ class DataViz(QtGui.QMainWindow):
         self.editMenu = self.menuBar().addMenu('&Edit')
         self.editMenu.addAction(self.tree.insertDatasetAction)
         self.editMenu.addAction(self.tree.insertGroupAction)
+        self.editMenu.addAction(self.tree.importDataAction)
+        self.editMenu.addAction(self.tree.repackAction)
         self.editMenu.addAction(self.tree.deleteNodeAction)
+        self.editMenu.addAction(self.findAction)
         self.viewMenu = self.menuBar().addMenu('&View')        
         self.viewMenu.addAction(self.treeDock.toggleViewAction())
+        self.viewMenu.addAction(self.profilerDock.toggleViewAction())
         self.dataMenu = self.menuBar().addMenu('&Data')
         self.dataMenu.addAction(self.showAttributesAction)
         self.dataMenu.addAction(self.showDatasetAction)
         self.dataMenu.addAction(self.plotDatasetAction)
+        self.dataMenu.addAction(self.tree.showImageAction)
+        self.dataMenu.addAction(self.datasetStatsAction)
+        self.dataMenu.addAction(self.tree.synapseStatsAction)
 
     def createTreeDock(self):
         self.treeDock = QtGui.QDockWidget('File tree', self)
-        self.tree = HDFTreeWidget(parent=self.treeDock)
+        treePanel = QtGui.QWidget(self.treeDock)
+        self.tree = HDFTreeWidget(parent=treePanel)
+        self.searchWidget = SearchWidget(self.tree, parent=treePanel)
+        layout = QtGui.QVBoxLayout(treePanel)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.searchWidget)
+        layout.addWidget(self.tree, 1)
         self.sigOpen.connect(self.tree.openFiles)
         self.tree.doubleClicked.connect(self.tree.createDatasetWidget)
         self.tree.sigDatasetWidgetCreated.connect(self.addMdiChildWindow)
@@ -286,15 +348,52 @@ class DataViz(QtGui.QMainWindow):
         self.tree.sigPlotWidgetCreated.connect(self.addMdiChildWindow)
         self.tree.sigPlotWidgetClosed.connect(self.closeMdiChildWindow)
         self.tree.sigPlotParamTreeCreated.connect(self.addPanelBelow)
+        self.tree.sigStatsWidgetCreated.connect(self.addMdiChildWindow)
+        self.tree.sigStatsWidgetClosed.connect(self.closeMdiChildWindow)
+        self.tree.sigImageWidgetCreated.connect(self.addMdiChildWindow)
+        self.tree.sigImageWidgetClosed.connect(self.closeMdiChildWindow)
         self.tree.sigDataWidgetActivated.connect(self.activateDataWindow)
         # pipe signals of dataviz to those of hdftree widget
         self.sigShowAttributes.connect(self.tree.showAttributes)
         self.sigShowDataset.connect(self.tree.showDataset)
         self.sigPlotDataset.connect(self.tree.plotDataset)
+        self.sigDatasetStats.connect(self.tree.showStatistics)
         self.sigCloseFiles.connect(self.tree.closeFiles)
-        self.treeDock.setWidget(self.tree)
+        self.tree.model().sigOpenProgress.connect(self.showOpenProgress)
+        self.tree.model().sigFileOpenFailed.connect(self.showOpenFailure)
+        self.treeDock.setWidget(treePanel)
         self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, self.treeDock)
 
+    def createProfilerDock(self):
+        """Dock with the I/O and timing counters (see profiler.py),
+        hidden until shown from the View menu. The panel in it is
+        created when it is first shown."""
+        self.profilerDock = QtGui.QDockWidget('Profiler', self)
+        self.profilerWidget = None
+        self.profilerDock.visibilityChanged.connect(self.createProfilerWidget)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.profilerDock)
+        self.profilerDock.hide()
+
+    def createProfilerWidget(self, visible):
+        if not visible or self.profilerWidget is not None:
+            return
+        from profilerwidget import ProfilerWidget
+        self.profilerWidget = ProfilerWidget(parent=self.profilerDock)
+        self.profilerDock.setWidget(self.profilerWidget)
+
+    def showSearch(self):
+        self.treeDock.show()
+        self.searchWidget.focusSearch()
+
+    def showOpenProgress(self, done, total):
+        if done < total:
+            self.statusBar().showMessage('Opening files: {} of {} done'.format(done, total))
+        else:
+            self.statusBar().showMessage('Opened {} file(s)'.format(total), 5000)
+
+    def showOpenFailure(self, path, message):
+        self.statusBar().showMessage('Could not open {}: {}'.format(path, message), 10000)
+
     def addMdiChildWindow(self, widget):
         if widget is not None:
             subwin = self.mdiArea.addSubWindow(widget)
@@ -332,12 +431,14 @@ class DataViz(QtGui.QMainWindow):
         approach.
 
         """
-        if subwin is None:
+        # There are no plots before datasetplot is first imported
+        datasetplot = sys.modules.get('datasetplot')
+        if subwin is None or datasetplot is None:
             return
         for dockWidget in self.findChildren(QtGui.QDockWidget):
             # All dockwidgets that contain paramtrees must be checked
-            if isinstance(dockWidget.widget(), DatasetPlotParamTree):
-                if isinstance(subwin.widget(), DatasetPlot) and \
+            if isinstance(dockWidget.widget(), datasetplot.DatasetPlotParamTree):
+                if isinstance(subwin.widget(), datasetplot.DatasetPlot) and \
                    dockWidget.widget() in subwin.widget().paramsToPlots:
                     dockWidget.setVisible(True)
                 else:
@@ -349,10 +450,13 @@ class DataViz(QtGui.QMainWindow):
         
 
 def main():
-    import sys
     app = QtGui.QApplication(sys.argv)
     window = DataViz()
     window.show()
+    # Files given on the command line are opened read-only
+    filePaths = [str(arg) for arg in app.arguments()[1:]]
+    if len(filePaths) > 0:
+        window.openFilesReadOnly(filePaths)
     app.exec_()
     # fixed segfaults at exit:
     # http://python.6.x6.nabble.com/Application-crash-on-exit-under-Linux-td5067510.html
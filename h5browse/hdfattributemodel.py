@@ -47,18 +47,83 @@
 
 import numpy as np
 import h5py as h5
-from pyqtgraph import (QtCore, QtGui)
+from qtcompat import (QtCore, QtGui)
 
 class HDFAttributeModel(QtCore.QAbstractTableModel):
-    """Model class to handle HDF5 attributes of an HDF5 object"""
+    """Model class to handle HDF5 attributes of an HDF5 object.
+
+    All attributes are read once when the node is set and the model
+    serves the views from this snapshot. The display text of values
+    longer than `maxChars` characters is truncated.
+
+    """
     columns = ['Attribute name', 'Value', 'Type']
+    maxChars = 1000
+
     def __init__(self, node, parent=None):
         """`node` is an HDF5 object"""
         super(HDFAttributeModel, self).__init__(parent=parent)
+        self.node = None
+        self.rows = []
+        self.setNode(node)
+
+    def setNode(self, node):
+        """Set the HDF5 object and take a snapshot of its attributes"""
+        rows = [self.attributeEntry(node, name) for name in node.attrs.keys()]
+        self.beginResetModel()
         self.node = node
+        self.rows = rows
+        self.endResetModel()
+
+    def attributeEntry(self, node, name):
+        """Return (name, value text, type text, tooltip) for attribute
+        `name` of `node`. An attribute that cannot be read or
+        displayed gets '<ERROR>' as value text and the error message
+        as tooltip."""
+        try:
+            return self.formatAttribute(node, name)
+        except Exception as e:
+            print(e)
+            return (name, '<ERROR>', '', str(e))
+
+    def formatAttribute(self, node, name):
+        """Entry for `attributeEntry`, raising on failure"""
+        try:
+            aid = node.attrs.get_id(name)
+            dtype, shape = aid.dtype, aid.shape
+        except (OSError, IOError, KeyError) as e:
+            print(e)
+            dtype, shape = None, None
+        try:
+            value = node.attrs[name]
+        except (OSError, IOError) as e:
+            value = '<ERROR>'
+            print(e)
+        if isinstance(value, bytes) or isinstance(value, np.bytes_):
+            text = value.decode(errors='replace')
+        elif isinstance(value, np.ndarray) and value.dtype.type == np.bytes_:
+            text = str([entry.decode(errors='replace') for entry in value])
+        else:
+            text = str(value)
+        if len(text) > self.maxChars:
+            text = text[:self.maxChars] + ' ...'
+        typeinfo = type(value).__name__
+        if isinstance(value, np.ndarray): 
+            typeinfo += ' of {}'.format(value.dtype)
+            tooltip = '{}: {}'.format(value.dtype, value.shape)
+        elif isinstance(value, h5.Reference):
+            if isinstance(value, h5.RegionReference):
+                tooltip = 'RegionRef: {}'.format(shape)
+            else:
+                tooltip = 'ObjectRef: {}'.format(shape)
+        elif value is not None:
+            tooltip = '{}'.format(type(value).__name__)
+        else:
+            tooltip = '{}: {}'.format(dtype, shape)
+        return (name, text, typeinfo, tooltip)
         
     def rowCount(self, index):
-        return len(self.node.attrs)
+        return len(self.rows)
 
     def columnCount(self, index):
         return len(HDFAttributeModel.columns)
@@ -75,42 +140,18 @@ class HDFAttributeModel(QtCore.QAbstractTableModel):
 
         """
         if (not index.isValid()) or \
-           (role not in (QtCore.Qt.ToolTipRole, QtCore.Qt.DisplayRole)):
+           (role not in (QtCore.Qt.ToolTipRole, QtCore.Qt.DisplayRole)) or \
+           index.row() >= len(self.rows):
             return None              
-        for ii, name in enumerate(self.node.attrs):
-            if ii == index.row():
-                break
-        if role == QtCore.Qt.DisplayRole and index.column() == 0:
+        name, text, typeinfo, tooltip = self.rows[index.row()]
+        if role == QtCore.Qt.ToolTipRole:
+            return tooltip
+        if index.column() == 0:
             return name
-        value = None
-        try:
-            value = self.node.attrs[name]
-        except (OSError, IOError) as e:
-            value = '<ERROR>'
-            print(e)
-        if role == QtCore.Qt.DisplayRole:
-            if index.column() == 1:                
-                if isinstance(value, bytes) or isinstance(value, np.string_):
-                    return value.decode()
-                elif isinstance(value, np.ndarray) and value.dtype.type == np.string_:
-                    return str([entry.decode() for entry in value])                    
-                return str(value)
-            elif index.column() == 2:
-                tinfo = type(value).__name__
-                if isinstance(value, np.ndarray): 
-                    tinfo += ' of {}'.format(value.dtype)
-                return tinfo
-        elif role == QtCore.Qt.ToolTipRole:
-            if isinstance(value, np.ndarray):
-                return '{}: {}'.format(value.dtype, value.shape)
-            elif isinstance(value, h5.Reference):
-                if value.typecode == 0:
-                    return 'ObjectRef: {}'.format(aid.shape)
-                else:
-                    return 'RegionRef: {}'.format(aid.shape)
-            if value is not None:
-                return '{}'.format(type(value).__name__)
-            return '{}: {}'.format(aid.dtype.name, aid.shape)
+        elif index.column() == 1:
+            return text
+        elif index.column() == 2:
+            return typeinfo
         return None
 
 
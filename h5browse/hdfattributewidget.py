@@ -46,7 +46,7 @@
 
 # Code:
 
-from pyqtgraph import (QtCore, QtGui)
+from qtcompat import (QtCore, QtGui)
 
 from hdfattributemodel import HDFAttributeModel
 
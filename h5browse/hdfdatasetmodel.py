@@ -46,8 +46,12 @@
 # Code:
 """Models for HDF5 datasets"""
 
+import itertools
+import numpy as np
 import h5py as h5
-from pyqtgraph import QtCore
+from qtcompat import QtCore
+
+import blockcache
 
 
 def datasetType(dataset):
@@ -64,10 +68,47 @@ def datasetType(dataset):
         return 'nd'
 
 
+# Returned by cellValue while the block holding the cell is being
+# loaded in the background
+PENDING = object()
+
+
+class LoadError(object):
+    """Returned by cellValue for the cells of a block that could not
+    be loaded in the background"""
+    def __init__(self, message):
+        self.message = message
+
+
 class HDFDatasetModel(QtCore.QAbstractTableModel):
-    def __init__(self, dataset, parent=None):
+    """Base class for dataset models.
+
+    The cell values are read through a block cache (by default the
+    one shared by all models, `blockcache.defaultCache`) so that each
+    chunk is read from the file once instead of once per cell.
+
+    By default missing blocks are read synchronously. After
+    `setPrefetcher` they are loaded in the background instead and the
+    cells show a placeholder until then. The shape of the dataset is
+    kept in `shape` so that the views can query the model without
+    waiting on h5py while a worker thread is reading.
+
+    For datasets that grow while being viewed (see follow.py), the
+    shape is updated in `datasetGrown` and the views get the new rows
+    and columns as insertions.
+
+    """
+    def __init__(self, dataset, parent=None, cache=None):
         super(HDFDatasetModel, self).__init__(parent=parent)
         self.dataset = dataset
+        self.shape = dataset.shape
+        if cache is None:
+            cache = blockcache.defaultCache
+        self.cache = cache
+        self.datasetKey = blockcache.datasetKey(dataset)
+        self.cacheKey = self.datasetKey
+        self.cache.blockShape(dataset, self.cacheKey)
+        self.prefetcher = None
 
     def rowCount(self, index):
         raise NotImplementedError('This must be implemented in subclass')
@@ -75,6 +116,132 @@ class HDFDatasetModel(QtCore.QAbstractTableModel):
     def columnCount(self, index):
         raise NotImplementedError('This must be implemented in subclass')
 
+    def selection(self, rows=None, columns=None):
+        """Part of the dataset shown in `rows` (a slice) and `columns`
+        (a list of increasing indices) of the table, None for all, e.g.
+        for exporter.DatasetSource. Returns the selection tuple and the
+        fields of a compound dataset (None for all)."""
+        raise NotImplementedError('This must be implemented in subclass')
+
+    def setPrefetcher(self, prefetcher):
+        """Load blocks asynchronously through `prefetcher` (a
+        prefetch.BlockPrefetcher). None restores synchronous reads."""
+        if self.prefetcher is not None:
+            self.prefetcher.sigBlockLoaded.disconnect(self.blockLoaded)
+            self.prefetcher.sigBlockFailed.disconnect(self.blockFailed)
+        self.prefetcher = prefetcher
+        if prefetcher is not None:
+            prefetcher.sigBlockLoaded.connect(self.blockLoaded)
+            prefetcher.sigBlockFailed.connect(self.blockFailed)
+
+    def cellValue(self, *index):
+        """Return the element of the dataset at `index` via the cache.
+
+        With a prefetcher, returns PENDING and queues the block if it
+        is not cached yet, or a LoadError if loading it failed.
+
+        """
+        if self.prefetcher is None:
+            return self.cache.getValue(self.dataset, self.cacheKey, index)
+        block, offset = self.cache.blockIndex(self.dataset, self.cacheKey, index)
+        data = self.cache.peekBlock(self.cacheKey, block)
+        if data is None:
+            error = self.prefetcher.failure(self.cacheKey, block)
+            if error is not None:
+                return LoadError(error)
+            self.prefetcher.request(self.dataset, self.cacheKey, block)
+            return PENDING
+        return data[offset]
+
+    def prefetchRange(self, rows, columns):
+        """Queue loading of the blocks covering the cells in `rows` and
+        `columns`, each an inclusive (first, last) pair. Queued blocks
+        of this dataset outside the range are dropped."""
+        if self.prefetcher is None or len(self.shape) == 0:
+            return
+        blockShape = self.cache.blockShape(self.dataset, self.cacheKey)
+        ranges = [range(rows[0] // blockShape[0], rows[1] // blockShape[0] + 1)]
+        if len(blockShape) > 1:
+            ranges.append(range(columns[0] // blockShape[1],
+                                columns[1] // blockShape[1] + 1))
+        blocks = list(itertools.product(*ranges))
+        self.prefetcher.retain(self.cacheKey, blocks)
+        for block in blocks:
+            self.prefetcher.request(self.dataset, self.cacheKey, block)
+
+    def blockLoaded(self, key, block):
+        """Update the views after a block of this dataset is loaded"""
+        if key != self.cacheKey:
+            return
+        if len(block) == 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(0, 0))
+            return
+        blockShape = self.cache.blockShape(self.dataset, self.cacheKey)
+        first = block[0] * blockShape[0]
+        last = min(first + blockShape[0], self.rowCount(None)) - 1
+        if len(block) > 1:
+            left = block[1] * blockShape[1]
+            right = min(left + blockShape[1], self.columnCount(None)) - 1
+        else:
+            left, right = 0, self.columnCount(None) - 1
+        self.dataChanged.emit(self.index(first, left),
+                              self.index(last, right))
+
+    def blockFailed(self, key, block, message):
+        """Show the error in the cells of a block that failed to load"""
+        self.blockLoaded(key, block)
+
+    def datasetGrown(self, key, oldShape, newShape):
+        """Update the model after the dataset identified by `key` has
+        changed shape from `oldShape` to `newShape`.
+
+        Rows or columns appended along one axis are announced as
+        insertions. Any other change resets the model.
+
+        """
+        if key != self.datasetKey or newShape == self.shape:
+            return
+        self.cache.invalidateEdge(self.cacheKey)
+        if self.prefetcher is not None:
+            self.prefetcher.forget(self.cacheKey)
+        oldShape = self.shape
+        oldRows, oldColumns = self.rowCount(None), self.columnCount(None)
+        self.shape = newShape
+        rows, columns = self.rowCount(None), self.columnCount(None)
+        self.shape = oldShape
+        grown = [new > old for new, old in zip(newShape, oldShape)]
+        shrunk = [new < old for new, old in zip(newShape, oldShape)]
+        if any(shrunk) or sum(grown) > 1:
+            self.beginResetModel()
+            self.shape = newShape
+            self.endResetModel()
+        elif rows > oldRows:
+            self.beginInsertRows(QtCore.QModelIndex(), oldRows, rows - 1)
+            self.shape = newShape
+            self.endInsertRows()
+        elif columns > oldColumns:
+            self.beginInsertColumns(QtCore.QModelIndex(), oldColumns, columns - 1)
+            self.shape = newShape
+            self.endInsertColumns()
+        else:
+            # Grown along a dimension that is not displayed
+            self.shape = newShape
+
+    def formatData(self, _data, role):
+        """Return the display text or tooltip for cell value `_data`"""
+        if _data is PENDING:
+            if role == QtCore.Qt.ToolTipRole:
+                return 'Loading ...'
+            return '...'
+        if isinstance(_data, LoadError):
+            if role == QtCore.Qt.ToolTipRole:
+                return 'Could not read: {}'.format(_data.message)
+            return '<error>'
+        _data, typename = self.extractDataType(_data)
+        if role == QtCore.Qt.ToolTipRole:
+            return typename
+        return str(_data)
+
     def extractDataType(self, data):
         typename = type(data).__name__
         if isinstance(data, h5.Reference):            
@@ -101,15 +268,15 @@ class ScalarDatasetModel(HDFDatasetModel):
         if (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.ToolTipRole) \
            or (not index.isValid()):
             return None
-        _data = self.dataset[()] # scalar data
-        _data, typename = self.extractDataType(_data)
-        if role == QtCore.Qt.ToolTipRole:
-            return typename
-        return str(_data)
+        _data = self.cellValue() # scalar data
+        return self.formatData(_data, role)
    
     def rawData(self, index=None):
         return self.dataset[()]
 
+    def selection(self, rows=None, columns=None):
+        return (), None
+
     def headerData(self, section, orientation, role):
         if role != QtCore.Qt.DisplayRole:
             return None
@@ -121,7 +288,7 @@ class OneDDatasetModel(HDFDatasetModel):
         super(OneDDatasetModel, self).__init__(dataset, parent)
 
     def rowCount(self, index):
-        return self.dataset.shape[0]
+        return self.shape[0]
 
     def columnCount(self, index):
         return 1
@@ -134,13 +301,10 @@ class OneDDatasetModel(HDFDatasetModel):
     def data(self, index, role):
         if (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.ToolTipRole) \
            or (not index.isValid())  \
-           or (index.row() > self.dataset.shape[0]):
+           or (index.row() >= self.shape[0]):
             return None
-        _data = self.dataset[index.row()]
-        _data, typename = self.extractDataType(_data)
-        if role == QtCore.Qt.ToolTipRole:
-            return typename
-        return str(_data)
+        _data = self.cellValue(index.row())
+        return self.formatData(_data, role)
 
     def rawData(self, index=None):
         """Select raw data from dataset as numpy array"""
@@ -148,53 +312,68 @@ class OneDDatasetModel(HDFDatasetModel):
             return np.asarray(self.dataset)
         return self.dataset[index]
 
+    def selection(self, rows=None, columns=None):
+        return (wholeIfNone(rows),), None
+
 
 class CompoundDatasetModel(HDFDatasetModel):
+    """Model for compound (table) datasets.
+
+    Whole records are read in row blocks through the cache and the
+    field for a column is picked from the cached record. Reading
+    `dataset[colname]` would read the entire column for each cell.
+
+    """
     def __init__(self, dataset, parent=None):
         super(CompoundDatasetModel, self).__init__(dataset, parent)
+        self.names = dataset.dtype.names
 
     def rowCount(self, index):
-        return self.dataset.shape[0]
+        return self.shape[0]
 
     def columnCount(self, index):
-        return len(self.dataset.dtype.names)
+        return len(self.names)
 
     def headerData(self, section, orientation, role):
         if role != QtCore.Qt.DisplayRole:
             return None
         if orientation == QtCore.Qt.Vertical:
             return section
-        names = self.dataset.dtype.names
+        names = self.names
         if names != None and section < len(names):
             return names[section]
         return section
 
     def data(self, index, role):
         if (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.ToolTipRole) \
-           or (not index.isValid()):
+           or (not index.isValid()) \
+           or (index.row() >= self.shape[0]):
             return None
-        colname = self.dataset.dtype.names[index.column()]
-        _data = self.dataset[colname][index.row()]
-        _data, typename = self.extractDataType(_data)
-        if role == QtCore.Qt.ToolTipRole:
-            return typename
-        return str(_data)
+        colname = self.names[index.column()]
+        _data = self.cellValue(index.row())
+        if _data is not PENDING and not isinstance(_data, LoadError):
+            _data = _data[colname]
+        return self.formatData(_data, role)
 
     def rawData(self, index=None):
         if index is None:
             return np.asarray(self.dataset)
         return self.dataset[index]
 
+    def selection(self, rows=None, columns=None):
+        fields = None if columns is None else [self.names[ii] for ii in columns]
+        return (wholeIfNone(rows),), fields
+
 
 class TwoDDatasetModel(HDFDatasetModel):
     def __init__(self, dataset, parent=None):
         super(TwoDDatasetModel, self).__init__(dataset, parent)
 
     def rowCount(self, index):
-        return self.dataset.shape[0]
+        return self.shape[0]
 
     def columnCount(self, index):
-        return self.dataset.shape[1]
+        return self.shape[1]
 
     def headerData(self, section, orientation, role):
         if role != QtCore.Qt.DisplayRole:
@@ -204,14 +383,11 @@ class TwoDDatasetModel(HDFDatasetModel):
     def data(self, index, role):
         if (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.ToolTipRole) \
            or (not index.isValid())  \
-           or (index.row() > self.dataset.shape[0]) \
-           or (index.column() > self.dataset.shape[1]):
+           or (index.row() >= self.shape[0]) \
+           or (index.column() >= self.shape[1]):
             return None
-        _data = self.dataset[index.row(), index.column()]
-        _data, typename = self.extractDataType(_data)
-        if role == QtCore.Qt.ToolTipRole:
-            return typename
-        return str(_data)
+        _data = self.cellValue(index.row(), index.column())
+        return self.formatData(_data, role)
 
     def rawData(self, index=None):
         """Select raw data from dataset as numpy array"""
@@ -219,6 +395,9 @@ class TwoDDatasetModel(HDFDatasetModel):
             return np.asarray(self.dataset)
         return self.dataset[index]
 
+    def selection(self, rows=None, columns=None):
+        return (wholeIfNone(rows), indexRange(columns)), None
+
 
 # Create a subclass for 2D view of N-D datasets to separate the logic
 # from 1D and 2D datasets, which are expected to be more common. In
@@ -239,31 +418,77 @@ class NDDatasetModel(HDFDatasetModel):
 
     The argiments should come from user input (a popout dialog).
 
+    The plane is not read up front. Cells are read through the block
+    cache in blocks that grow along the two displayed dimensions but
+    span only one chunk along the others. Thus moving a fixed index
+    within the same chunk is served from the cached blocks, and only
+    the blocks for the visible part of the plane are ever read.
+
     """
     def __init__(self, dataset, parent=None, pos=()):
         super(NDDatasetModel, self).__init__(dataset, parent=parent)
+        self.rowDim, self.colDim = None, None
         self.select2D(pos)
         
     def rowCount(self, index):
-        return self.data2D.shape[0]
+        return self.shape[self.rowDim]
 
     def columnCount(self, index):
-        return self.data2D.shape[1]
+        return self.shape[self.colDim]
 
     def headerData(self, section, orientation, role):
         if role != QtCore.Qt.DisplayRole:
             return None
         return section
 
+    def datasetIndex(self, row, column):
+        """Index into the N-D dataset for cell (row, column)"""
+        index = list(self.indices)
+        index[self.rowDim] = row
+        index[self.colDim] = column
+        return index
+
     def data(self, index, role):
         if (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.ToolTipRole) or (not index.isValid()) \
-           or index.row() < 0 or index.row() > self.data2D.shape[0]:
+           or index.row() < 0 or index.row() >= self.rowCount(None) \
+           or index.column() >= self.columnCount(None):
             return None
-        _data = self.data2D[index.row(), index.column()]
-        _data, typename = self.extractDataType(_data)
-        if role == QtCore.Qt.ToolTipRole:
-            return typename
-        return str(_data)
+        _data = self.cellValue(*self.datasetIndex(index.row(), index.column()))
+        return self.formatData(_data, role)
+
+    def planeBlock(self, rowBlock, colBlock):
+        """Index of the block containing row block `rowBlock` and column
+        block `colBlock` of the current plane"""
+        blockShape = self.cache.blockShape(self.dataset, self.cacheKey)
+        block = [idx // size if not isinstance(idx, slice) else 0
+                 for idx, size in zip(self.indices, blockShape)]
+        block[self.rowDim] = rowBlock
+        block[self.colDim] = colBlock
+        return tuple(block)
+
+    def prefetchRange(self, rows, columns):
+        if self.prefetcher is None:
+            return
+        blockShape = self.cache.blockShape(self.dataset, self.cacheKey)
+        rowSize, colSize = blockShape[self.rowDim], blockShape[self.colDim]
+        blocks = [self.planeBlock(rr, cc)
+                  for rr in range(rows[0] // rowSize, rows[1] // rowSize + 1)
+                  for cc in range(columns[0] // colSize, columns[1] // colSize + 1)]
+        self.prefetcher.retain(self.cacheKey, blocks)
+        for block in blocks:
+            self.prefetcher.request(self.dataset, self.cacheKey, block)
+
+    def blockLoaded(self, key, block):
+        if key != self.cacheKey:
+            return
+        if block != self.planeBlock(block[self.rowDim], block[self.colDim]):
+            return  # block for another position of the fixed indices
+        blockShape = self.cache.blockShape(self.dataset, self.cacheKey)
+        first = block[self.rowDim] * blockShape[self.rowDim]
+        last = min(first + blockShape[self.rowDim], self.rowCount(None)) - 1
+        left = block[self.colDim] * blockShape[self.colDim]
+        right = min(left + blockShape[self.colDim], self.columnCount(None)) - 1
+        self.dataChanged.emit(self.index(first, left), self.index(last, right))
 
     def select2D(self, pos):
         """Select data for specified indices on each dimension except the two
@@ -278,30 +503,70 @@ class NDDatasetModel(HDFDatasetModel):
         Thus pos=(1, 1, '*', 1, '*') on a 5D dataset will select the
         third and the fifth dimension (counting from 1).
 
+        Only the selection is recorded here, nothing is read from the
+        file. If the displayed dimensions stay the same, the views are
+        just asked to repaint and fetch the visible cells for the new
+        position.
+
         """
         pos = list(pos)
         if len(pos) < 2: # too few positions, include XY
-            pos = [slice(0, self.dataset.shape[0]),
-                   slice(0, self.dataset.shape[1])] #! why access shape[1] before verifying 
+            pos = [slice(0, self.shape[0]),
+                   slice(0, self.shape[1])] #! why access shape[1] before verifying 
         indices = []        
-        ndim = len(self.dataset.shape)  # h5py does not implement ndim attribute for datasets
+        ndim = len(self.shape)  # h5py does not implement ndim attribute for datasets
         if ndim < len(pos):
             pos = pos[:ndim]
         elif ndim > len(pos):
             pos += [0] * (ndim - len(pos))
-        for idx, dimsize in zip(pos, self.dataset.shape):
-            if isinstance(idx, int):
-                indices.append(idx)
+        for idx, dimsize in zip(pos, self.shape):
+            # Positions from numpy (searchsorted, spin boxes) are np.integer
+            if isinstance(idx, (int, np.integer)):
+                indices.append(int(idx))
             else:
                 indices.append(slice(0, dimsize))
+        dims = [ii for ii, idx in enumerate(indices) if isinstance(idx, slice)]
+        if len(dims) != 2:
+            raise ValueError('Exactly two dimensions must be selected for display. Got {}'.format(pos))
         self.indices = tuple(indices)
-        self.data2D = self.dataset[self.indices]
+        if (self.rowDim, self.colDim) == tuple(dims):
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(self.rowCount(None) - 1,
+                                             self.columnCount(None) - 1))
+            return
+        self.beginResetModel()
+        self.rowDim, self.colDim = dims
+        self.cacheKey = blockcache.datasetKey(self.dataset) + (tuple(dims),)
+        self.cache.blockShape(self.dataset, self.cacheKey, dims=dims)
+        self.endResetModel()
 
     def rawData(self, index=None):
         if index is None:
-            return self.data2D
+            return self.dataset[self.indices]
         return self.dataset[index]
 
+    def selection(self, rows=None, columns=None):
+        """Selection of the current plane, or part of it"""
+        indices = list(self.indices)
+        indices[self.rowDim] = wholeIfNone(rows)
+        indices[self.colDim] = indexRange(columns)
+        return tuple(indices), None
+
+
+def wholeIfNone(index):
+    return slice(None) if index is None else index
+
+
+def indexRange(indices):
+    """Slice for a list of consecutive `indices`, which h5py reads as
+    a hyperslab, else the list. None for all."""
+    if indices is None:
+        return slice(None)
+    indices = list(indices)
+    if indices == list(range(indices[0], indices[-1] + 1)):
+        return slice(indices[0], indices[-1] + 1)
+    return indices
+
 
 def create_default_model(dataset, parent=None, pos=()):
     """Create a model suitable for a given HDF5 dataset.
@@ -320,13 +585,12 @@ def create_default_model(dataset, parent=None, pos=()):
     elif dsetType == '2d':
         return TwoDDatasetModel(dataset, parent=parent)
     else:
-        return NDDatasetModel(dataset, parent=parent, pos=())
+        return NDDatasetModel(dataset, parent=parent, pos=pos)
         
 
-from pyqtgraph import QtGui    
-
 if __name__ == '__main__':
     import sys
+    from qtcompat import QtGui
     app = QtGui.QApplication(sys.argv)
     window = QtGui.QMainWindow()
     tabview = QtGui.QTableView(window)
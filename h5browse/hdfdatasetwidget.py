@@ -45,12 +45,17 @@
 
 # Code:
 
-from pyqtgraph import (QtCore, QtGui)
+import time
+from qtcompat import (QtCore, QtGui)
 
 from hdfdatasetmodel import (HDFDatasetModel, OneDDatasetModel,
                              TwoDDatasetModel, NDDatasetModel,
                              CompoundDatasetModel, ScalarDatasetModel,
                              create_default_model)
+import prefetch
+import follow
+import datasetstats
+import profiler
 
 class HDFDatasetWidget(QtGui.QTableView):
     """Convenience widget to display HDF datasets.
@@ -59,20 +64,162 @@ class HDFDatasetWidget(QtGui.QTableView):
     assigns filename:datasetname to its `name` field which is used by
     main window to set the window title of this subwindow.
 
+    The blocks of the dataset are loaded in the background by the
+    shared prefetcher. Whenever the view scrolls or is resized, the
+    blocks covering the visible cells plus one page ahead in the
+    direction of scrolling are requested. When scrolling fast, the
+    lookahead is extended by the distance the view is expected to
+    cover in `lookahead` seconds.
+
+    Datasets in files opened for SWMR reading are followed: rows
+    appended by the writer show up as they arrive, and if the view
+    was scrolled to the end it stays there.
+
+    The whole dataset, the current plane of an N-D dataset or the
+    selected cells can be exported from the context menu (see
+    exportdialog.py).
+
     """
+    lookahead = 0.5
+
     def __init__(self, parent=None, dataset=None):
         super(HDFDatasetWidget, self).__init__(parent)        
         self.name = ''
+        self.scrollTime = None
+        self.scrollPos = (0, 0)
+        self.velocity = (0.0, 0.0)
+        self.followKey = None
+        self.verticalScrollBar().valueChanged.connect(self.updatePrefetch)
+        self.horizontalScrollBar().valueChanged.connect(self.updatePrefetch)
+        self.exportAction = QtGui.QAction(QtGui.QIcon(), 'Export data', self,
+                                          statusTip='Export the dataset, the current plane or the selected cells to a file',
+                                          triggered=self.exportData)
+        self.addAction(self.exportAction)
+        self.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
         if dataset is not None:
             self.setDataset(dataset)
 
     def setDataset(self, dataset):
         model = create_default_model(dataset)
+        model.setPrefetcher(prefetch.defaultPrefetcher())
         self.setModel(model)
         self.name = '{}:{}'.format(dataset.file.filename,
                                    dataset.name)
-        self.setToolTip('Dataset <b>{}</b> [file: {}]'.format(
-            dataset.name, dataset.file.filename))
+        self.updateToolTip()
+        self.scrollTime = None
+        self.updatePrefetch()
+        if self.followKey is not None:
+            follower = follow.defaultFollower()
+            follower.sigGrown.disconnect(self.datasetGrown)
+            follower.unfollow(self.followKey, owner=self)
+            self.followKey = None
+        if follow.isFollowable(dataset):
+            follower = follow.defaultFollower()
+            self.followKey = follower.follow(dataset, owner=self)
+            follower.sigGrown.connect(self.datasetGrown)
+
+    def updateToolTip(self):
+        """Show the name of the dataset, and its statistics if they
+        have been computed (see statswidget.py)"""
+        dataset = self.model().dataset
+        tip = 'Dataset <b>{}</b> [file: {}]'.format(dataset.name,
+                                                    dataset.file.filename)
+        stats = datasetstats.cachedStatistics(dataset)
+        if stats is not None:
+            tip += '<br>' + datasetstats.summary(stats).replace('\n', '<br>')
+        self.setToolTip(tip)
+
+    def datasetGrown(self, key, oldShape, newShape):
+        model = self.model()
+        if not isinstance(model, HDFDatasetModel) or key != model.datasetKey:
+            return
+        scrollBar = self.verticalScrollBar()
+        atEnd = scrollBar.value() == scrollBar.maximum()
+        model.datasetGrown(key, oldShape, newShape)
+        if atEnd:
+            self.scrollToBottom()
+        self.updatePrefetch()
+
+    def visibleRange(self):
+        """Return the (first, last) pairs of visible rows and columns"""
+        model = self.model()
+        viewport = self.viewport()
+        firstRow = max(self.rowAt(0), 0)
+        lastRow = self.rowAt(viewport.height() - 1)
+        if lastRow < 0:
+            lastRow = model.rowCount(None) - 1
+        firstCol = max(self.columnAt(0), 0)
+        lastCol = self.columnAt(viewport.width() - 1)
+        if lastCol < 0:
+            lastCol = model.columnCount(None) - 1
+        return (firstRow, lastRow), (firstCol, lastCol)
+
+    def extendRange(self, visible, velocity, count):
+        """Extend `visible` range by one page plus the distance covered
+        in `lookahead` seconds at `velocity` (entries per second),
+        in the direction of scrolling."""
+        first, last = visible
+        ahead = (last - first + 1) + int(abs(velocity) * self.lookahead)
+        if velocity >= 0:
+            last += ahead
+        else:
+            first -= ahead
+        return max(first, 0), min(last, count - 1)
+
+    def updatePrefetch(self, *args):
+        model = self.model()
+        if not isinstance(model, HDFDatasetModel):
+            return
+        rowCount = model.rowCount(None)
+        columnCount = model.columnCount(None)
+        if rowCount == 0 or columnCount == 0:
+            return
+        rows, columns = self.visibleRange()
+        now = time.time()
+        if self.scrollTime is not None:
+            dt = max(now - self.scrollTime, 1e-3)
+            self.velocity = ((rows[0] - self.scrollPos[0]) / dt,
+                             (columns[0] - self.scrollPos[1]) / dt)
+        self.scrollTime = now
+        self.scrollPos = (rows[0], columns[0])
+        rows = self.extendRange(rows, self.velocity[0], rowCount)
+        columns = self.extendRange(columns, self.velocity[1], columnCount)
+        model.prefetchRange(rows, columns)
+
+    def exportSources(self):
+        """What can be exported, as a dict of description to a
+        callable returning the exporter source. A selection is taken
+        as the rows from the first to the last selected and the
+        columns with any cell selected."""
+        import exporter
+        model = self.model()
+        dataset = model.dataset
+        sources = {'whole dataset': lambda: exporter.DatasetSource(dataset)}
+        if isinstance(model, NDDatasetModel):
+            plane, _ = model.selection()
+            sources['current plane'] = lambda: exporter.DatasetSource(dataset, plane)
+        ranges = self.selectionModel().selection()
+        if not ranges.isEmpty():
+            rows = slice(min(part.top() for part in ranges),
+                         max(part.bottom() for part in ranges) + 1)
+            columns = sorted(set(column for part in ranges
+                                 for column in range(part.left(), part.right() + 1)))
+            cells, fields = model.selection(rows, columns)
+            sources['selected cells'] = lambda: exporter.DatasetSource(dataset, cells, fields)
+        return sources
+
+    def exportData(self):
+        from exportdialog import startExport
+        startExport(self, self.exportSources(), self.model().dataset.name)
+
+    def resizeEvent(self, event):
+        super(HDFDatasetWidget, self).resizeEvent(event)
+        self.updatePrefetch()
+
+    def paintEvent(self, event):
+        # The cells are read from the model while painting
+        with profiler.activity('paint', self.name):
+            super(HDFDatasetWidget, self).paintEvent(event)
 
 
 if __name__ == '__main__':
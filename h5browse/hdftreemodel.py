@@ -54,9 +54,11 @@ editabletreemodel.py
 
 import os
 import h5py as h5
-from  pyqtgraph import QtCore
-from pyqtgraph import QtGui
-from pyqtgraph import Qt
+from qtcompat import (QtCore, QtGui)
+
+import blockcache
+import prefetch
+import searchindex
 
 class RootItem(object):
     def __init__(self, parent=None):
@@ -91,45 +93,129 @@ class RootItem(object):
         return self.parentItem
 
     def addChild(self, childItem):
+        childItem.row = len(self.children)
         self.children.append(childItem)    
 
     def removeChild(self, position):
-        if position < 0 or position > len(self.children):
+        if position < 0 or position >= len(self.children):
             return False
         child = self.children.pop(position)
+        for row in range(position, len(self.children)):
+            self.children[row].row = row
         return True
 
     def hasChildren(self):
-        return len(children) > 0
+        return len(self.children) > 0
+
+    def canFetchMore(self):
+        return False
 
 
 class HDFTreeItem(object):
-    def __init__(self, data, parent=None):
+    """Tree item wrapping an HDF5 node.
+
+    Each item stores its row under the parent (`row`) and, for
+    groups, the number of links in it (`nlinks`, read once from the
+    file on first query). Thus childNumber and hasChildren take
+    constant time irrespective of the size of the group. The link
+    count must be updated via `linksChanged` when children are added
+    or removed.
+
+    Children are loaded incrementally (see HDFTreeModel.fetchMore):
+    `nextLinkNames` lists the names of the next batch of links
+    without opening the objects, and `appendLinks` creates items for
+    them. A child item only knows its link `name` until its `h5node`
+    is accessed, which happens when the view needs its type,
+    i.e. when the row becomes visible. `childCount` is the number of
+    children loaded so far.
+
+    """
+    __slots__ = ('parentItem', 'node', 'name', 'children', 'row', 'nlinks')
+
+    def __init__(self, data, parent=None, row=0, name=None):
         super(HDFTreeItem, self).__init__()
         self.parentItem = parent
-        self.h5node = data
+        self.node = data
+        self.name = name
         self.children = []
+        self.row = row
+        self.nlinks = None
+
+    @property
+    def h5node(self):
+        """The HDF5 object, opened on first access"""
+        if self.node is None and self.name is not None:
+            try:
+                self.node = self.parentItem.h5node[self.name]
+            except KeyError as e:  # dangling soft or external link
+                print(e)
+        return self.node
+
+    @h5node.setter
+    def h5node(self, value):
+        self.node = value
         
     def child(self, row):
-        if isinstance(self.h5node, h5.Group):
-            if len(self.children) > 0:
-                return self.children[row]
-            self.children = [self.__class__(self.h5node[child], parent=self)
-                             for child in self.h5node]
-            return self.children[row]
+        if row < 0 or row >= len(self.children):
+            return None
+        return self.children[row]
+
+    def linkCount(self):
+        """Total number of links in the group"""
+        if self.nlinks is None:
+            if isinstance(self.h5node, h5.Group):
+                self.nlinks = len(self.h5node)
+            else:
+                self.nlinks = 0
+        return self.nlinks
+
+    def canFetchMore(self):
+        return len(self.children) < self.linkCount()
+
+    def nextLinkNames(self, count):
+        """Names of up to `count` links following the loaded
+        children. Uses low level link iteration, so the objects are
+        not opened."""
+        names = []
+        def collect(name):
+            names.append(name.decode('utf-8'))
+            if len(names) >= count:
+                return True
+        self.h5node.id.links.iterate(collect, idx_type=h5.h5.INDEX_NAME,
+                                     order=h5.h5.ITER_INC,
+                                     idx=len(self.children))
+        return names
+
+    def appendLinks(self, names):
+        cls = self.__class__
+        start = len(self.children)
+        self.children.extend(cls(None, parent=self, row=start + ii, name=name)
+                             for ii, name in enumerate(names))
+
+    def loadChildren(self):
+        """Load all the remaining children"""
+        while self.canFetchMore():
+            self.appendLinks(self.nextLinkNames(self.linkCount()))
+
+    def linksChanged(self):
+        """Renumber the children and update the link count after
+        children have been inserted or removed"""
+        for row, child in enumerate(self.children):
+            child.row = row
+        self.nlinks = len(self.h5node)
 
     def childNumber(self):
-        return self.parentItem.children.index(self)
+        return self.row
         
     def childCount(self):
-        if isinstance(self.h5node, h5.Group):
-            return len(self.h5node)
-        return 0
+        return len(self.children)
 
     def columnCount(self):
         return 1
 
     def data(self, column, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and self.name is not None:
+            return self.name
         if self.h5node == None:
             return ''
         if role == QtCore.Qt.DisplayRole:
@@ -152,9 +238,7 @@ class HDFTreeItem(object):
         self.h5node = value
 
     def hasChildren(self):
-        if isinstance(self.h5node, h5.Group):
-            return len(self.h5node) > 0
-        return False
+        return self.linkCount() > 0
 
     def parent(self):
         return self.parentItem
@@ -170,8 +254,10 @@ class HDFTreeItem(object):
 
 
 class EditableItem(HDFTreeItem):    
-    def __init__(self, data, parent=None):
-        super(EditableItem, self).__init__(data, parent)
+    __slots__ = ()
+
+    def __init__(self, data, parent=None, row=0, name=None):
+        super(EditableItem, self).__init__(data, parent, row, name)
         
     def setData(self, column, data):
         """When assigned a dict, we look for 'name' key storing name, 'attr'
@@ -179,7 +265,7 @@ class EditableItem(HDFTreeItem):
         group/dataset. If type is dataset, we further look for any existing
         data in 'data'."""
         if not isinstance(data, dict):
-            super().setData(self, column, data)
+            super().setData(column, data)
             return
         typ = data.get('type', 'group')
         merge = data.get('merge', False)
@@ -194,46 +280,86 @@ class EditableItem(HDFTreeItem):
 
     def createGroup(self, data):
         name = data.get('name', 'NewGroup')
+        self.loadChildren()
         group = self.h5node.create_group(name)
         for key, value in data.get('attrs', {}).items():
             group.attrs[key] = value
-        self.children.append(EditableItem(group, self))
+        self.children.append(EditableItem(group, self, name=name))
+        self.linksChanged()
         
     def createDataset(self, data):
+        """Create a dataset under this group (or the parent group of
+        this dataset) and append its item.
+
+        If `data` has a 'source' (see importer.py) the dataset is
+        imported from it, with optional 'progress' and 'cancelled'
+        callables as in importer.importData. Returns the new item, or
+        None if the import was cancelled."""
+        parent = self.parent() if self.isDataset() else self
+        dset = parent.newDataset(data)
+        if dset is None:
+            return None
+        return parent.appendDataset(dset)
+
+    def newDataset(self, data):
+        """Create the HDF5 dataset for `createDataset` in this group,
+        without adding an item for it"""
         name = data.get('name', 'NewDataset')
-        if self.isDataset():
-            parent = self.parent()
+        self.loadChildren()
+        source = data.get('source', None)
+        if source is not None:
+            import importer
+            dset = importer.importData(source, self.h5node, name,
+                                       chunks=data.get('chunks', True),
+                                       compression=data.get('compression', None),
+                                       compression_opts=data.get('compression_opts', None),
+                                       shuffle=data.get('shuffle', False),
+                                       progress=data.get('progress', None),
+                                       cancelled=data.get('cancelled', None))
         else:
-            parent = self
-        dset = parent.h5node.create_dataset(name, data=data.get('data', None),
-                                            shape=data.get('shape', None),
-                                            dtype=data.get('dtype', None),
-                                            chunks=data.get('chunks', True),
-                                            maxshape=data.get('maxshape', (None,)),
-                                            compression=data.get('compression', 'gzip'))
-        for key, value in data.get('attrs', {}).items():
-            dset.attrs[key] = value
-        self.children.append(EditableItem(dset, self))
+            dset = self.h5node.create_dataset(name, data=data.get('data', None),
+                                              shape=data.get('shape', None),
+                                              dtype=data.get('dtype', None),
+                                              chunks=data.get('chunks', True),
+                                              maxshape=data.get('maxshape', (None,)),
+                                              compression=data.get('compression', 'gzip'),
+                                              compression_opts=data.get('compression_opts', None),
+                                              shuffle=data.get('shuffle', False))
+        if dset is not None:
+            for key, value in data.get('attrs', {}).items():
+                dset.attrs[key] = value
+        return dset
+
+    def appendDataset(self, dset):
+        item = EditableItem(dset, self, name=dset.name.rpartition('/')[-1])
+        self.children.append(item)
+        self.linksChanged()
+        return item
 
     def insertChildren(self, position, count, columns=1):
+        self.loadChildren()
         for ii in range(count):
             name = 'node{}'.format(ii)
             group = self.h5node.create_group(name)
-            self.children.append(EditableItem(group, self))
+            self.children.append(EditableItem(group, self, name=name))
+        self.linksChanged()
         return True
 
     def removeChildren(self, position, count):
-        index = 0
-        for key in self.h5node:
-            if index >= position:
-                child = self.children.pop(index)
-                del self.h5node[key]
-            index += 1
-            if index >= position + count:
-                break
+        # Delete the links by name: a dangling soft or external link
+        # has no HDF5 object. Only drop the items of links actually
+        # deleted so that the tree stays in step with the file.
+        removed = 0
+        try:
+            for child in self.children[position:position+count]:
+                del self.h5node[child.name]
+                removed += 1
+        finally:
+            del self.children[position:position+removed]
+            self.linksChanged()
 
     def removeChild(self, position):
-        if position < 0 or position > len(self.children):
+        if position < 0 or position >= len(self.children):
             return False
         child = self.removeChildren(position, 1)
         return True
@@ -241,13 +367,72 @@ class EditableItem(HDFTreeItem):
     def rename(self, newName):
         pnode = self.parent().h5node
         pnode.move(self.h5node.name, newName)
+        self.name = newName.rsplit('/')[-1]
 
         
+class FileOpener(QtCore.QRunnable):
+    """Open a file for HDFTreeModel.openFiles on a worker thread"""
+    def __init__(self, model, path, mode):
+        super(FileOpener, self).__init__()
+        self.model = model
+        self.path = path
+        self.mode = mode
+
+    def run(self):
+        try:
+            item = self.model.createFileItem(self.path, self.mode)
+        except Exception as e:
+            # Report every failure: the progress of openFiles counts
+            # the finished files, and an exception escaping a
+            # QRunnable aborts the application.
+            self.model.sigOpenFinished.emit(self.path, None, str(e))
+            return
+        self.model.sigOpenFinished.emit(self.path, item, None)
+
+
 class HDFTreeModel(QtCore.QAbstractItemModel):
+    """Tree model of open HDF5 files.
+
+    Children of a group are listed `fetchBatch` links at a time via
+    Qt's canFetchMore/fetchMore protocol so that expanding a huge
+    group does not create an item for each of its children.
+
+    Signals
+    -------
+
+    sigFileOpened(path): emitted after the row for a file opened by
+    `openFiles` has been inserted.
+
+    sigFileOpenFailed(path, message): emitted when `openFiles` could
+    not open a file.
+
+    sigOpenProgress(done, total): emitted when each file of the
+    current batch of `openFiles` is done, successfully or not.
+
+    sigOpenFinished(path, item, error): internal, sent from the worker
+    threads to the GUI thread.
+
+    The files added are indexed for search in the background by
+    `indexer` (see searchindex.FileIndexer), and `findNode` loads the
+    groups on the path of a match to show it.
+
+    """
+    sigFileOpened = QtCore.pyqtSignal(str)
+    sigFileOpenFailed = QtCore.pyqtSignal(str, str)
+    sigOpenProgress = QtCore.pyqtSignal(int, int)
+    sigOpenFinished = QtCore.pyqtSignal(object, object, object)
+
+    fetchBatch = 1000
+
     def __init__(self, headers, parent=None):
         super(HDFTreeModel, self).__init__(parent)
         rootData = [header for header in headers]
         self.rootItem = RootItem() 
+        self.openPool = QtCore.QThreadPool(self)
+        self.openTotal = 0
+        self.openDone = 0
+        self.sigOpenFinished.connect(self.openFinished)
+        self.indexer = searchindex.FileIndexer(self)
         
     def columnCount(self, parent=QtCore.QModelIndex()):
         return self.rootItem.columnCount()
@@ -295,7 +480,7 @@ class HDFTreeModel(QtCore.QAbstractItemModel):
         parentItem = childItem.parent()
         if parentItem == self.rootItem: # is the left side childItem or parentItem?
             return QtCore.QModelIndex()
-        return self.createIndex(parentItem.parent().childNumber(), 0, parentItem)
+        return self.createIndex(parentItem.childNumber(), 0, parentItem)
 
     def rowCount(self, parent=QtCore.QModelIndex()):
         parentItem = self.getItem(parent)
@@ -303,18 +488,103 @@ class HDFTreeModel(QtCore.QAbstractItemModel):
             return parentItem.childCount()
         return 0
 
-    def openFile(self, path, mode='r'):
-        self.beginInsertRows(QtCore.QModelIndex(),
-                             self.rootItem.childCount(),
-                             self.rootItem.childCount()+1)
-        fd = h5.File(str(path), mode=mode)
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        return self.getItem(parent).hasChildren()
+
+    def canFetchMore(self, parent):
+        return self.getItem(parent).canFetchMore()
+
+    def fetchMore(self, parent):
+        self.fetchTo(parent, self.getItem(parent).childCount() + self.fetchBatch)
+
+    def fetchTo(self, parent, count):
+        """Fetch the children of `parent` up to `count` in one go"""
+        item = self.getItem(parent)
+        if count <= item.childCount() or not item.canFetchMore():
+            return
+        names = item.nextLinkNames(count - item.childCount())
+        if len(names) == 0:
+            return
+        first = item.childCount()
+        self.beginInsertRows(parent, first, first + len(names) - 1)
+        item.appendLinks(names)
+        self.endInsertRows()
+
+    def fetchAll(self, parent):
+        """Fetch all the remaining children of `parent`"""
+        while self.canFetchMore(parent):
+            self.fetchMore(parent)
+
+    def createFileItem(self, path, mode='r'):
+        """Open file at `path` and create an item for it.
+
+        The top level of the file is scanned as well: the first batch
+        of links is listed and the type of each is resolved so that
+        showing and expanding the new row needs no further I/O. This
+        does not touch the model and is safe to call from a worker
+        thread.
+
+        """
+        if mode == 'swmr':
+            # Follow a file being written in SWMR mode (see follow.py)
+            fd = h5.File(str(path), mode='r', libver='latest', swmr=True)
+        else:
+            fd = h5.File(str(path), mode=mode)
         print('Opened {} in mode {}'.format(fd.filename, mode))
-        if mode == 'r':
+        if mode in ('r', 'swmr'):
             fileItem = HDFTreeItem(fd, parent=self.rootItem)
         else:
             fileItem = EditableItem(fd, parent=self.rootItem)
+        fileItem.appendLinks(fileItem.nextLinkNames(self.fetchBatch))
+        for child in fileItem.children:
+            child.hasChildren()
+        return fileItem
+
+    def addFileItem(self, fileItem):
+        position = self.rootItem.childCount()
+        self.beginInsertRows(QtCore.QModelIndex(), position, position)
         self.rootItem.addChild(fileItem)
         self.endInsertRows()
+        self.indexer.addFile(fileItem.h5node)
+
+    def openFile(self, path, mode='r'):
+        """Open file at `path` synchronously"""
+        self.addFileItem(self.createFileItem(path, mode))
+
+    def openFiles(self, paths, mode='r'):
+        """Open the files in `paths` in parallel on worker threads.
+
+        The rows are added as each file becomes ready, in the order of
+        completion. Progress is reported via sigOpenProgress and
+        the outcome for each file via sigFileOpened or
+        sigFileOpenFailed. Note that h5py serializes calls into the
+        HDF5 library, so the gain is mostly in keeping the GUI
+        responsive.
+
+        """
+        if self.openDone == self.openTotal:
+            self.openDone = self.openTotal = 0
+        self.openTotal += len(paths)
+        self.sigOpenProgress.emit(self.openDone, self.openTotal)
+        for path in paths:
+            self.openPool.start(FileOpener(self, path, mode))
+
+    def openFinished(self, path, fileItem, error):
+        self.openDone += 1
+        if fileItem is None:
+            print('Could not open {}: {}'.format(path, error))
+            self.sigFileOpenFailed.emit(path, error)
+        else:
+            self.addFileItem(fileItem)
+            self.sigFileOpened.emit(path)
+        self.sigOpenProgress.emit(self.openDone, self.openTotal)
+
+    def waitForOpen(self, msecs=-1):
+        """Wait for pending openFiles calls (and process the resulting
+        insertions). Mostly useful for scripts."""
+        done = self.openPool.waitForDone(msecs)
+        QtCore.QCoreApplication.processEvents()
+        return done
 
     def closeFile(self, index):
         """Close file associated with item at index. Returns True if
@@ -322,7 +592,10 @@ class HDFTreeModel(QtCore.QAbstractItemModel):
         item = self.getItem(index)
         try:
             position = self.rootItem.children.index(item)
-            self.beginRemoveRows(QtCore.QModelIndex(), position, position+1)
+            self.beginRemoveRows(QtCore.QModelIndex(), position, position)
+            self.indexer.removeFile(item.h5node.filename)
+            prefetch.defaultPrefetcher().forgetFile(item.h5node.filename)
+            blockcache.defaultCache.invalidate(filename=item.h5node.filename)
             item.h5node.close()
             self.rootItem.removeChild(position)
             self.endRemoveRows()
@@ -330,8 +603,43 @@ class HDFTreeModel(QtCore.QAbstractItemModel):
         except ValueError:
             return False
 
+    def findNode(self, filename, path, rows=None):
+        """Index of the node at `path` in open file `filename`, loading
+        the groups on the way. Returns an invalid index if there is no
+        such node.
+
+        rows: the row of each node on the path, from the child of the
+        root down, as recorded by searchindex. Only the links up to it
+        are then listed, unless the file has changed since.
+
+        """
+        for fileItem in self.rootItem.children:
+            if fileItem.h5node.filename == filename:
+                break
+        else:
+            return QtCore.QModelIndex()
+        index = self.createIndex(fileItem.childNumber(), 0, fileItem)
+        names = [name for name in path.split('/') if name]
+        if rows is None or len(rows) != len(names):
+            rows = [None] * len(names)
+        for name, row in zip(names, rows):
+            item = self.getItem(index)
+            child = None
+            if row is not None:
+                self.fetchTo(index, row + 1)
+                child = item.child(row)
+            if child is None or child.name != name:
+                self.fetchAll(index)
+                child = next((child for child in item.children if child.name == name),
+                             None)
+                if child is None:
+                    return QtCore.QModelIndex()
+            index = self.index(child.childNumber(), 0, index)
+        return index
+
     def insertRows(self, position, rows, parent=QtCore.QModelIndex()):
         parentItem = self.getItem(parent)
+        self.fetchAll(parent)
         self.beginInsertRows(parent, position, position+rows-1)
         parentItem.insertChildren(position, rows, self.rootItem.columnCount())
         self.endInsertRows()
@@ -346,6 +654,19 @@ class HDFTreeModel(QtCore.QAbstractItemModel):
 
     def insertNode(self, parent=QtCore.QModelIndex(), data={}, nodeType=h5.Group):
         parentItem = self.getItem(parent)
+        # New links are appended at the end, so all the existing ones
+        # must have been listed first
+        self.fetchAll(parent)
+        if nodeType == h5.Dataset and data.get('source', None) is not None:
+            # An import can take long (and process events for its
+            # progress) or be cancelled: add the row once it is done
+            dset = parentItem.newDataset(data)
+            if dset is None:
+                return False
+            self.beginInsertRows(parent, parentItem.childCount(), parentItem.childCount())
+            parentItem.appendDataset(dset)
+            self.endInsertRows()
+            return True
         self.beginInsertRows(parent, parentItem.childCount(), parentItem.childCount())
         if nodeType == h5.Dataset:
             parentItem.createDataset(data)
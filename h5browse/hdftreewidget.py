@@ -46,20 +46,19 @@
 # Code:
 """Defines class to display HDF5 file tree.
 
+The widgets it creates for datasets, attributes, plots, images and
+statistics, and the dialogs, are imported on first use so that the
+tree can be shown without waiting for pyqtgraph.
+
 """
 
+import time
 from collections import defaultdict
-import numpy as np
 import h5py as h5
 
-from pyqtgraph import (QtCore, QtGui)
-
-from pyqtgraph import parametertree as ptree
+from qtcompat import (QtCore, QtGui)
 
 from hdftreemodel import (HDFTreeModel, EditableItem)
-from hdfdatasetwidget import HDFDatasetWidget
-from hdfattributewidget import HDFAttributeWidget
-from datasetplot import DatasetPlot
 
 class HDFTreeWidget(QtGui.QTreeView):
     """Convenience class to display HDF file trees. 
@@ -93,6 +92,18 @@ class HDFTreeWidget(QtGui.QTreeView):
     sigPlotWidgetClosed(QWidget): same as sigDatasetWidgetClosed but
     for the widget displaying HDF5 dataset plots.
 
+    sigStatsWidgetCreated(QWidget): same as sigDatasetWidgetCreated but
+    for the widget displaying dataset or synapse statistics.
+
+    sigStatsWidgetClosed(QWidget): same as sigDatasetWidgetClosed but
+    for the widget displaying dataset or synapse statistics.
+
+    sigImageWidgetCreated(QWidget): same as sigDatasetWidgetCreated but
+    for the widget displaying datasets as images.
+
+    sigImageWidgetClosed(QWidget): same as sigDatasetWidgetClosed but
+    for the widget displaying datasets as images.
+
     """
     sigDatasetWidgetCreated = QtCore.pyqtSignal(QtGui.QWidget)
     sigDatasetWidgetClosed = QtCore.pyqtSignal(QtGui.QWidget)
@@ -101,6 +112,10 @@ class HDFTreeWidget(QtGui.QTreeView):
     sigPlotWidgetCreated = QtCore.pyqtSignal(QtGui.QWidget)
     sigPlotWidgetClosed = QtCore.pyqtSignal(QtGui.QWidget)
     sigPlotParamTreeCreated = QtCore.pyqtSignal(QtGui.QWidget)
+    sigStatsWidgetCreated = QtCore.pyqtSignal(QtGui.QWidget)
+    sigStatsWidgetClosed = QtCore.pyqtSignal(QtGui.QWidget)
+    sigImageWidgetCreated = QtCore.pyqtSignal(QtGui.QWidget)
+    sigImageWidgetClosed = QtCore.pyqtSignal(QtGui.QWidget)
     sigDataWidgetActivated = QtCore.pyqtSignal(QtGui.QWidget)
 
     def __init__(self, parent=None):
@@ -110,7 +125,11 @@ class HDFTreeWidget(QtGui.QTreeView):
         self.openDatasetWidgets = defaultdict(dict)
         self.openAttributeWidgets = defaultdict(dict)
         self.openPlotWidgets = defaultdict(set)
+        self.openStatsWidgets = defaultdict(set)
+        self.openImageWidgets = defaultdict(set)
         self.createActions()
+        self.selectionModel().currentChanged.connect(self.updateActions)
+        self.updateActions()
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.showContextMenu)
 
@@ -121,9 +140,39 @@ class HDFTreeWidget(QtGui.QTreeView):
         self.insertGroupAction  = QtGui.QAction(QtGui.QIcon(), 'Insert group', self,
                                            statusTip='Create and insert a group under currently selected group',
                                            triggered=self.insertGroup)
+        self.importDataAction = QtGui.QAction(QtGui.QIcon(), 'Import data', self,
+                                              statusTip='Import a binary, NumPy or CSV file as a dataset under currently selected group',
+                                              triggered=self.importData)
+        self.repackAction = QtGui.QAction(QtGui.QIcon(), 'Repack dataset', self,
+                                          statusTip='Rewrite the currently selected dataset with another chunk shape and compression',
+                                          triggered=self.repackDataset)
         self.deleteNodeAction = QtGui.QAction(QtGui.QIcon(), 'Delete node', self,
                                         statusTip='Delete the currently selected node.',
                                         triggered=self.deleteNode)        
+        self.plotDatasetAction = QtGui.QAction(QtGui.QIcon(), 'Plot dataset', self,
+                                               statusTip='Plot the currently selected dataset',
+                                               triggered=self.plotDataset)
+        self.showImageAction = QtGui.QAction(QtGui.QIcon(), 'Show as image', self,
+                                             statusTip='Display the currently selected 2D or N-D dataset as an image',
+                                             triggered=self.showImage)
+        self.synapseStatsAction = QtGui.QAction(QtGui.QIcon(), 'Synapse statistics', self,
+                                                statusTip='Total synaptic conductance by cell and cell type in the currently selected synapse table',
+                                                triggered=self.showSynapseStatistics)
+
+    def editableNode(self, nodeType):
+        """The node of the current item if it is in a file open for
+        writing and an instance of `nodeType`, else None"""
+        item = self.model().getItem(self.currentIndex())
+        if not isinstance(item, EditableItem):
+            return None
+        node = item.h5node
+        return node if isinstance(node, nodeType) else None
+
+    def updateActions(self, *args):
+        """Enable the edit actions that apply to the current item"""
+        self.importDataAction.setEnabled(
+            self.editableNode((h5.Group, h5.Dataset)) is not None)
+        self.repackAction.setEnabled(self.editableNode(h5.Dataset) is not None)
 
     def openFiles(self, files, mode='r'):
         """Open the files listed in argument.
@@ -131,11 +180,14 @@ class HDFTreeWidget(QtGui.QTreeView):
         files: list of file paths. For example, output of
                QFileDialog::getOpenFileNames
 
-        mode: string specifying open mode for h5py
+        mode: string specifying open mode for h5py, or 'swmr' to
+              read files being written in SWMR mode
+
+        The files are opened in the background by the model and appear
+        in the tree as they become ready.
 
         """
-        for fname in files:
-            self.model().openFile(fname, mode)
+        self.model().openFiles(files, mode)
         
     def closeFiles(self):
         """Close the files selected in the model.
@@ -160,8 +212,18 @@ class HDFTreeWidget(QtGui.QTreeView):
                 for plotWidget in self.openPlotWidgets[filename]:
                     self.sigPlotWidgetClosed.emit(plotWidget)
                 self.openPlotWidgets[filename].clear()
+                for statsWidget in self.openStatsWidgets[filename]:
+                    statsWidget.cancel()
+                    self.sigStatsWidgetClosed.emit(statsWidget)
+                self.openStatsWidgets[filename].clear()
+                for imageWidget in self.openImageWidgets[filename]:
+                    imageWidget.close()
+                    self.sigImageWidgetClosed.emit(imageWidget)
+                self.openImageWidgets[filename].clear()
 
     def removeBufferedWidget(self, widget):
+        from hdfdatasetwidget import HDFDatasetWidget
+        from hdfattributewidget import HDFAttributeWidget
         if isinstance(widget, HDFDatasetWidget):
             self.openDatasetWidgets[widget.model.dataset.file.filename].pop(widget.model.dataset)
         elif isinstance(widget, HDFAttributeWidget):
@@ -179,6 +241,7 @@ class HDFTreeWidget(QtGui.QTreeView):
                 widget = self.openDatasetWidgets[item.h5node.file.filename][item.h5node]
                 self.sigDataWidgetActivated.emit(widget)
             except KeyError:
+                from hdfdatasetwidget import HDFDatasetWidget
                 widget = HDFDatasetWidget(dataset=item.h5node)
                 self.openDatasetWidgets[item.h5node.file.filename][item.h5node] = widget
                 self.sigDatasetWidgetCreated.emit(widget)
@@ -194,6 +257,7 @@ class HDFTreeWidget(QtGui.QTreeView):
                 widget = self.openAttributeWidgets[item.h5node.file.filename][item.h5node]
                 self.sigDataWidgetActivated.emit(widget)
             except KeyError:
+                from hdfattributewidget import HDFAttributeWidget
                 widget = HDFAttributeWidget(node=item.h5node)
                 self.openAttributeWidgets[item.h5node.file.filename][item.h5node] = widget
                 self.sigAttributeWidgetCreated.emit(widget)
@@ -205,12 +269,76 @@ class HDFTreeWidget(QtGui.QTreeView):
         """
         item = self.model().getItem(index)
         if item is not None and isinstance(item.h5node, h5.Dataset):
+            from datasetplot import DatasetPlot
             widget = DatasetPlot()
             self.openPlotWidgets[item.h5node.file.filename].add(widget)
             plot, params = widget.plotLine(item.h5node)
             self.sigPlotWidgetCreated.emit(widget)
             self.sigPlotParamTreeCreated.emit(params)
             
+    def createStatsWidget(self, index):
+        """Creates a widget computing statistics of the dataset at
+        index.
+
+        Emits sigStatsWidgetCreated(newWidget)
+        """
+        item = self.model().getItem(index)
+        if item is not None and isinstance(item.h5node, h5.Dataset):
+            from statswidget import DatasetStatsWidget
+            widget = DatasetStatsWidget(dataset=item.h5node)
+            widget.sigStatsComputed.connect(self.statsComputed)
+            self.openStatsWidgets[item.h5node.file.filename].add(widget)
+            self.sigStatsWidgetCreated.emit(widget)
+
+    def createSynapseStatsWidget(self, index):
+        """Creates a widget computing synapse statistics of the
+        synapse table at index.
+
+        Emits sigStatsWidgetCreated(newWidget)
+        """
+        import synstat
+        from synstatwidget import SynapseStatsWidget
+        item = self.model().getItem(index)
+        if synstat.isSynapseTable(getattr(item, 'h5node', None)):
+            widget = SynapseStatsWidget(dataset=item.h5node)
+            self.openStatsWidgets[item.h5node.file.filename].add(widget)
+            self.sigStatsWidgetCreated.emit(widget)
+
+    def createImageWidget(self, index):
+        """Creates an image widget for the dataset at index.
+
+        Emits sigImageWidgetCreated(newWidget)
+        """
+        item = self.model().getItem(index)
+        if isImageDataset(getattr(item, 'h5node', None)):
+            from imageview import TiledImageView
+            widget = TiledImageView(dataset=item.h5node)
+            self.openImageWidgets[item.h5node.file.filename].add(widget)
+            self.sigImageWidgetCreated.emit(widget)
+
+    def statsComputed(self, dataset):
+        """Show the new statistics in the tooltip of the widget
+        displaying `dataset`, if any"""
+        widget = self.openDatasetWidgets[dataset.file.filename].get(dataset)
+        if widget is not None:
+            widget.updateToolTip()
+
+    def showNode(self, filename, path, rows=None):
+        """Select and scroll to the node at `path` in open file
+        `filename`, expanding the groups above it (see
+        HDFTreeModel.findNode). Returns False if there is no such
+        node."""
+        index = self.model().findNode(filename, path, rows)
+        if not index.isValid():
+            return False
+        parent = index.parent()
+        while parent.isValid():
+            self.expand(parent)
+            parent = parent.parent()
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
+        return True
+
     def showAttributes(self):
         """Create an attribute widget for currentItem"""
         self.createAttributeWidget(self.currentIndex())
@@ -223,8 +351,21 @@ class HDFTreeWidget(QtGui.QTreeView):
         """Create a PlotWidget for currentItem"""
         self.createPlotWidget(self.currentIndex())
 
+    def showImage(self):
+        """Create a TiledImageView for currentItem"""
+        self.createImageWidget(self.currentIndex())
+
+    def showStatistics(self):
+        """Create a DatasetStatsWidget for currentItem"""
+        self.createStatsWidget(self.currentIndex())
+
+    def showSynapseStatistics(self):
+        """Create a SynapseStatsWidget for currentItem"""
+        self.createSynapseStatsWidget(self.currentIndex())
+
     def insertDataset(self):        
         index = self.currentIndex()
+        from nodedialogs import DatasetDialog
         datasetDialog = DatasetDialog()
         ret = datasetDialog.exec_()
         if ret != QtGui.QDialog.Accepted:
@@ -237,6 +378,7 @@ class HDFTreeWidget(QtGui.QTreeView):
 
     def insertGroup(self):        
         index = self.currentIndex()
+        from nodedialogs import GroupDialog
         groupDialog = GroupDialog()
         ret = groupDialog.exec_()
         if ret != QtGui.QDialog.Accepted:
@@ -247,6 +389,105 @@ class HDFTreeWidget(QtGui.QTreeView):
             index = self.model().parent(index)
         self.model().insertNode(parent=index, data=params, nodeType=h5.Group)
 
+    def importData(self):
+        # The Edit menu can trigger it on any item
+        if self.editableNode((h5.Group, h5.Dataset)) is None:
+            return
+        index = self.currentIndex()
+        from nodedialogs import ImportDialog
+        importDialog = ImportDialog()
+        ret = importDialog.exec_()
+        if ret != QtGui.QDialog.Accepted:
+            return
+        try:
+            params = importDialog.getImportParams()
+        except (IOError, OSError, ValueError, TypeError, SyntaxError) as e:
+            print(e)
+            QtGui.QMessageBox.warning(self, 'Import failed', str(e))
+            return
+        item = self.model().getItem(index)
+        if item.isDataset():
+            index = self.model().parent(index)
+        source = params['source']
+        progress = QtGui.QProgressDialog('Importing {}'.format(source.path),
+                                         'Cancel', 0, 1000, self)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        start = time.perf_counter()
+
+        def report(done, total):
+            seconds = time.perf_counter() - start
+            progress.setLabelText('Importing {}\n{:.1f} of {:.1f} MB, {:.1f} MB/s'.format(
+                source.path, done / 1e6, total / 1e6, done / 1e6 / max(seconds, 1e-9)))
+            # The modal dialog processes events, so Cancel works
+            progress.setValue(int(1000.0 * done / max(total, 1)))
+
+        params['progress'] = report
+        params['cancelled'] = progress.wasCanceled
+        try:
+            self.model().insertNode(parent=index, data=params, nodeType=h5.Dataset)
+        except (IOError, OSError, ValueError) as e:
+            print(e)
+            QtGui.QMessageBox.warning(self, 'Import failed', str(e))
+        finally:
+            progress.close()
+
+    def repackDataset(self):
+        """Rewrite the current dataset with the layout chosen in a
+        RepackDialog (see repack.py). This runs in this process: the
+        file is open for writing here, so it cannot be shared with
+        worker processes."""
+        import repack
+        import blockcache
+        from nodedialogs import RepackDialog
+        dataset = self.editableNode(h5.Dataset)
+        if dataset is None:
+            return
+        index = self.currentIndex()
+        item = self.model().getItem(index)
+        if dataset.shape == () or dataset.size == 0:
+            QtGui.QMessageBox.warning(self, 'Cannot repack',
+                                      '{}: nothing to repack'.format(dataset.name))
+            return
+        repackDialog = RepackDialog(dataset)
+        ret = repackDialog.exec_()
+        if ret != QtGui.QDialog.Accepted:
+            return
+        layout = repackDialog.getLayout()
+        progress = QtGui.QProgressDialog('Repacking {}'.format(dataset.name),
+                                         'Cancel', 0, 1000, self)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        start = time.perf_counter()
+
+        def report(done, total):
+            seconds = time.perf_counter() - start
+            progress.setLabelText('Repacking {}\n{:.1f} of {:.1f} MB, {:.1f} MB/s'.format(
+                dataset.name, done / 1e6, total / 1e6, done / 1e6 / max(seconds, 1e-9)))
+            progress.setValue(int(1000.0 * done / max(total, 1)))
+
+        try:
+            newDataset = repack.repackDataset(dataset, layout, progress=report,
+                                              cancelled=progress.wasCanceled)
+        except (IOError, OSError, ValueError, TypeError) as e:
+            print(e)
+            QtGui.QMessageBox.warning(self, 'Repack failed', str(e))
+            return
+        finally:
+            progress.close()
+        if newDataset is None:
+            return
+        filename = dataset.file.filename
+        # Tables open on the old dataset would keep its storage alive
+        widget = self.openDatasetWidgets[filename].get(dataset)
+        if widget is not None:
+            self.sigDatasetWidgetClosed.emit(widget)
+            self.openDatasetWidgets[filename].pop(dataset, None)
+        # Same data, but the blocks follow the chunks
+        blockcache.defaultCache.invalidate(blockcache.datasetKey(newDataset))
+        item.setData(0, newDataset)
+        self.model().dataChanged.emit(index, index)
+
     def deleteNode(self):
         index = self.currentIndex()
         choice = QtGui.QMessageBox.question(self, 'Confirm delete',
@@ -256,110 +497,29 @@ class HDFTreeWidget(QtGui.QTreeView):
             self.model().deleteNode(index)
 
     def showContextMenu(self, point):
+        import synstat
         menu = QtGui.QMenu()
-        if isinstance(self.model().getItem(self.currentIndex()), EditableItem):
+        item = self.model().getItem(self.currentIndex())
+        node = getattr(item, 'h5node', None)   # root item has none
+        if isinstance(node, h5.Dataset):
+            menu.addAction(self.plotDatasetAction)
+            if isImageDataset(node):
+                menu.addAction(self.showImageAction)
+            if synstat.isSynapseTable(node):
+                menu.addAction(self.synapseStatsAction)
+        if isinstance(item, EditableItem):
+            if isinstance(node, h5.Dataset):
+                menu.addAction(self.repackAction)
             menu.addAction(self.insertDatasetAction)
             menu.addAction(self.insertGroupAction)
+            menu.addAction(self.importDataAction)
             menu.addAction(self.deleteNodeAction)
         menu.exec_(self.mapToGlobal(point))
 
-class DatasetDialog(QtGui.QDialog):
-    def __init__(self, parent=None):
-        super(DatasetDialog, self).__init__(parent)
-        self.params = ptree.Parameter.create(name='datasetParameters',
-                                             title='Dataset parameters',
-                                             type='group',
-                                             children=[{'name': 'name',
-                                                        'type': 'str',
-                                                        'value': 'dataset'},
-                                                       {'name': 'dtype',
-                                                        'title': 'datatype',
-                                                        'type': 'str',
-                                                        'value': 'float'},
-                                                       {'name': 'shape',
-                                                        'type': 'str',
-                                                        'value': '(0),'},
-                                                       {'name': 'maxshape',
-                                                        'type': 'str',
-                                                        'value': '(None,)'},
-                                                       {'name': 'chunks',
-                                                        'type': 'str',
-                                                        'value': 'True'}])
-        layout = QtGui.QVBoxLayout()
-        paramTree = ptree.ParameterTree(showHeader=False)
-        paramTree.setParameters(self.params)
-        self.tabWidget = QtGui.QTabWidget()
-        self.tabWidget.addTab(paramTree, 'Structure')
-        attrTree = ptree.ParameterTree(showHeader=False)
-        self.attrs = XtensibleParam(name='attrs', title='Attributes')
-        attrTree.setParameters(self.attrs)
-        self.tabWidget.addTab(attrTree, 'Attributes')
-        layout.addWidget(self.tabWidget)
-        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
-        buttonBox.accepted.connect(self.accept)
-        buttonBox.rejected.connect(self.reject)
-        layout.addWidget(buttonBox)
-        self.setLayout(layout)
-                                                        
-    def getDatasetParams(self):
-        values = {child.name(): child.value() for child in self.params.children()}
-        values['maxshape'] = eval(values['maxshape'])
-        values['chunks'] = eval(values['chunks'])
-        values['shape'] = eval(values['shape'])
-        values['dtype'] = eval('np.dtype({})'.format(values['dtype']))
-        values['attrs'] = {ch.name(): ch.value() for ch in self.attrs.children()}
-        return values
-
-
-        
-class GroupDialog(QtGui.QDialog):
-    def __init__(self, parent=None):
-        super(GroupDialog, self).__init__(parent)
-        self.params = ptree.Parameter.create(name='groupParameters',
-                                             title='Group attributes',
-                                             type='group',
-                                             children=[{'name': 'name', 'title': 'Name', 'type': 'str',
-                                                        'value': 'group'},
-                                                       XtensibleParam(name='attrs', title='Attributes')])
-        
-        layout = QtGui.QVBoxLayout()
-        paramTree = ptree.ParameterTree(showHeader=False)
-        paramTree.setParameters(self.params)
-        layout.addWidget(paramTree)
-        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
-        buttonBox.accepted.connect(self.accept)
-        buttonBox.rejected.connect(self.reject)
-        layout.addWidget(buttonBox)
-        self.setLayout(layout)
-                                                        
-    def getParams(self):
-        values = self.params.getValues()
-        opts = {'name': self.params.child('name').value(),
-                'attrs': {ch.name(): ch.value() for ch in self.params.child('attrs').children()}}
-        return opts
-
-
-bgBrush = QtGui.QBrush(QtGui.QColor('lightsteelblue'))
-class XtensibleParam(ptree.parameterTypes.GroupParameter):
-    def __init__(self, **opts):
-        opts['type'] = 'group'
-        opts['addText'] = "Add"
-        opts['addList'] = ['int', 'float', 'str']
-        super(XtensibleParam, self).__init__(**opts)
-
-    def addNew(self, typ):
-        val = {'int': '0',
-               'float': '0.0',
-               'str': ''}[typ]
-        child = self.addChild({
-            'name': 'attribute',
-            'type': typ,
-            'value': val,
-            'removable': True,
-            'renamable': True,
-        }, autoIncrementName=True)
-        for item in child.items:
-            item.setBackground(0, bgBrush)
+def isImageDataset(node):
+    """True if `node` is a numeric dataset that can be shown as image"""
+    return isinstance(node, h5.Dataset) and len(node.shape) >= 2 \
+        and node.dtype.kind in 'biuf'
 
 
 if __name__ == '__main__':
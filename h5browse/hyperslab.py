@@ -0,0 +1,158 @@
+# hyperslab.py --- 
+# 
+# Filename: hyperslab.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:08:41 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:08:41 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Extracting 1D series from N-D datasets for plotting. A series is
+# specified by the dimension along which the data runs and a fixed
+# index in each of the other dimensions.
+# 
+# When several series lie in the same chunks, reading them one by
+# one decompresses every chunk once per series. In that case we read
+# the smallest hyperslab covering all of them in one go and split it
+# in memory - but only if that hyperslab holds few series besides the
+# requested ones, since it spans the whole length of the data
+# dimension and two series in opposite corners of a chunk would
+# otherwise pull in everything between them.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Hyperslab selection of 1D series from N-D datasets"""
+
+import numpy as np
+
+import profiler
+
+# A shared hyperslab may cover at most this many times as many series
+# as were requested
+sharedOverhead = 2
+
+
+def dataSlice(dataset, dataDim, step=1, start=0):
+    """Selection along the data dimension, taking every `step`-th
+    entry from `start` on.
+
+    Returns a pair (selection for the file, selection applied to the
+    data read). For a chunked dataset with `step` smaller than the
+    chunk length every chunk has to be read anyway and a strided
+    hyperslab only adds overhead in HDF5, so the whole range is read
+    and subsampled in memory.
+
+    """
+    length = dataset.shape[dataDim]
+    if step <= 1:
+        return slice(start, length), slice(None)
+    if dataset.chunks is not None and step < dataset.chunks[dataDim]:
+        return slice(start, length), slice(None, None, step)
+    return slice(start, length, step), slice(None)
+
+
+def hyperslab(dataset, dataDim, fixed, step=1, start=0):
+    """Selection tuple for the series along `dataDim` with index
+    `fixed[dim]` in every other dimension `dim`."""
+    fileSlice, _ = dataSlice(dataset, dataDim, step, start)
+    return tuple(fileSlice if dim == dataDim else int(fixed[dim])
+                 for dim in range(len(dataset.shape)))
+
+
+def sharedHyperslab(dataset, dataDim, fixedList):
+    """Return the selection covering all the series in `fixedList` if
+    they share the same chunks and the covering hyperslab holds at
+    most `sharedOverhead` times as many series as requested, None
+    otherwise.
+
+    In the returned selection, dimensions where all series have the
+    same index are integers (and hence dropped from the result of the
+    read), others are slices.
+
+    """
+    chunks = dataset.chunks
+    selection = []
+    covered = 1
+    for dim in range(len(dataset.shape)):
+        if dim == dataDim:
+            selection.append(None)
+            continue
+        indices = [int(fixed[dim]) for fixed in fixedList]
+        lo, hi = min(indices), max(indices)
+        if lo == hi:
+            selection.append(lo)
+        elif chunks is not None and lo // chunks[dim] == hi // chunks[dim]:
+            selection.append(slice(lo, hi + 1))
+            covered *= hi - lo + 1
+        else:
+            return None
+    if covered > sharedOverhead * len(fixedList):
+        return None
+    return selection
+
+
+def readSeries(dataset, dataDim, fixedList, step=1, start=0):
+    """Read the 1D series along `dataDim`, from index `start` on, for
+    each entry of `fixedList` (a dict or list mapping dimension to
+    index).
+
+    Series in the same chunks and close together are read with a
+    single hyperslab selection, others one at a time.
+
+    """
+    fileSlice, memSlice = dataSlice(dataset, dataDim, step, start)
+    shared = None
+    if len(fixedList) > 1:
+        shared = sharedHyperslab(dataset, dataDim, fixedList)
+    if shared is None:
+        return [profiler.read(dataset, hyperslab(dataset, dataDim, fixed, step, start))[memSlice]
+                for fixed in fixedList]
+    selection = tuple(fileSlice if sel is None else sel for sel in shared)
+    slab = profiler.read(dataset, selection)
+    ret = []
+    for fixed in fixedList:
+        index = []
+        for dim, sel in enumerate(shared):
+            if sel is None:
+                index.append(memSlice)
+            elif isinstance(sel, slice):
+                index.append(int(fixed[dim]) - sel.start)
+        # copy, so that the slab can be freed
+        ret.append(np.array(slab[tuple(index)]))
+    return ret
+
+
+# 
+# hyperslab.py ends here
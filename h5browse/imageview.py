@@ -0,0 +1,506 @@
+# imageview.py --- 
+# 
+# Filename: imageview.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:18:45 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:18:45 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Image view of 2D datasets (and 2D planes of N-D datasets) that do
+# not fit in memory.
+# 
+# The plane is shown at a level of detail matching the zoom. Levels
+# are downsampling factors in powers of 2. Coarse levels are kept in
+# memory: the overview, at the smallest factor F for which the plane
+# fits in `overviewPixels`, is built in the background by streaming
+# through the dataset once, and the coarser levels are reduced from
+# it. Finer levels are read from the file on demand in tiles of
+# `tileSize` x `tileSize` image pixels, aligned to the chunks of the
+# dataset, for the visible part of the plane only.
+# 
+# Downsampling takes the mean or the max of each block. The overview
+# levels are stored in the sidecar cache.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Tiled level-of-detail image view of 2D planes of datasets"""
+
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph import (QtCore, QtGui)
+
+import sidecar
+import profiler
+
+
+def reduceBlocks(data, factor, method='mean'):
+    """Downsample 2D `data` by `factor` along both axes taking the mean
+    or max of each block. Partial blocks at the edges are reduced
+    over the entries present."""
+    data = np.asarray(data, dtype=np.float32)
+    if factor == 1:
+        return data
+    rows, cols = data.shape
+    outRows, outCols = -(-rows // factor), -(-cols // factor)
+    if rows % factor or cols % factor:
+        padded = np.full((outRows * factor, outCols * factor), np.nan,
+                         dtype=np.float32)
+        padded[:rows, :cols] = data
+        data = padded
+    blocks = data.reshape(outRows, factor, outCols, factor)
+    with warnings.catch_warnings():
+        # All-NaN blocks are fine, they stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if method == 'max':
+            return np.nanmax(blocks, axis=(1, 3))
+        return np.nanmean(blocks, axis=(1, 3))
+
+
+def alignUp(size, step):
+    return -(-size // step) * step
+
+
+class Plane(object):
+    """2D plane of a dataset: dimensions `rowDim` and `colDim` with
+    the other dimensions fixed at `indices`."""
+    def __init__(self, dataset, indices=None):
+        self.dataset = dataset
+        ndim = len(dataset.shape)
+        if indices is None:
+            indices = (slice(None), slice(None)) + (0,) * (ndim - 2)
+        self.indices = tuple(indices)
+        dims = [ii for ii, idx in enumerate(self.indices) if isinstance(idx, slice)]
+        self.rowDim, self.colDim = dims
+        self.shape = (dataset.shape[self.rowDim], dataset.shape[self.colDim])
+        chunks = dataset.chunks
+        if chunks is None:
+            self.chunks = (1, 1)
+        else:
+            self.chunks = (chunks[self.rowDim], chunks[self.colDim])
+
+    def read(self, rows, cols):
+        """Read the `rows` x `cols` (slices) part of the plane"""
+        selection = list(self.indices)
+        selection[self.rowDim] = rows
+        selection[self.colDim] = cols
+        data = profiler.read(self.dataset, tuple(selection))
+        if self.rowDim > self.colDim:
+            data = data.T
+        return data
+
+    def key(self):
+        return [idx if isinstance(idx, int) else '*' for idx in self.indices]
+
+
+class PyramidBuilder(QtCore.QRunnable):
+    """Build the overview levels of `view.plane` in the background.
+
+    The plane is read in slabs of whole chunks of rows, each about
+    `slabBytes` in size. Rows left over beyond a multiple of the
+    overview factor are carried to the next slab.
+
+    """
+    slabBytes = 64 * 1024 * 1024
+
+    def __init__(self, view, plane, factor, method):
+        super(PyramidBuilder, self).__init__()
+        self.view = view
+        self.plane = plane
+        self.factor = factor
+        self.method = method
+        self.cancelled = False
+        rows, cols = plane.shape
+        self.overview = np.full((-(-rows // factor), -(-cols // factor)), np.nan,
+                                dtype=np.float32)
+
+    def run(self):
+        plane, factor = self.plane, self.factor
+        rows, cols = plane.shape
+        itemsize = plane.dataset.dtype.itemsize
+        slabRows = max(plane.chunks[0],
+                       alignUp(self.slabBytes // max(cols * itemsize, 1),
+                               plane.chunks[0]))
+        slabRows = alignUp(slabRows, plane.chunks[0])
+        leftover = None
+        done = 0
+        try:
+            for start in range(0, rows, slabRows):
+                if self.cancelled:
+                    return
+                stop = min(start + slabRows, rows)
+                with profiler.activity('overview', self.view.name):
+                    data = plane.read(slice(start, stop), slice(None))
+                if leftover is not None:
+                    data = np.concatenate((leftover, data))
+                if stop < rows:
+                    keep = len(data) // factor * factor
+                    leftover = data[keep:]
+                    data = data[:keep]
+                out = done // factor
+                reduced = reduceBlocks(data, factor, self.method)
+                self.overview[out: out + len(reduced)] = reduced
+                done += len(data)
+                self.view.sigPyramidProgress.emit(stop, rows)
+            levels = [(factor, self.overview)]
+            while max(levels[-1][1].shape) > self.view.tileSize:
+                levels.append((levels[-1][0] * 2,
+                               reduceBlocks(levels[-1][1], 2, self.method)))
+            self.view.sigPyramidReady.emit(self, levels)
+        except Exception as e:
+            # File closed or view deleted in the meantime, or out of
+            # memory. An exception escaping a QRunnable aborts the
+            # application.
+            print(e)
+
+
+class TileLoader(QtCore.QRunnable):
+    """Read a tile of the plane at level `factor` and downsample it"""
+    def __init__(self, view, plane, key, rows, cols, method):
+        super(TileLoader, self).__init__()
+        self.setAutoDelete(False)
+        self.view = view
+        self.plane = plane
+        self.key = key
+        self.rows = rows
+        self.cols = cols
+        self.method = method
+
+    def run(self):
+        try:
+            with profiler.activity('tile', self.view.name):
+                data = self.plane.read(self.rows, self.cols)
+                tile = reduceBlocks(data, self.key[0], self.method)
+            self.view.sigTileLoaded.emit(self, tile)
+        except Exception as e:
+            # As in PyramidBuilder.run
+            print(e)
+        finally:
+            self.view.tileDone(self.key)
+
+
+class TiledImageView(QtGui.QWidget):
+    """Image view of a 2D plane of a dataset with level of detail.
+
+    Rows of the plane run downwards and columns to the right. For N-D
+    datasets the first two dimensions are shown and the indices of
+    the others can be chosen.
+
+    Signals
+    -------
+
+    sigTileLoaded(loader, tile): the tile of `loader` (a TileLoader)
+    has been read (emitted from worker threads).
+
+    sigPyramidProgress(done, total): rows of the plane processed for
+    the overview.
+
+    sigPyramidReady(builder, levels): the overview levels, a list of
+    (factor, image) from fine to coarse.
+
+    """
+    sigTileLoaded = QtCore.pyqtSignal(object, object)
+    sigPyramidProgress = QtCore.pyqtSignal(int, int)
+    sigPyramidReady = QtCore.pyqtSignal(object, object)
+    tileSize = 256
+    overviewPixels = 4 * 1024 * 1024
+    maxTiles = 256
+
+    def __init__(self, parent=None, dataset=None):
+        super(TiledImageView, self).__init__(parent)
+        self.name = ''
+        self.dataset = None
+        self.plane = None
+        self.builder = None
+        self.levels = []
+        self.overviewFactor = 1
+        self.autoLevels = True
+        self.tiles = OrderedDict()    # (factor, tileRow, tileCol) -> image
+        self.tileItems = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.graphics = pg.GraphicsLayoutWidget()
+        self.viewBox = self.graphics.addViewBox(lockAspect=True, invertY=True)
+        self.overviewItem = pg.ImageItem(axisOrder='row-major')
+        self.overviewItem.setZValue(-1)
+        self.viewBox.addItem(self.overviewItem)
+        self.lut = pg.HistogramLUTItem(image=self.overviewItem)
+        self.graphics.addItem(self.lut)
+        self.lut.sigLookupTableChanged.connect(self.updateTileColors)
+        self.lut.sigLevelsChanged.connect(self.updateTileColors)
+        self.methodCombo = QtGui.QComboBox()
+        self.methodCombo.addItems(['mean', 'max'])
+        self.methodCombo.activated.connect(self.rebuild)
+        self.progress = QtGui.QLabel()
+        self.controls = QtGui.QHBoxLayout()
+        self.controls.addWidget(QtGui.QLabel('Downsample by'))
+        self.controls.addWidget(self.methodCombo)
+        self.indexSpins = []
+        self.controls.addStretch()
+        self.controls.addWidget(self.progress)
+        layout = QtGui.QVBoxLayout()
+        layout.addLayout(self.controls)
+        layout.addWidget(self.graphics)
+        self.setLayout(layout)
+        # Avoid loading tiles on every step while panning/zooming
+        self.updateTimer = QtCore.QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(50)
+        self.updateTimer.timeout.connect(self.updateView)
+        self.viewBox.sigRangeChanged.connect(self.updateTimer.start)
+        self.sigTileLoaded.connect(self.tileLoaded)
+        self.sigPyramidProgress.connect(self.showProgress)
+        self.sigPyramidReady.connect(self.pyramidReady)
+        if dataset is not None:
+            self.setDataset(dataset)
+
+    def setDataset(self, dataset):
+        self.dataset = dataset
+        self.autoLevels = True
+        self.name = '{}:{} image'.format(dataset.file.filename, dataset.name)
+        for spin in self.indexSpins:
+            spin.deleteLater()
+        self.indexSpins = []
+        for dim in range(2, len(dataset.shape)):
+            spin = QtGui.QSpinBox()
+            spin.setPrefix('dim {}: '.format(dim))
+            spin.setRange(0, dataset.shape[dim] - 1)
+            spin.valueChanged.connect(self.rebuild)
+            self.controls.insertWidget(2 + dim - 2, spin)
+            self.indexSpins.append(spin)
+        self.rebuild()
+        self.viewBox.setRange(xRange=(0, self.plane.shape[1]),
+                              yRange=(0, self.plane.shape[0]))
+
+    def rebuild(self, *args):
+        """Start over for the current plane and downsampling method"""
+        if self.builder is not None:
+            self.builder.cancelled = True
+        indices = (slice(None), slice(None)) + tuple(spin.value() for spin in self.indexSpins)
+        self.plane = Plane(self.dataset, indices)
+        rows, cols = self.plane.shape
+        factor = 1
+        while -(-rows // factor) * -(-cols // factor) > self.overviewPixels:
+            factor *= 2
+        self.overviewFactor = factor
+        self.clearTiles()
+        method = self.methodCombo.currentText()
+        cached = sidecar.defaultCache().load(self.dataset, 'image',
+                                             plane=self.plane.key(),
+                                             method=method, factor=factor)
+        if cached is not None:
+            levels = sorted((int(name[5:]), image) for name, image in cached.items())
+            self.builder = None
+            self.setLevels(levels)
+            return
+        self.levels = []
+        self.builder = PyramidBuilder(self, self.plane, factor, method)
+        # Shown as it fills up, see showProgress
+        self.overviewItem.clear()
+        self.pool.start(self.builder)
+
+    def showProgress(self, done, total):
+        if self.builder is None:
+            return
+        self.progress.setText('Building overview: {}%'.format(100 * done // max(total, 1)))
+        rows, cols = self.plane.shape
+        self.overviewItem.setImage(self.builder.overview, autoLevels=False)
+        self.overviewItem.setRect(QtCore.QRectF(0, 0, cols, rows))
+        self.setAutoLevels(self.builder.overview, final=False)
+
+    def setAutoLevels(self, image, final=True):
+        """Set the color levels to the range of `image` unless the user
+        has had a chance to set them"""
+        if not self.autoLevels:
+            return
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lo, hi = np.nanmin(image), np.nanmax(image)
+        if np.isfinite(lo) and np.isfinite(hi):
+            self.lut.setLevels(float(lo), float(hi))
+        self.autoLevels = not final
+
+    def pyramidReady(self, builder, levels):
+        if builder is not self.builder:
+            return  # superseded
+        self.builder = None
+        sidecar.defaultCache().store(
+            self.dataset, 'image',
+            {'level{}'.format(factor): image for factor, image in levels},
+            plane=builder.plane.key(), method=builder.method,
+            factor=builder.factor)
+        self.setLevels(levels)
+
+    def setLevels(self, levels):
+        self.levels = levels
+        self.progress.setText('')
+        self.setAutoLevels(levels[-1][1])
+        self.updateView()
+
+    def dataPerPixel(self):
+        """Data entries per screen pixel at the current zoom"""
+        width = self.viewBox.width()
+        if width <= 0:
+            return 1.0
+        (xmin, xmax), _ = self.viewBox.viewRange()
+        return (xmax - xmin) / width
+
+    def updateView(self):
+        """Show the overview level and the tiles matching the zoom"""
+        if self.plane is None:
+            return
+        with profiler.activity('update', self.name):
+            rows, cols = self.plane.shape
+            factor = 1
+            while factor * 2 <= self.dataPerPixel():
+                factor *= 2
+            if len(self.levels) > 0:
+                coarse = [level for level in self.levels if level[0] <= factor]
+                _, image = coarse[-1] if len(coarse) > 0 else self.levels[0]
+                if self.overviewItem.image is not image:
+                    self.overviewItem.setImage(image, autoLevels=False)
+                    self.overviewItem.setRect(QtCore.QRectF(0, 0, cols, rows))
+            needed = set()
+            if factor < self.overviewFactor:
+                needed = set(self.visibleTiles(factor))
+            for key in list(self.tileItems.keys()):
+                if key not in needed:
+                    self.viewBox.removeItem(self.tileItems.pop(key))
+            with self.lock:
+                for key in [key for key in self.pending if key not in needed]:
+                    if self.pool.tryTake(self.pending[key]):
+                        self.pending.pop(key)
+            for key in needed:
+                if key in self.tileItems:
+                    continue
+                if key in self.tiles:
+                    self.tiles.move_to_end(key)
+                    self.showTile(key)
+                else:
+                    self.requestTile(key)
+
+    def tileExtent(self, factor):
+        """Rows and columns of the plane covered by a tile at level
+        `factor`, rounded up to whole chunks"""
+        return (alignUp(self.tileSize * factor, self.plane.chunks[0]),
+                alignUp(self.tileSize * factor, self.plane.chunks[1]))
+
+    def visibleTiles(self, factor):
+        rows, cols = self.plane.shape
+        tileRows, tileCols = self.tileExtent(factor)
+        (xmin, xmax), (ymin, ymax) = self.viewBox.viewRange()
+        rowRange = range(max(0, int(ymin) // tileRows),
+                         min(-(-rows // tileRows), int(ymax) // tileRows + 1))
+        colRange = range(max(0, int(xmin) // tileCols),
+                         min(-(-cols // tileCols), int(xmax) // tileCols + 1))
+        return [(factor, rr, cc) for rr in rowRange for cc in colRange]
+
+    def tileRect(self, key):
+        factor, tileRow, tileCol = key
+        rows, cols = self.plane.shape
+        tileRows, tileCols = self.tileExtent(factor)
+        top, left = tileRow * tileRows, tileCol * tileCols
+        return (slice(top, min(top + tileRows, rows)),
+                slice(left, min(left + tileCols, cols)))
+
+    def requestTile(self, key):
+        rowSlice, colSlice = self.tileRect(key)
+        with self.lock:
+            if key in self.pending:
+                return
+            loader = TileLoader(self, self.plane, key, rowSlice, colSlice,
+                                self.methodCombo.currentText())
+            self.pending[key] = loader
+        self.pool.start(loader)
+
+    def tileDone(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def tileLoaded(self, loader, tile):
+        if loader.plane is not self.plane \
+           or loader.method != self.methodCombo.currentText():
+            return  # for a plane or method no longer shown
+        key = loader.key
+        self.tiles[key] = tile
+        while len(self.tiles) > self.maxTiles:
+            self.tiles.popitem(last=False)
+        if key in self.visibleTiles(key[0]) and key not in self.tileItems:
+            self.showTile(key)
+
+    def showTile(self, key):
+        rowSlice, colSlice = self.tileRect(key)
+        item = pg.ImageItem(self.tiles[key], axisOrder='row-major')
+        item.setRect(QtCore.QRectF(colSlice.start, rowSlice.start,
+                                   colSlice.stop - colSlice.start,
+                                   rowSlice.stop - rowSlice.start))
+        item.setLookupTable(self.lut.getLookupTable)
+        item.setLevels(self.lut.getLevels())
+        self.tileItems[key] = item
+        self.viewBox.addItem(item)
+
+    def updateTileColors(self, *args):
+        levels = self.lut.getLevels()
+        for item in self.tileItems.values():
+            item.setLookupTable(self.lut.getLookupTable, update=False)
+            item.setLevels(levels)
+
+    def clearTiles(self):
+        for item in self.tileItems.values():
+            self.viewBox.removeItem(item)
+        self.tileItems.clear()
+        self.tiles.clear()
+        with self.lock:
+            for key, loader in list(self.pending.items()):
+                if self.pool.tryTake(loader):
+                    self.pending.pop(key)
+            # Tiles still being read are for the old plane; their
+            # results are dropped as their keys are not needed
+            self.pending.clear()
+
+    def closeEvent(self, event):
+        if self.builder is not None:
+            self.builder.cancelled = True
+        self.clearTiles()
+        super(TiledImageView, self).closeEvent(event)
+
+
+# 
+# imageview.py ends here
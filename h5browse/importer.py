@@ -0,0 +1,404 @@
+# importer.py --- 
+# 
+# Filename: importer.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:43:28 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:43:28 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Import of raw binary, .npy and CSV files into a new dataset without
+# loading the whole file in memory.
+# 
+# A source reads its file in blocks of rows (along the first
+# dimension): RawSource and NpySource read each block into the same
+# buffer with readinto, CsvSource parses a block of lines at a time
+# with np.loadtxt. `importData` creates a dataset resizable along the
+# first dimension and writes each block as a hyperslab. The number of
+# rows in a block is a multiple of the rows in a chunk, so that every
+# write covers whole chunks and HDF5 never has to read back (and
+# decompress) a partially written one. The memory used is about one
+# block (`blockBytes`) whatever the size of the file.
+# 
+# Big-endian data is written to a dataset of native byte order, HDF5
+# converting it on the way.
+# 
+# Fortran-ordered .npy files are read through a memory map instead,
+# since their rows are not contiguous in the file.
+# 
+# CSV files do not tell the number of rows upfront. The dataset is
+# created with a size estimated from the length of the first lines,
+# grown as needed and cut to the actual number of rows at the end.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Streaming import of binary, NumPy and CSV files into HDF5 datasets"""
+
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+import numpy as np
+import h5py as h5
+
+import planner
+
+
+formats = ['raw', 'npy', 'csv']
+
+# Lines read from a CSV file to count its columns and estimate its rows
+sampleLines = 1000
+
+
+def resolveShape(shape, count):
+    """Replace the one -1 (or None) in `shape` so that it holds
+    `count` items, dropping any incomplete trailing row"""
+    shape = tuple(-1 if size is None else int(size) for size in shape)
+    if shape.count(-1) > 1:
+        raise ValueError('only one dimension of {} can be unknown'.format(shape))
+    if -1 in shape:
+        rest = int(np.prod([size for size in shape if size != -1]))
+        shape = tuple(count // max(rest, 1) if size == -1 else size for size in shape)
+    if int(np.prod(shape)) > count:
+        raise ValueError('{} items do not fill shape {}'.format(count, shape))
+    return shape
+
+
+def nativeDtype(dtype):
+    """`dtype` in the byte order of this machine"""
+    return np.dtype(dtype).newbyteorder('=')
+
+
+def blockRows(chunks, rowBytes, targetBytes):
+    """Rows to write at a time: a multiple of the rows in a chunk,
+    about `targetBytes` in all"""
+    rows = max(1, targetBytes // max(rowBytes, 1))
+    if chunks is not None:
+        rows = max(chunks[0], rows // chunks[0] * chunks[0])
+    return rows
+
+
+class RawSource(object):
+    """Binary file of `shape` items of `dtype` starting at byte
+    `offset`, in C order. One dimension of `shape` can be -1 to take
+    what the file holds. The byte order is that of `dtype`, e.g. '>i2'
+    for big-endian 16 bit integers."""
+    def __init__(self, path, dtype, shape=(-1,), offset=0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.offset = offset
+        size = os.path.getsize(path) - offset
+        self.shape = resolveShape(shape, size // self.dtype.itemsize)
+        self.rows = self.shape[0]
+        self.nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def blocks(self, rows):
+        """Yield (block, bytes read so far) with up to `rows` rows in
+        each block. The same buffer is reused for all blocks."""
+        buf = np.empty((min(rows, self.rows),) + self.shape[1:], dtype=self.dtype)
+        with open(self.path, 'rb') as infile:
+            infile.seek(self.offset)
+            for start in range(0, self.rows, rows):
+                block = buf[:min(rows, self.rows - start)]
+                count = infile.readinto(block.reshape(-1).view(np.uint8))
+                if count < block.nbytes:
+                    raise IOError('{}: file ended at byte {}'.format(
+                        self.path, infile.tell()))
+                yield block, infile.tell() - self.offset
+
+
+class NpySource(RawSource):
+    """A .npy file"""
+    def __init__(self, path):
+        # np.load only parses the header of a memory-mapped file
+        self.array = np.load(path, mmap_mode='r')
+        self.path = path
+        self.dtype = self.array.dtype
+        self.offset = self.array.offset
+        self.shape = self.array.shape
+        self.rows = self.shape[0] if len(self.shape) > 0 else 0
+        self.nbytes = self.array.nbytes
+
+    def blocks(self, rows):
+        if self.array.flags.c_contiguous:
+            return super(NpySource, self).blocks(rows)
+        return self.mappedBlocks(rows)
+
+    def mappedBlocks(self, rows):
+        rowBytes = self.nbytes // max(self.rows, 1)
+        for start in range(0, self.rows, rows):
+            block = np.ascontiguousarray(self.array[start: start + rows])
+            yield block, (start + len(block)) * rowBytes
+
+
+class CsvSource(object):
+    """Text file with one row of numbers per line, all of `dtype`.
+
+    delimiter: separator of the values, None for whitespace.
+
+    skiprows: number of lines to skip at the start.
+
+    header: if True the first line after the skipped ones has the
+    column names, and the dataset gets a compound type with a field
+    of `dtype` for each column.
+
+    Lines starting with `comments` are ignored.
+
+    """
+    def __init__(self, path, dtype=np.float64, delimiter=',', skiprows=0,
+                 header=False, comments='#', encoding='utf-8'):
+        self.path = path
+        self.delimiter = delimiter
+        self.skiprows = skiprows
+        self.comments = comments
+        self.encoding = encoding
+        self.nbytes = os.path.getsize(path)
+        self.names = None
+        with open(path, 'rb') as infile:
+            lines = list(islice(infile, skiprows + int(header) + sampleLines))
+        start = skiprows
+        if header:
+            if len(lines) <= skiprows:
+                raise ValueError('{}: no header line'.format(path))
+            self.names = [name.strip().strip('"')
+                          for name in self.split(lines[skiprows].decode(encoding))]
+            start += 1
+        self.headerBytes = sum(len(line) for line in lines[:start])
+        sample = self.parse(lines[start:], np.dtype(dtype), ndmin=2)
+        if sample.shape[0] == 0:
+            raise ValueError('{}: no data'.format(path))
+        columns = sample.shape[1]
+        if self.names is not None:
+            if len(self.names) != columns:
+                raise ValueError('{}: {} column names for {} columns'.format(
+                    path, len(self.names), columns))
+            self.dtype = np.dtype([(name, dtype) for name in self.names])
+            self.shape = (0,)
+        else:
+            self.dtype = np.dtype(dtype)
+            self.shape = (0,) if columns == 1 else (0, columns)
+        # The number of rows is not known until the whole file is
+        # parsed, hence 0 in `shape`
+        self.rows = None
+        sampleBytes = sum(len(line) for line in lines[start:])
+        self.estimatedRows = max(1, int(sample.shape[0] * (self.nbytes - self.headerBytes)
+                                        / max(sampleBytes, 1)))
+
+    def split(self, line):
+        return line.split(self.delimiter) if self.delimiter is not None \
+            else line.split()
+
+    def parse(self, lines, dtype, ndmin=1):
+        return np.loadtxt([line.decode(self.encoding) for line in lines],
+                          dtype=dtype, delimiter=self.delimiter,
+                          comments=self.comments, ndmin=ndmin)
+
+    def blocks(self, rows):
+        """Yield (block, bytes read so far) with up to `rows` lines
+        parsed in each block (fewer rows if there are comments or
+        blank lines)"""
+        ndmin = 2 if len(self.shape) == 2 else 1
+        with open(self.path, 'rb') as infile:
+            position = self.headerBytes
+            for line in islice(infile, self.skiprows + int(self.names is not None)):
+                pass
+            while True:
+                lines = list(islice(infile, rows))
+                if len(lines) == 0:
+                    return
+                position += sum(len(line) for line in lines)
+                block = self.parse(lines, self.dtype, ndmin=ndmin)
+                if len(block) > 0:
+                    if block.shape[1:] != self.shape[1:]:
+                        raise ValueError('{}: expected rows of shape {}, got {}'.format(
+                            self.path, self.shape[1:], block.shape[1:]))
+                    yield block, position
+
+
+def guessFormat(path):
+    """Format of file `path` from its extension: .npy, CSV for .csv,
+    .txt and .tsv, raw binary otherwise"""
+    ext = os.path.splitext(path)[1].lower()
+    return {'.npy': 'npy', '.csv': 'csv', '.txt': 'csv', '.tsv': 'csv'}.get(ext, 'raw')
+
+
+def openSource(path, format=None, **options):
+    """Source for file `path` in `format` (one of `formats`, by default
+    `guessFormat(path)`). `options` are passed on to the source:
+    dtype, shape and offset for raw, dtype, delimiter, skiprows and
+    header for CSV."""
+    if format is None:
+        format = guessFormat(path)
+    if format == 'npy':
+        return NpySource(path)
+    elif format == 'csv':
+        return CsvSource(path, **options)
+    elif format == 'raw':
+        return RawSource(path, **options)
+    raise ValueError('unknown format {}'.format(format))
+
+
+def sample(source, nbytes=planner.sampleBytes):
+    """Copy of the first rows of `source`, about `nbytes`, e.g. for
+    planner.plan"""
+    rowBytes = source.dtype.itemsize * int(np.prod(source.shape[1:]))
+    for block, position in source.blocks(max(1, nbytes // max(rowBytes, 1))):
+        return block.copy()
+    return np.empty((0,) + source.shape[1:], dtype=source.dtype)
+
+
+def importData(source, group, name, chunks=True, compression=None,
+               compression_opts=None, shuffle=False, blockBytes=32*1024*1024,
+               progress=None, cancelled=None):
+    """Create dataset `name` in `group` from `source` and return it.
+
+    The dataset is resizable along the first dimension and chunked,
+    with `chunks`, `compression`, `compression_opts` and `shuffle` as
+    in h5py's create_dataset (chunks=True to let h5py pick the chunk
+    shape, see planner.py for a better choice).
+
+    blockBytes: approximate amount of data read and written at a time.
+
+    progress: callable taking (bytes of the source read, total bytes).
+
+    cancelled: callable returning True if the import should be
+    abandoned, in which case the dataset is deleted and None is
+    returned.
+
+    """
+    if len(source.shape) == 0:
+        raise ValueError('{}: cannot import a scalar'.format(source.path))
+    rows = source.rows if source.rows is not None else source.estimatedRows
+    dset = group.create_dataset(name, shape=(rows,) + source.shape[1:],
+                                maxshape=(None,) + source.shape[1:],
+                                dtype=nativeDtype(source.dtype),
+                                chunks=chunks, compression=compression,
+                                compression_opts=compression_opts,
+                                shuffle=shuffle)
+    rowBytes = source.dtype.itemsize * int(np.prod(source.shape[1:]))
+    start = 0
+    try:
+        for block, position in source.blocks(blockRows(dset.chunks, rowBytes, blockBytes)):
+            if cancelled is not None and cancelled():
+                del group[name]
+                return None
+            stop = start + len(block)
+            if stop > dset.shape[0]:
+                dset.resize(max(stop, dset.shape[0] * 5 // 4), axis=0)
+            dset[start: stop] = block
+            start = stop
+            if progress is not None:
+                progress(position, source.nbytes)
+        if dset.shape[0] != start:
+            dset.resize(start, axis=0)
+    except Exception:
+        del group[name]
+        raise
+    return dset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Import a raw binary, .npy or CSV file into an HDF5 dataset')
+    parser.add_argument('infile', help='file to import')
+    parser.add_argument('outfile', help='HDF5 file, created if it does not exist')
+    parser.add_argument('dataset', help='path of the new dataset')
+    parser.add_argument('-f', dest='format', choices=formats, default=None,
+                        help='format of infile, by default from its extension')
+    parser.add_argument('-t', dest='dtype', default='f8',
+                        help='data type, e.g. <i2 for little-endian 16 bit integers')
+    parser.add_argument('-s', dest='shape', default='-1',
+                        help='shape of raw data, comma separated, one can be -1 (e.g. -s=-1,32)')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='bytes to skip at the start of raw data')
+    parser.add_argument('-d', dest='delimiter', default=',',
+                        help='CSV delimiter, "" for whitespace')
+    parser.add_argument('--skiprows', type=int, default=0,
+                        help='CSV lines to skip at the start')
+    parser.add_argument('--header', action='store_true',
+                        help='first CSV line has the column names')
+    parser.add_argument('-c', dest='compression', default=None,
+                        help='compression filter, e.g. gzip or lzf')
+    parser.add_argument('-p', dest='plan', choices=planner.accessPatterns, default=None,
+                        help='choose chunks and compression for this access by'
+                        ' trying them on a sample (overrides -c)')
+    parser.add_argument('--axis', type=int, default=0,
+                        help='axis of the series for -p series')
+    args = parser.parse_args(argv)
+    format = args.format or guessFormat(args.infile)
+    if format == 'csv':
+        options = {'dtype': args.dtype, 'delimiter': args.delimiter or None,
+                   'skiprows': args.skiprows, 'header': args.header}
+    elif format == 'raw':
+        options = {'dtype': args.dtype, 'offset': args.offset,
+                   'shape': [int(size) for size in args.shape.split(',')]}
+    else:
+        options = {}
+    try:
+        source = openSource(args.infile, format, **options)
+        layout = {'chunks': True, 'compression': args.compression}
+        if args.plan is not None:
+            layout, _ = planner.plan(source.shape, source.dtype, args.plan, args.axis,
+                                     sample(source))
+            print('Planned', planner.describe(layout))
+        start = time.perf_counter()
+        last = [start]
+
+        def report(done, total):
+            now = time.perf_counter()
+            if now - last[0] >= 1.0:
+                last[0] = now
+                print('{:.0f}% {:.1f} MB/s'.format(100.0 * done / max(total, 1),
+                                                  done / 1e6 / (now - start)))
+
+        with h5.File(args.outfile, 'a') as fd:
+            dset = importData(source, fd, args.dataset, progress=report, **layout)
+            seconds = time.perf_counter() - start
+            print('{}: shape {} {}, {:.1f} MB in {:.1f} s ({:.1f} MB/s)'.format(
+                dset.name, dset.shape, dset.dtype, source.nbytes / 1e6, seconds,
+                source.nbytes / 1e6 / max(seconds, 1e-9)))
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# importer.py ends here
@@ -0,0 +1,419 @@
+# nodedialogs.py --- 
+# 
+# Filename: nodedialogs.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:38:14 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:38:14 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Dialogs for creating datasets and groups from the file tree, for
+# importing data files (see importer.py) and for repacking datasets
+# (see repack.py). They are built on pyqtgraph's parameter trees, so
+# they live apart from hdftreewidget and are imported when first
+# used.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Dialogs to create, import and repack HDF5 datasets and groups"""
+
+import os
+import numpy as np
+from pyqtgraph import (QtCore, QtGui)
+from pyqtgraph import parametertree as ptree
+
+import importer
+import planner
+import repack
+
+
+class DatasetDialog(QtGui.QDialog):
+    """Dialog for the structure of a new dataset. The chunks and
+    compression follow planner.suggest for the shape, datatype and
+    access given, unless edited."""
+    def __init__(self, parent=None):
+        super(DatasetDialog, self).__init__(parent)
+        self.params = ptree.Parameter.create(name='datasetParameters',
+                                             title='Dataset parameters',
+                                             type='group',
+                                             children=[{'name': 'name',
+                                                        'type': 'str',
+                                                        'value': 'dataset'},
+                                                       {'name': 'dtype',
+                                                        'title': 'datatype',
+                                                        'type': 'str',
+                                                        'value': 'float'},
+                                                       {'name': 'shape',
+                                                        'type': 'str',
+                                                        'value': '(0),'},
+                                                       {'name': 'maxshape',
+                                                        'type': 'str',
+                                                        'value': '(None,)'},
+                                                       layoutParameter()])
+        for name in ('dtype', 'shape', 'maxshape'):
+            self.params.child(name).sigValueChanged.connect(self.suggestLayout)
+        for name in ('access', 'axis'):
+            self.params.child('layout', name).sigValueChanged.connect(self.suggestLayout)
+        self.suggestLayout()
+        layout = QtGui.QVBoxLayout()
+        paramTree = ptree.ParameterTree(showHeader=False)
+        paramTree.setParameters(self.params)
+        self.tabWidget = QtGui.QTabWidget()
+        self.tabWidget.addTab(paramTree, 'Structure')
+        attrTree = ptree.ParameterTree(showHeader=False)
+        self.attrs = XtensibleParam(name='attrs', title='Attributes')
+        attrTree.setParameters(self.attrs)
+        self.tabWidget.addTab(attrTree, 'Attributes')
+        layout.addWidget(self.tabWidget)
+        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.setLayout(layout)
+
+    def suggestLayout(self, *args):
+        try:
+            shape = eval(self.params['shape'])
+            maxshape = eval(self.params['maxshape'])
+            dtype = eval('np.dtype({})'.format(self.params['dtype']))
+        except Exception:
+            # Incomplete while being typed
+            return
+        if not isinstance(shape, tuple):
+            shape = (shape,)
+        if isinstance(maxshape, tuple) and len(maxshape) == len(shape):
+            # Growable dimensions count as unknown
+            shape = tuple(0 if limit is None else size
+                          for size, limit in zip(shape, maxshape))
+        layout = self.params.child('layout')
+        setLayoutValues(layout, planner.suggest(shape, dtype, layout['access'],
+                                                layout['axis']))
+
+    def getDatasetParams(self):
+        values = {child.name(): child.value() for child in self.params.children()
+                  if child.name() != 'layout'}
+        values['maxshape'] = eval(values['maxshape'])
+        values['shape'] = eval(values['shape'])
+        values['dtype'] = eval('np.dtype({})'.format(values['dtype']))
+        values.update(layoutValues(self.params.child('layout')))
+        values['attrs'] = {ch.name(): ch.value() for ch in self.attrs.children()}
+        return values
+
+
+class GroupDialog(QtGui.QDialog):
+    def __init__(self, parent=None):
+        super(GroupDialog, self).__init__(parent)
+        self.params = ptree.Parameter.create(name='groupParameters',
+                                             title='Group attributes',
+                                             type='group',
+                                             children=[{'name': 'name', 'title': 'Name', 'type': 'str',
+                                                        'value': 'group'},
+                                                       XtensibleParam(name='attrs', title='Attributes')])
+        
+        layout = QtGui.QVBoxLayout()
+        paramTree = ptree.ParameterTree(showHeader=False)
+        paramTree.setParameters(self.params)
+        layout.addWidget(paramTree)
+        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.setLayout(layout)
+                                                        
+    def getParams(self):
+        values = self.params.getValues()
+        opts = {'name': self.params.child('name').value(),
+                'attrs': {ch.name(): ch.value() for ch in self.params.child('attrs').children()}}
+        return opts
+
+
+class ImportDialog(QtGui.QDialog):
+    """Dialog for a file to import as a dataset, with the options of
+    importer.openSource. Those not used by the chosen format are
+    ignored.
+
+    The storage layout follows planner.suggest for the source as it
+    is set up. "Plan layout" measures the candidate layouts on a
+    sample of the file instead (planner.plan).
+
+    """
+    sourceOptions = ['file', 'format', 'dtype', 'byteorder', 'shape', 'offset',
+                     'delimiter', 'skiprows', 'header']
+
+    def __init__(self, parent=None):
+        super(ImportDialog, self).__init__(parent)
+        self.params = ptree.Parameter.create(
+            name='importParameters', title='Import parameters', type='group',
+            children=[{'name': 'file', 'type': 'str', 'value': ''},
+                      {'name': 'browse', 'title': 'Browse...', 'type': 'action'},
+                      {'name': 'name', 'type': 'str', 'value': 'dataset'},
+                      {'name': 'format', 'type': 'list',
+                       'values': ['auto'] + importer.formats, 'value': 'auto'},
+                      {'name': 'dtype', 'title': 'datatype', 'type': 'str',
+                       'value': 'float64'},
+                      {'name': 'byteorder', 'title': 'byte order', 'type': 'list',
+                       'values': {'as datatype': '|', 'native': '=',
+                                  'little-endian': '<', 'big-endian': '>'},
+                       'value': '|'},
+                      {'name': 'shape', 'title': 'shape (raw)', 'type': 'str',
+                       'value': '(-1,)'},
+                      {'name': 'offset', 'title': 'header bytes (raw)', 'type': 'int',
+                       'value': 0, 'limits': (0, None)},
+                      {'name': 'delimiter', 'title': 'delimiter (CSV)', 'type': 'str',
+                       'value': ','},
+                      {'name': 'skiprows', 'title': 'skip lines (CSV)', 'type': 'int',
+                       'value': 0, 'limits': (0, None)},
+                      {'name': 'header', 'title': 'column names (CSV)', 'type': 'bool',
+                       'value': False},
+                      layoutParameter(),
+                      {'name': 'plan', 'title': 'Plan layout', 'type': 'action'},
+                      {'name': 'planned', 'title': 'planned', 'type': 'str',
+                       'value': '', 'readonly': True}])
+        self.params.child('browse').sigActivated.connect(self.browse)
+        self.params.child('plan').sigActivated.connect(self.planLayout)
+        for name in self.sourceOptions:
+            self.params.child(name).sigValueChanged.connect(self.suggestLayout)
+        for name in ('access', 'axis'):
+            self.params.child('layout', name).sigValueChanged.connect(self.suggestLayout)
+        layout = QtGui.QVBoxLayout()
+        paramTree = ptree.ParameterTree(showHeader=False)
+        paramTree.setParameters(self.params)
+        self.tabWidget = QtGui.QTabWidget()
+        self.tabWidget.addTab(paramTree, 'Source')
+        attrTree = ptree.ParameterTree(showHeader=False)
+        self.attrs = XtensibleParam(name='attrs', title='Attributes')
+        attrTree.setParameters(self.attrs)
+        self.tabWidget.addTab(attrTree, 'Attributes')
+        layout.addWidget(self.tabWidget)
+        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.setLayout(layout)
+
+    def browse(self):
+        path = QtGui.QFileDialog.getOpenFileName(
+            self, 'Import file', self.params['file'],
+            'Data files (*.bin *.dat *.raw *.npy *.csv *.txt *.tsv);;All files (*)')
+        if isinstance(path, tuple):     # PyQt5 returns (path, filter)
+            path = path[0]
+        if not path:
+            return
+        self.params['file'] = str(path)
+        self.params['name'] = os.path.splitext(os.path.basename(str(path)))[0]
+
+    def openSource(self):
+        """Open the source as set up. Raises ValueError or OSError if
+        it cannot be opened with the given options."""
+        values = {name: self.params[name] for name in self.sourceOptions}
+        path = values['file']
+        format = importer.guessFormat(path) if values['format'] == 'auto' \
+            else values['format']
+        text = values['dtype'].strip()
+        # Compound types as a list of (name, type) tuples
+        dtype = np.dtype(eval(text) if text.startswith('[') else text)
+        if values['byteorder'] != '|':
+            dtype = dtype.newbyteorder(values['byteorder'])
+        if format == 'raw':
+            shape = eval(values['shape'])
+            if not isinstance(shape, tuple):
+                shape = (shape,)
+            options = {'dtype': dtype, 'shape': shape, 'offset': values['offset']}
+        elif format == 'csv':
+            options = {'dtype': dtype, 'delimiter': values['delimiter'] or None,
+                       'skiprows': values['skiprows'], 'header': values['header']}
+        else:
+            options = {}
+        return importer.openSource(path, format, **options)
+
+    def suggestLayout(self, *args):
+        try:
+            source = self.openSource()
+        except Exception:
+            # No file yet, or options being typed
+            return
+        layout = self.params.child('layout')
+        setLayoutValues(layout, planner.suggest(source.shape, source.dtype,
+                                                layout['access'], layout['axis']))
+        self.params['planned'] = ''
+
+    def planLayout(self):
+        try:
+            source = self.openSource()
+        except (IOError, OSError, ValueError, TypeError, SyntaxError) as e:
+            print(e)
+            QtGui.QMessageBox.warning(self, 'Cannot open source', str(e))
+            return
+        layout = self.params.child('layout')
+        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            best, results = planner.plan(source.shape, source.dtype, layout['access'],
+                                         layout['axis'], importer.sample(source))
+        finally:
+            QtGui.QApplication.restoreOverrideCursor()
+        setLayoutValues(layout, best)
+        self.params['planned'] = '{:.2f} ms per read, {:.0f}% of raw size'.format(
+            1e3 * results[0]['cost'] / max(results[0]['reads'], 1),
+            100 * results[0]['ratio'])
+
+    def getImportParams(self):
+        """Parameters for EditableItem.createDataset, with the source
+        opened. Raises ValueError or OSError if the source cannot be
+        opened with the given options."""
+        params = {'name': self.params['name'],
+                  'source': self.openSource(),
+                  'attrs': {ch.name(): ch.value() for ch in self.attrs.children()}}
+        params.update(layoutValues(self.params.child('layout')))
+        return params
+
+
+class RepackDialog(QtGui.QDialog):
+    """Dialog for the new storage layout of a dataset to repack (see
+    repack.py). Starts from planner.suggest for its shape; "Plan
+    layout" measures the candidates on its first rows."""
+    def __init__(self, dataset, parent=None):
+        super(RepackDialog, self).__init__(parent)
+        self.dataset = dataset
+        self.setWindowTitle('Repack {}'.format(dataset.name))
+        self.params = ptree.Parameter.create(
+            name='repackParameters', title='Repack parameters', type='group',
+            children=[{'name': 'current', 'type': 'str', 'readonly': True,
+                       'value': planner.describe(repack.describeDataset(dataset))
+                       if dataset.chunks is not None else 'contiguous'},
+                      layoutParameter(),
+                      {'name': 'plan', 'title': 'Plan layout', 'type': 'action'},
+                      {'name': 'planned', 'title': 'planned', 'type': 'str',
+                       'value': '', 'readonly': True}])
+        self.params.child('plan').sigActivated.connect(self.planLayout)
+        for name in ('access', 'axis'):
+            self.params.child('layout', name).sigValueChanged.connect(self.suggestLayout)
+        self.suggestLayout()
+        layout = QtGui.QVBoxLayout()
+        paramTree = ptree.ParameterTree(showHeader=False)
+        paramTree.setParameters(self.params)
+        layout.addWidget(paramTree)
+        buttonBox = QtGui.QDialogButtonBox(QtGui.QDialogButtonBox.Ok | QtGui.QDialogButtonBox.Cancel, QtCore.Qt.Horizontal)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.setLayout(layout)
+
+    def suggestLayout(self, *args):
+        layout = self.params.child('layout')
+        setLayoutValues(layout, planner.suggest(repack.planningShape(self.dataset),
+                                                self.dataset.dtype,
+                                                layout['access'], layout['axis']))
+        self.params['planned'] = ''
+
+    def planLayout(self):
+        layout = self.params.child('layout')
+        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            best, results = planner.plan(repack.planningShape(self.dataset),
+                                         self.dataset.dtype, layout['access'],
+                                         layout['axis'], repack.sample(self.dataset))
+        finally:
+            QtGui.QApplication.restoreOverrideCursor()
+        setLayoutValues(layout, best)
+        self.params['planned'] = '{:.2f} ms per read, {:.0f}% of raw size'.format(
+            1e3 * results[0]['cost'] / max(results[0]['reads'], 1),
+            100 * results[0]['ratio'])
+
+    def getLayout(self):
+        """The plan to repack with"""
+        return layoutValues(self.params.child('layout'))
+
+
+bgBrush = QtGui.QBrush(QtGui.QColor('lightsteelblue'))
+class XtensibleParam(ptree.parameterTypes.GroupParameter):
+    def __init__(self, **opts):
+        opts['type'] = 'group'
+        opts['addText'] = "Add"
+        opts['addList'] = ['int', 'float', 'str']
+        super(XtensibleParam, self).__init__(**opts)
+
+    def addNew(self, typ):
+        val = {'int': '0',
+               'float': '0.0',
+               'str': ''}[typ]
+        child = self.addChild({
+            'name': 'attribute',
+            'type': typ,
+            'value': val,
+            'removable': True,
+            'renamable': True,
+        }, autoIncrementName=True)
+        for item in child.items:
+            item.setBackground(0, bgBrush)
+
+
+
+def layoutParameter():
+    """Group of parameters for the chunks and compression of a new
+    dataset and the access they are planned for"""
+    return ptree.Parameter.create(
+        name='layout', title='Storage layout', type='group',
+        children=[{'name': 'access', 'title': 'mostly read as', 'type': 'list',
+                   'values': planner.accessPatterns, 'value': 'rows'},
+                  {'name': 'axis', 'title': 'series axis', 'type': 'int',
+                   'value': 0},
+                  {'name': 'chunks', 'type': 'str', 'value': 'True'},
+                  {'name': 'compression', 'type': 'list',
+                   'values': ['none', 'gzip', 'lzf'], 'value': 'gzip'},
+                  {'name': 'level', 'title': 'gzip level', 'type': 'int',
+                   'value': 4, 'limits': (0, 9)},
+                  {'name': 'shuffle', 'type': 'bool', 'value': False}])
+
+
+def setLayoutValues(group, layout):
+    """Show plan `layout` (see planner.py) in `group` from
+    layoutParameter"""
+    group['chunks'] = str(layout['chunks'])
+    group['compression'] = layout['compression'] or 'none'
+    if layout['compression'] == 'gzip':
+        group['level'] = layout['compression_opts']
+    group['shuffle'] = bool(layout['shuffle'])
+
+
+def layoutValues(group):
+    """create_dataset keywords for the layout in `group`"""
+    compression = group['compression']
+    return {'chunks': eval(group['chunks']),
+            'compression': None if compression == 'none' else compression,
+            'compression_opts': group['level'] if compression == 'gzip' else None,
+            'shuffle': group['shuffle']}
+
+# 
+# nodedialogs.py ends here
@@ -0,0 +1,303 @@
+# planner.py --- 
+# 
+# Filename: planner.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:47:04 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:47:04 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Choice of chunk shape and compression for a new dataset from its
+# shape, datatype and the way it will mostly be read: 
+# 
+# rows: ranges of whole rows (along the first dimension), as the
+# table view and the record scans do. Chunks span the other
+# dimensions entirely if they fit.
+# 
+# series: long runs along one axis at fixed indices of the others,
+# as when plotting a signal or a column. Chunks are long along the
+# axis and narrow across.
+# 
+# tiles: rectangles of the last two dimensions, as the image view
+# reads them. Chunks are square in those.
+# 
+# Chunks are aimed at `chunkBytes`: large enough to keep the number
+# of chunks (and the B-tree) small, small enough to fit HDF5's default
+# chunk cache of 1 MiB, which a partially read chunk has to go
+# through.
+# 
+# Without data, `suggest` gives the shape of chunk for the access and
+# gzip with the shuffle filter for multi-byte numbers. With a sample of
+# the data, `plan` writes it with each candidate layout (chunk size
+# times filter) to an in-memory file and times reading it back the
+# expected way with the chunk cache off. The cost of a layout is that
+# time plus reading the compressed bytes of the chunks touched at
+# `diskBytesPerSecond`. So compression wins when it saves more disk
+# time than it costs to decompress.
+# 
+# A plan is a dict of the create_dataset keywords chunks,
+# compression, compression_opts and shuffle.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Chunk shape and compression filter for new datasets"""
+
+import time
+from itertools import count
+import numpy as np
+import h5py as h5
+
+
+accessPatterns = ['rows', 'series', 'tiles']
+
+# Target size of a chunk
+chunkBytes = 256 * 1024
+
+# Chunk sizes tried by `plan`
+candidateBytes = [64 * 1024, 256 * 1024, 1024 * 1024]
+
+# Read rate of the storage assumed by `plan`
+diskBytesPerSecond = 200e6
+
+# Largest sample used by `plan`
+sampleBytes = 4 * 1024 * 1024
+
+# Size of the reads of rows in `plan`, as the block cache reads
+readBytes = 512 * 1024
+
+# Length assumed for a dimension of unknown (0) or unlimited size
+unknownLength = 1 << 30
+
+_fileNames = count()
+
+
+def fill(chunk, sizes, order, budget):
+    """Set the entries of `chunk` for the dimensions in `order` to
+    as much of `sizes` as `budget` items allow, in that order"""
+    for dim in order:
+        chunk[dim] = int(max(1, min(sizes[dim], budget)))
+        budget = max(1, budget // chunk[dim])
+    return chunk
+
+
+def chunkShape(shape, itemsize, access='rows', axis=0, targetBytes=chunkBytes):
+    """Chunk shape for a dataset of `shape` and items of `itemsize`
+    bytes read mostly as `access` (one of `accessPatterns`), for
+    `series` along `axis`. Dimensions of size 0 are taken as
+    unlimited."""
+    ndim = len(shape)
+    if ndim == 0:
+        return None
+    sizes = [size if size else unknownLength for size in shape]
+    budget = max(1, targetBytes // itemsize)
+    chunk = [1] * ndim
+    if access == 'rows':
+        return tuple(fill(chunk, sizes, range(ndim - 1, -1, -1), budget))
+    elif access == 'series':
+        axis = axis % ndim
+        others = [dim for dim in range(ndim - 1, -1, -1) if dim != axis]
+        return tuple(fill(chunk, sizes, [axis] + others, budget))
+    elif access == 'tiles':
+        if ndim == 1:
+            return tuple(fill(chunk, sizes, [0], budget))
+        side = int(np.sqrt(budget))
+        # If one side is short, give the rest to the other
+        first = min(sizes[-2], side)
+        chunk[-2] = first
+        chunk[-1] = int(max(1, min(sizes[-1], budget // first)))
+        chunk[-2] = int(max(1, min(sizes[-2], budget // chunk[-1])))
+        return tuple(chunk)
+    raise ValueError('unknown access pattern {}'.format(access))
+
+
+def isNumeric(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.names is not None:
+        return all(isNumeric(dtype.fields[name][0]) for name in dtype.names)
+    return dtype.kind in 'biufc'
+
+
+def filterCandidates(dtype):
+    """Filter settings tried by `plan` for `dtype`: none, lzf and gzip
+    at levels 1 and 4, with and without shuffle for numbers of more
+    than a byte"""
+    filters = [(None, None), ('lzf', None), ('gzip', 1), ('gzip', 4)]
+    shuffles = [False]
+    dtype = np.dtype(dtype)
+    if isNumeric(dtype) and dtype.itemsize > 1:
+        shuffles.append(True)
+    return [{'compression': compression, 'compression_opts': level,
+             'shuffle': shuffle}
+            for compression, level in filters for shuffle in shuffles
+            if compression is not None or not shuffle]
+
+
+def suggest(shape, dtype, access='rows', axis=0):
+    """Plan for `shape` and `dtype` without looking at any data"""
+    dtype = np.dtype(dtype)
+    shuffle = isNumeric(dtype) and dtype.itemsize > 1
+    return {'chunks': chunkShape(shape, dtype.itemsize, access, axis),
+            'compression': 'gzip', 'compression_opts': 4, 'shuffle': shuffle}
+
+
+def selections(shape, itemsize, access, axis=0, limit=16):
+    """Up to `limit` selections on a dataset of `shape` reading it as
+    `access`: consecutive ranges of `readBytes` of rows, series along
+    `axis` or 256 x 256 tiles at random positions"""
+    ndim = len(shape)
+    if access == 'rows':
+        rowBytes = itemsize * int(np.prod(shape[1:]))
+        rows = max(1, readBytes // max(rowBytes, 1))
+        return [(slice(start, start + rows),)
+                for start in range(0, shape[0], rows)][:limit]
+    rng = np.random.default_rng(0)
+    ret = []
+    if access == 'series':
+        axis = axis % ndim
+        for ii in range(limit):
+            ret.append(tuple(slice(None) if dim == axis
+                             else int(rng.integers(shape[dim]))
+                             for dim in range(ndim)))
+        return ret
+    # tiles
+    height = min(shape[-2], 256) if ndim > 1 else 1
+    width = min(shape[-1], 256)
+    for ii in range(limit):
+        sel = [int(rng.integers(size)) for size in shape[:-2]]
+        if ndim > 1:
+            top = int(rng.integers(shape[-2] - height + 1))
+            sel.append(slice(top, top + height))
+        left = int(rng.integers(shape[-1] - width + 1))
+        sel.append(slice(left, left + width))
+        ret.append(tuple(sel))
+    return ret
+
+
+def chunksTouched(selection, shape, chunks):
+    """Number of chunks a read of `selection` has to go through"""
+    total = 1
+    for sel, size, chunk in zip(selection, shape, chunks):
+        if isinstance(sel, slice):
+            start, stop, _ = sel.indices(size)
+            if stop <= start:
+                return 0
+            total *= (stop - 1) // chunk - start // chunk + 1
+    return total
+
+
+def measure(sample, layout, access='rows', axis=0, diskRate=diskBytesPerSecond):
+    """Write `sample` with `layout` (a plan) to an in-memory file and
+    read it back as `access`. Returns a dict with the layout, the
+    seconds to write and to read, the number of `reads`, the
+    compression `ratio` (stored over raw size) and the `cost` of the
+    reads in seconds including the disk time."""
+    name = 'planner{}.h5'.format(next(_fileNames))
+    with h5.File(name, 'w', driver='core', backing_store=False,
+                 rdcc_nbytes=0) as fd:
+        start = time.perf_counter()
+        dset = fd.create_dataset('sample', data=sample, **layout)
+        writeSeconds = time.perf_counter() - start
+        stored = dset.id.get_storage_size()
+        ratio = stored / max(sample.nbytes, 1)
+        chunkNbytes = int(np.prod(layout['chunks'])) * sample.dtype.itemsize
+        touched = 0
+        reads = selections(sample.shape, sample.dtype.itemsize, access, axis)
+        start = time.perf_counter()
+        for selection in reads:
+            dset[selection]
+            touched += chunksTouched(selection, sample.shape, layout['chunks'])
+        readSeconds = time.perf_counter() - start
+    return {'layout': layout, 'writeSeconds': writeSeconds,
+            'readSeconds': readSeconds, 'reads': len(reads), 'ratio': ratio,
+            'cost': readSeconds + touched * chunkNbytes * ratio / diskRate}
+
+
+def plan(shape, dtype, access='rows', axis=0, sample=None, progress=None,
+         diskRate=diskBytesPerSecond):
+    """Plan for a dataset of `shape` and `dtype` read as `access`.
+
+    sample: part of the data (e.g. its first rows). If None, this is
+    `suggest`. Otherwise the candidate layouts are measured on (up to
+    `sampleBytes` of) it and the cheapest returned.
+
+    progress: callable taking (layouts measured, total).
+
+    diskRate: read rate of the storage the dataset will be on, in
+    bytes per second. The slower it is, the more compression pays.
+
+    Returns the plan and the measurements sorted by cost (empty
+    without a sample).
+
+    """
+    if sample is None or len(shape) == 0:
+        return suggest(shape, dtype, access, axis), []
+    sample = np.asarray(sample)
+    rowBytes = max(1, sample[:1].nbytes)
+    sample = sample[:max(1, sampleBytes // rowBytes)]
+    itemsize = sample.dtype.itemsize
+    candidates = []
+    for target in candidateBytes:
+        # Measured with chunks cut to the sample, which has only the
+        # first rows
+        chunks = chunkShape(shape, itemsize, access, axis, target)
+        cut = (min(chunks[0], sample.shape[0]),) + chunks[1:]
+        candidates += [(chunks, dict(filters, chunks=cut))
+                       for filters in filterCandidates(sample.dtype)]
+    results = []
+    for ii, (chunks, layout) in enumerate(candidates):
+        result = measure(sample, layout, access, axis, diskRate)
+        result['layout'] = dict(layout, chunks=chunks)
+        results.append(result)
+        if progress is not None:
+            progress(ii + 1, len(candidates))
+    results.sort(key=lambda result: result['cost'])
+    return dict(results[0]['layout']), results
+
+
+def describe(layout):
+    """Short text for a plan"""
+    if layout['compression'] is None:
+        filters = 'no compression'
+    elif layout['compression_opts'] is None:
+        filters = layout['compression']
+    else:
+        filters = '{} {}'.format(layout['compression'], layout['compression_opts'])
+    if layout.get('shuffle'):
+        filters = 'shuffle + ' + filters
+    return 'chunks {}, {}'.format(layout['chunks'], filters)
+
+
+# 
+# planner.py ends here
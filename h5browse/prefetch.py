@@ -0,0 +1,207 @@
+# prefetch.py --- 
+# 
+# Filename: prefetch.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:01:02 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:01:02 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Dataset blocks are read on a thread pool so that the GUI thread
+# never waits for h5py while painting a table. The views show a
+# placeholder until the block arrives.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Asynchronous loading of dataset blocks into the block cache"""
+
+import threading
+from qtcompat import QtCore
+
+import blockcache
+
+
+class BlockLoader(QtCore.QRunnable):
+    """Runnable reading one block of a dataset into the cache"""
+    def __init__(self, prefetcher, dataset, key, block):
+        super(BlockLoader, self).__init__()
+        self.setAutoDelete(False)
+        self.prefetcher = prefetcher
+        self.dataset = dataset
+        self.key = key
+        self.block = block
+
+    def run(self):
+        cache = self.prefetcher.cache
+        error = None
+        try:
+            data = cache.readBlock(self.dataset, self.key, self.block)
+            self.prefetcher.store(self, data)
+        except Exception as e:
+            # The file may have been closed in the meantime, or h5py
+            # cannot read the type. An exception escaping a QRunnable
+            # aborts the application.
+            print(e)
+            error = str(e)
+        finally:
+            current = self.prefetcher.done(self, error)
+        if not current:
+            return
+        if error is None:
+            self.prefetcher.sigBlockLoaded.emit(self.key, self.block)
+        else:
+            self.prefetcher.sigBlockFailed.emit(self.key, self.block, error)
+
+
+class BlockPrefetcher(QtCore.QObject):
+    """Load dataset blocks into a BlockCache on a thread pool.
+
+    Signals
+    -------
+
+    sigBlockLoaded(key, block): emitted (from the worker thread) after
+    `block` of dataset identified by `key` has been put in the
+    cache. Models connected to it are notified in the GUI thread via
+    queued connection.
+
+    sigBlockFailed(key, block, message): emitted (from the worker
+    thread) when reading `block` failed. The block is not requested
+    again until `forget` is called for the dataset or `forgetFile`
+    for its file.
+
+    """
+    sigBlockLoaded = QtCore.pyqtSignal(object, object)
+    sigBlockFailed = QtCore.pyqtSignal(object, object, str)
+
+    def __init__(self, cache=None, maxThreads=4, parent=None):
+        super(BlockPrefetcher, self).__init__(parent)
+        if cache is None:
+            cache = blockcache.defaultCache
+        self.cache = cache
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(maxThreads)
+        self.pending = {}
+        self.failures = {}  # (key, block) -> error message
+        self.lock = threading.Lock()
+
+    def request(self, dataset, key, block):
+        """Queue loading of `block` unless it is cached, in flight or
+        failed"""
+        with self.lock:
+            if (key, block) in self.pending or (key, block) in self.failures \
+               or self.cache.contains(key, block):
+                return
+            loader = BlockLoader(self, dataset, key, block)
+            self.pending[(key, block)] = loader
+        self.pool.start(loader)
+
+    def isPending(self, key, block):
+        with self.lock:
+            return (key, block) in self.pending
+
+    def store(self, loader, data):
+        """Put the block read by `loader` in the cache, unless its file
+        has been forgotten since the load was queued"""
+        with self.lock:
+            if self.pending.get((loader.key, loader.block)) is loader:
+                self.cache.insert(loader.key, loader.block, data)
+
+    def done(self, loader, error=None):
+        """Clear the pending entry of `loader` and record its error.
+        Returns False if the load is stale, i.e. its file has been
+        forgotten in the meantime."""
+        entry = (loader.key, loader.block)
+        with self.lock:
+            if self.pending.get(entry) is not loader:
+                return False
+            self.pending.pop(entry)
+            if error is not None:
+                self.failures[entry] = error
+            return True
+
+    def failure(self, key, block):
+        """Error message of the failed load of `block`, None if it has
+        not failed"""
+        with self.lock:
+            return self.failures.get((key, block))
+
+    def forget(self, key):
+        """Allow the failed blocks of dataset `key` to be requested
+        again"""
+        with self.lock:
+            for entry in [entry for entry in self.failures if entry[0] == key]:
+                self.failures.pop(entry)
+
+    def forgetFile(self, filename):
+        """Drop the failures and pending loads of all datasets in file
+        `filename`. Called when the file is closed: loads still
+        running are discarded when they finish, so neither their data
+        nor their errors outlive the file."""
+        with self.lock:
+            for entry in [entry for entry in self.failures
+                          if entry[0][0] == filename]:
+                self.failures.pop(entry)
+            for entry in [entry for entry in self.pending
+                          if entry[0][0] == filename]:
+                self.pool.tryTake(self.pending.pop(entry))
+
+    def retain(self, key, blocks):
+        """Cancel queued loads for dataset `key` that are not in
+        `blocks`. Used to drop requests that the viewport has already
+        scrolled past. Loads that have started are not affected."""
+        blocks = set(blocks)
+        with self.lock:
+            stale = [(kk, block) for (kk, block) in self.pending
+                     if kk == key and block not in blocks]
+            for entry in stale:
+                if self.pool.tryTake(self.pending[entry]):
+                    self.pending.pop(entry)
+
+    def waitForDone(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+
+_defaultPrefetcher = None
+
+def defaultPrefetcher():
+    """Prefetcher shared by all dataset widgets, created on first use"""
+    global _defaultPrefetcher
+    if _defaultPrefetcher is None:
+        _defaultPrefetcher = BlockPrefetcher()
+    return _defaultPrefetcher
+
+
+# 
+# prefetch.py ends here
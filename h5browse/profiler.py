@@ -0,0 +1,343 @@
+# profiler.py --- 
+# 
+# Filename: profiler.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:33:41 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:33:41 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Instrumentation of the hot paths of the browser, to find out where
+# the time goes when it stalls: reading (and decompressing) data in
+# h5py, Python code in the models or rendering.
+# 
+# Dataset reads in the models, the block cache, the plots and the
+# image view go through `read`, which records the bytes read and the
+# wall time by dataset. The block cache reports its hits and misses
+# through `cacheAccess`. Widgets wrap what they do in response to the
+# user (painting, updating plots, loading tiles) in `activity`, which
+# records the wall time by widget. Reads and cache accesses within an
+# activity are charged to its widget as well; those in threads
+# outside any activity (e.g. the prefetcher's) go to `background`.
+# The difference between the time of an activity and of the reads in
+# it is model and rendering code.
+# 
+# When the profiler is disabled (the default) `read` adds one
+# attribute lookup to the dataset access, and `activity` returns a
+# shared no-op context manager.
+# 
+# With tracing on, each read and activity is also kept as an event,
+# and the trace can be saved in the Chrome trace event format for
+# chrome://tracing or https://ui.perfetto.dev.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Timing and I/O counters of dataset reads and widget activities"""
+
+import os
+import json
+import time
+import heapq
+import threading
+from itertools import count
+
+
+# Owner of reads and cache accesses outside any activity
+BACKGROUND = 'background'
+
+
+class Counters(object):
+    """Totals for one dataset or widget.
+
+    calls, seconds: number and wall time of activities (widgets only).
+
+    reads, nbytes, readSeconds: number of reads, bytes read and wall
+    time spent reading.
+
+    hits, misses: block cache lookups.
+
+    """
+    __slots__ = ('calls', 'seconds', 'reads', 'nbytes', 'readSeconds',
+                 'hits', 'misses')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def describe(selection):
+    """Short text for a selection tuple"""
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    parts = []
+    for sel in selection:
+        if isinstance(sel, slice):
+            parts.append('{}:{}'.format('' if sel.start is None else sel.start,
+                                        '' if sel.stop is None else sel.stop))
+        elif sel is Ellipsis:
+            parts.append('...')
+        else:
+            parts.append(str(sel))
+    return '[{}]'.format(', '.join(parts))
+
+
+class NullActivity(object):
+    """Context manager doing nothing, for activities while disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+nullActivity = NullActivity()
+
+
+class Activity(object):
+    def __init__(self, profiler, kind, owner):
+        self.profiler = profiler
+        self.kind = kind
+        self.owner = owner
+
+    def __enter__(self):
+        self.profiler.owners().append(self.owner)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.start
+        self.profiler.owners().pop()
+        self.profiler.recordActivity(self.kind, self.owner, self.start, seconds)
+        return False
+
+
+class Profiler(object):
+    """Collects counters by dataset and by widget, the slowest
+    operations and optionally a trace of all of them.
+
+    It may be fed from any thread. The panel (profilerwidget.py)
+    polls `snapshot`.
+
+    maxSlowest: number of slowest operations kept.
+
+    maxEvents: limit on the number of trace events, later ones are
+    dropped (and counted in `droppedEvents`).
+
+    """
+    def __init__(self, maxSlowest=50, maxEvents=1000000):
+        self.enabled = False
+        self.tracing = False
+        self.maxSlowest = maxSlowest
+        self.maxEvents = maxEvents
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.sequence = count()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.datasets = {}
+            self.widgets = {}
+            self.slowest = []
+            self.events = []
+            self.threads = {}
+            self.droppedEvents = 0
+            self.origin = time.perf_counter()
+
+    def setEnabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def setTracing(self, tracing):
+        self.tracing = bool(tracing)
+
+    def owners(self):
+        """Stack of activity owners of the calling thread"""
+        try:
+            return self.local.owners
+        except AttributeError:
+            self.local.owners = []
+            return self.local.owners
+
+    def owner(self):
+        owners = self.owners()
+        return owners[-1] if len(owners) > 0 else BACKGROUND
+
+    def activity(self, kind, owner):
+        """Context manager recording the wall time of `kind` of work
+        (e.g. 'paint') done by widget `owner` (its name)"""
+        if not self.enabled:
+            return nullActivity
+        return Activity(self, kind, owner)
+
+    def counters(self, table, key):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = Counters()
+        return entry
+
+    def addOperation(self, seconds, kind, owner, dataset, detail, start):
+        """Update the slowest operations and the trace. Call with the
+        lock held."""
+        entry = (seconds, next(self.sequence), kind, owner, dataset, detail,
+                 start - self.origin)
+        if len(self.slowest) < self.maxSlowest:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+        if not self.tracing:
+            return
+        if len(self.events) >= self.maxEvents:
+            self.droppedEvents += 1
+            return
+        thread = threading.current_thread()
+        self.threads[thread.ident] = thread.name
+        args = {'owner': owner}
+        if dataset is not None:
+            args['dataset'] = dataset
+        if detail:
+            args['detail'] = detail
+        self.events.append({'name': kind if dataset is None else '{} {}'.format(kind, dataset),
+                            'cat': kind, 'ph': 'X',
+                            'ts': (start - self.origin) * 1e6, 'dur': seconds * 1e6,
+                            'pid': os.getpid(), 'tid': thread.ident,
+                            'args': args})
+
+    def recordActivity(self, kind, owner, start, seconds):
+        with self.lock:
+            entry = self.counters(self.widgets, owner)
+            entry.calls += 1
+            entry.seconds += seconds
+            self.addOperation(seconds, kind, owner, None, '', start)
+
+    def recordRead(self, dataset, selection, data, start, seconds, kind='read'):
+        """Record reading `data` as `selection` of `dataset`"""
+        name = datasetName(dataset)
+        nbytes = getattr(data, 'nbytes', 0)
+        owner = self.owner()
+        with self.lock:
+            for entry in (self.counters(self.datasets, name),
+                          self.counters(self.widgets, owner)):
+                entry.reads += 1
+                entry.nbytes += nbytes
+                entry.readSeconds += seconds
+            self.addOperation(seconds, kind, owner, name, describe(selection), start)
+
+    def recordCacheAccess(self, key, hit):
+        """Record a block cache lookup for the dataset with cache key
+        `key` (see blockcache.datasetKey)"""
+        name = '{}:{}'.format(*key[:2])
+        owner = self.owner()
+        with self.lock:
+            for entry in (self.counters(self.datasets, name),
+                          self.counters(self.widgets, owner)):
+                if hit:
+                    entry.hits += 1
+                else:
+                    entry.misses += 1
+
+    def snapshot(self):
+        """Copy of the counters for display: a dict with `datasets` and
+        `widgets` mapping names to Counters.asDict() and `slowest`, a
+        list of dicts with seconds, kind, owner, dataset, detail and
+        time (since reset), slowest first."""
+        with self.lock:
+            return {'datasets': {name: entry.asDict()
+                                 for name, entry in self.datasets.items()},
+                    'widgets': {name: entry.asDict()
+                                for name, entry in self.widgets.items()},
+                    'slowest': [{'seconds': entry[0], 'kind': entry[2],
+                                 'owner': entry[3], 'dataset': entry[4],
+                                 'detail': entry[5], 'time': entry[6]}
+                                for entry in sorted(self.slowest, reverse=True)],
+                    'events': len(self.events),
+                    'droppedEvents': self.droppedEvents}
+
+    def exportTrace(self, path):
+        """Write the trace events recorded so far to `path` in the
+        Chrome trace event format, with the counters as metadata"""
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        pid = os.getpid()
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                 'args': {'name': name}} for tid, name in threads.items()]
+        snapshot = self.snapshot()
+        snapshot.pop('slowest')
+        with open(path, 'w') as out:
+            json.dump({'traceEvents': meta + events,
+                       'displayTimeUnit': 'ms',
+                       'otherData': snapshot}, out)
+
+
+def datasetName(dataset):
+    try:
+        return '{}:{}'.format(dataset.file.filename, dataset.name)
+    except AttributeError:
+        # e.g. an array passed where a dataset is expected
+        return type(dataset).__name__
+
+
+# Profiler shared by the whole application
+defaultProfiler = Profiler()
+
+
+def read(dataset, selection=()):
+    """Return dataset[selection], recording the read in
+    `defaultProfiler` if it is enabled"""
+    profiler = defaultProfiler
+    if not profiler.enabled:
+        return dataset[selection]
+    start = time.perf_counter()
+    data = dataset[selection]
+    profiler.recordRead(dataset, selection, data, start, time.perf_counter() - start)
+    return data
+
+
+def cacheAccess(key, hit):
+    """Record a block cache lookup in `defaultProfiler` if enabled"""
+    if defaultProfiler.enabled:
+        defaultProfiler.recordCacheAccess(key, hit)
+
+
+def activity(kind, owner):
+    """`defaultProfiler.activity`"""
+    return defaultProfiler.activity(kind, owner)
+
+
+# 
+# profiler.py ends here
@@ -0,0 +1,195 @@
+# profilerwidget.py --- 
+# 
+# Filename: profilerwidget.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:33:41 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:33:41 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Panel showing the counters of profiler.py while the application
+# runs: reads, bytes, block cache hits and misses and time by dataset
+# and by widget, and the slowest operations.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Panel with live I/O and timing counters"""
+
+from qtcompat import (QtCore, QtGui)
+
+import profiler
+
+
+class ProfilerWidget(QtGui.QWidget):
+    """Widget to switch profiling on and off and show its counters.
+
+    The tables are refreshed every `interval` ms while profiling is
+    on and the widget is visible. Times are in milliseconds.
+
+    """
+    interval = 500
+
+    def __init__(self, parent=None):
+        super(ProfilerWidget, self).__init__(parent)
+        self.name = 'Profiler'
+        self.profiler = profiler.defaultProfiler
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(self.interval)
+        self.timer.timeout.connect(self.refresh)
+        self.enableCheck = QtGui.QCheckBox('Enable')
+        self.enableCheck.setChecked(self.profiler.enabled)
+        self.enableCheck.toggled.connect(self.setEnabledProfiling)
+        self.traceCheck = QtGui.QCheckBox('Record trace')
+        self.traceCheck.setChecked(self.profiler.tracing)
+        self.traceCheck.toggled.connect(self.profiler.setTracing)
+        self.resetButton = QtGui.QPushButton('Reset')
+        self.resetButton.clicked.connect(self.reset)
+        self.exportButton = QtGui.QPushButton('Export trace...')
+        self.exportButton.clicked.connect(self.exportTrace)
+        self.status = QtGui.QLabel()
+        self.datasetTable = QtGui.QTableWidget()
+        self.widgetTable = QtGui.QTableWidget()
+        self.slowestTable = QtGui.QTableWidget()
+        for table in (self.datasetTable, self.widgetTable, self.slowestTable):
+            table.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
+            table.setSortingEnabled(True)
+        self.tabs = QtGui.QTabWidget()
+        self.tabs.addTab(self.datasetTable, 'By dataset')
+        self.tabs.addTab(self.widgetTable, 'By widget')
+        self.tabs.addTab(self.slowestTable, 'Slowest')
+        controls = QtGui.QHBoxLayout()
+        controls.addWidget(self.enableCheck)
+        controls.addWidget(self.traceCheck)
+        controls.addWidget(self.resetButton)
+        controls.addWidget(self.exportButton)
+        controls.addStretch()
+        controls.addWidget(self.status)
+        layout = QtGui.QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.tabs)
+        self.setLayout(layout)
+        self.setEnabledProfiling(self.profiler.enabled)
+
+    def setEnabledProfiling(self, enabled):
+        self.profiler.setEnabled(enabled)
+        if enabled:
+            self.timer.start()
+        else:
+            self.timer.stop()
+        self.refresh()
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+    def exportTrace(self):
+        path = QtGui.QFileDialog.getSaveFileName(self, 'Export trace', 'trace.json',
+                                                 'Trace (*.json);;All files (*)')
+        if isinstance(path, tuple):     # PyQt5 returns (path, filter)
+            path = path[0]
+        if not path:
+            return
+        try:
+            self.profiler.exportTrace(str(path))
+        except (IOError, OSError) as e:
+            print(e)
+            QtGui.QMessageBox.warning(self, 'Export failed', str(e))
+
+    def showEvent(self, event):
+        super(ProfilerWidget, self).showEvent(event)
+        if self.profiler.enabled:
+            self.timer.start()
+        self.refresh()
+
+    def hideEvent(self, event):
+        super(ProfilerWidget, self).hideEvent(event)
+        self.timer.stop()
+
+    def fillTable(self, table, columns, rows):
+        table.setSortingEnabled(False)
+        table.clear()
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setRowCount(len(rows))
+        for ii, row in enumerate(rows):
+            for jj, value in enumerate(row):
+                item = QtGui.QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                else:
+                    item.setData(QtCore.Qt.DisplayRole, value)
+                table.setItem(ii, jj, item)
+        table.setSortingEnabled(True)
+
+    def counterRows(self, counters, activities):
+        rows = []
+        for name, entry in counters.items():
+            row = [name]
+            if activities:
+                row += [entry['calls'], round(entry['seconds'] * 1e3, 3)]
+            row += [entry['reads'], round(entry['nbytes'] / 1048576.0, 3),
+                    round(entry['readSeconds'] * 1e3, 3),
+                    entry['hits'], entry['misses']]
+            rows.append(row)
+        return rows
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        snapshot = self.profiler.snapshot()
+        readColumns = ['reads', 'MiB read', 'read ms', 'cache hits', 'cache misses']
+        self.fillTable(self.datasetTable, ['dataset'] + readColumns,
+                       self.counterRows(snapshot['datasets'], False))
+        self.fillTable(self.widgetTable, ['widget', 'calls', 'ms'] + readColumns,
+                       self.counterRows(snapshot['widgets'], True))
+        self.fillTable(self.slowestTable,
+                       ['ms', 'operation', 'widget', 'dataset', 'selection', 'at (s)'],
+                       [[round(entry['seconds'] * 1e3, 3), entry['kind'], entry['owner'],
+                         entry['dataset'] or '', entry['detail'],
+                         round(entry['time'], 3)]
+                        for entry in snapshot['slowest']])
+        if not self.profiler.enabled:
+            self.status.setText('Disabled')
+        elif self.profiler.tracing:
+            text = '{} trace events'.format(snapshot['events'])
+            if snapshot['droppedEvents'] > 0:
+                text += ' ({} dropped)'.format(snapshot['droppedEvents'])
+            self.status.setText(text)
+        else:
+            self.status.setText('Enabled')
+
+
+# 
+# profilerwidget.py ends here
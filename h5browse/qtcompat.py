@@ -0,0 +1,78 @@
+# qtcompat.py --- 
+# 
+# Filename: qtcompat.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:38:14 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:38:14 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# The Qt modules as pyqtgraph presents them, without importing
+# pyqtgraph.
+# 
+# The code was written against `from pyqtgraph import QtCore,
+# QtGui`, where QtGui also holds the classes Qt5 moved to
+# QtWidgets. But importing anything from pyqtgraph imports all of it,
+# which takes longer than the rest of the startup put together. The
+# modules needed to show the main window, the file tree, tables and
+# attributes import QtCore and QtGui from here instead, so that
+# pyqtgraph is loaded only when a plot or image is first shown.
+# 
+# The classes are the same objects as pyqtgraph's, so both can be
+# mixed freely.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""QtCore and QtGui (with QtWidgets merged in) without pyqtgraph"""
+
+import types
+
+try:
+    from PyQt5 import QtCore
+    from PyQt5 import QtGui as _QtGui
+    from PyQt5 import QtWidgets
+except ImportError:
+    # Other bindings: leave it to pyqtgraph
+    from pyqtgraph import (QtCore, QtGui)
+else:
+    QtGui = types.ModuleType('QtGui')
+    for module in (_QtGui, QtWidgets):
+        for name in dir(module):
+            if name.startswith('Q'):
+                setattr(QtGui, name, getattr(module, name))
+
+
+# 
+# qtcompat.py ends here
@@ -0,0 +1,576 @@
+# repack.py --- 
+# 
+# Filename: repack.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:51:30 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:51:30 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Rewrite datasets of an existing file with another chunk shape and
+# compression (see planner.py for choosing them).
+# 
+# `copyDataset` copies a dataset block by block. The blocks are whole
+# chunks of the new layout (see blockcache.computeBlockShape), so the
+# memory used is bounded by `blockBytes` and no chunk of the copy is
+# written twice. Attributes are copied with their types.
+# 
+# `repackDataset` does it in place: the copy is made under a
+# temporary name next to the dataset and then swapped in by renaming
+# links. The old data stays under the original name until the copy is
+# complete, and a crash in between leaves either the original or a
+# backup (`backupPrefix`) of it. Object references to the dataset and
+# its dimension scales are moved to the copy. Datasets with several
+# hard links are refused. The space of the old data is not returned
+# to the file system.
+# 
+# `repackFile` (and the command line) repacks several datasets of a
+# file in parallel: each worker process reads the file, opened
+# read-only, and writes its copy to a temporary file. The whole file
+# is then rewritten into a new file (`copyFile`), with H5Ocopy for
+# the datasets, which moves the compressed chunks as they are, taking
+# the copies in place of the repacked ones. Hard links, object
+# references and dimension scales are rebuilt for the new file, and
+# it replaces the old one with a rename.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Re-chunk and re-compress datasets of existing files"""
+
+import os
+import sys
+import argparse
+import shutil
+import tempfile
+import multiprocessing
+from itertools import product
+from concurrent.futures import (ProcessPoolExecutor, as_completed)
+import numpy as np
+import h5py as h5
+
+import blockcache
+import planner
+
+
+# Prefixes of the links of the copy and of the original while swapping
+tempPrefix = '.repack-'
+backupPrefix = '.repack-old-'
+
+# Chunk cache of the source when opened here, so that source chunks
+# cut by the blocks of the copy are decompressed once
+sourceCacheBytes = 64 * 1024 * 1024
+
+
+def describeDataset(dset):
+    """The layout of `dset` in the form of a plan (see planner.py)"""
+    return {'chunks': dset.chunks, 'compression': dset.compression,
+            'compression_opts': dset.compression_opts, 'shuffle': dset.shuffle}
+
+
+def planningShape(dset):
+    """Shape of `dset` with growable dimensions as 0 (unknown), as
+    planner.py takes them"""
+    maxshape = dset.maxshape or dset.shape
+    return tuple(0 if limit is None else size
+                 for size, limit in zip(dset.shape, maxshape))
+
+
+def sample(dset, nbytes=planner.sampleBytes):
+    """The first rows of `dset`, about `nbytes`"""
+    rowBytes = dset.dtype.itemsize * int(np.prod(dset.shape[1:]))
+    return dset[:max(1, nbytes // max(rowBytes, 1))]
+
+
+def chooseLayout(dset, access='rows', axis=0, measure=True):
+    """Plan for `dset` read as `access`, measured on a sample of it if
+    `measure` is True (planner.plan), else planner.suggest"""
+    if dset.shape == () or dset.size == 0:
+        raise ValueError('{}: nothing to repack'.format(dset.name))
+    if measure:
+        layout, _ = planner.plan(planningShape(dset), dset.dtype, access, axis,
+                                 sample(dset))
+        return layout
+    return planner.suggest(planningShape(dset), dset.dtype, access, axis)
+
+
+def blocks(shape, chunks, itemsize, blockBytes):
+    """Selections cutting `shape` into blocks of whole `chunks` of
+    about `blockBytes`"""
+    blockShape = blockcache.computeBlockShape(shape, chunks, itemsize, blockBytes)
+    starts = [range(0, size, step) for size, step in zip(shape, blockShape)]
+    return [tuple(slice(start, min(start + step, size))
+                  for start, step, size in zip(corner, blockShape, shape))
+            for corner in product(*starts)]
+
+
+# Attributes of the dimension scales API. They hold references to
+# other objects, so they are not copied but rebuilt with h5ds.
+scaleAttributes = ('DIMENSION_LIST', 'REFERENCE_LIST')
+
+
+def objectAddress(obj):
+    return h5.h5o.get_info(obj.id).addr
+
+
+def copyAttributes(src, dst):
+    for name in src.attrs:
+        if name in scaleAttributes:
+            continue
+        # The HDF5 type, not its NumPy equivalent: that loses the
+        # string padding, which h5ds checks
+        dst.attrs.create(name, src.attrs[name],
+                         dtype=h5.Datatype(src.attrs.get_id(name).get_type()))
+
+
+def copyDataset(src, group, name, layout, blockBytes=32*1024*1024,
+                progress=None, cancelled=None):
+    """Copy dataset `src` to dataset `name` in `group` with `layout`
+    (a plan, see planner.py), with its attributes, except those of
+    the dimension scales. Returns the copy.
+
+    progress: callable taking (bytes copied, total bytes).
+
+    cancelled: callable returning True if the copy should be
+    abandoned, in which case the copy is deleted and None returned.
+
+    """
+    if src.shape == () or src.size == 0:
+        raise ValueError('{}: nothing to repack'.format(src.name))
+    dst = group.create_dataset(name, shape=src.shape, maxshape=src.maxshape,
+                               dtype=src.dtype, fillvalue=src.fillvalue,
+                               **layout)
+    try:
+        total = src.size * src.dtype.itemsize
+        done = 0
+        for selection in blocks(src.shape, dst.chunks, src.dtype.itemsize, blockBytes):
+            if cancelled is not None and cancelled():
+                del group[name]
+                return None
+            data = src[selection]
+            dst[selection] = data
+            done += data.nbytes
+            if progress is not None:
+                progress(done, total)
+        copyAttributes(src, dst)
+    except Exception:
+        del group[name]
+        raise
+    return dst
+
+
+def dimensionScales(dset):
+    """Lists of the dimension scales attached to each dimension of
+    `dset`"""
+    if 'DIMENSION_LIST' not in dset.attrs:
+        return [[] for size in dset.shape]
+    return [dim.values() for dim in dset.dims]
+
+
+def scaledDimensions(scale):
+    """(dataset, dimension) pairs to which dataset `scale` is attached
+    as dimension scale"""
+    if 'REFERENCE_LIST' not in scale.attrs:
+        return []
+    return [(scale.file[ref], int(dim)) for ref, dim in scale.attrs['REFERENCE_LIST']]
+
+
+def isReferenceType(dtype):
+    """True for object references and arrays of them. References
+    inside compound or variable length types are not handled."""
+    return h5.check_dtype(ref=dtype) is h5.Reference
+
+
+def remapReferences(values, resolve):
+    """Return the object references `values` passed through `resolve`,
+    and whether any of them changed"""
+    values = np.asarray(values, dtype=object)
+    result = np.empty(values.shape, dtype=h5.ref_dtype)
+    changed = False
+    for ii, ref in enumerate(values.flat):
+        new = resolve(ref) if ref else None
+        changed = changed or new is not ref
+        result.flat[ii] = new
+    return result, changed
+
+
+def rewriteReferences(src, dst, resolve):
+    """Write the object references in the attributes of `src`, and in
+    its data if it is a dataset, to `dst` passed through `resolve`
+    (callable taking and returning a reference). Unchanged values are
+    not written."""
+    for name in src.attrs:
+        dtype = src.attrs.get_id(name).dtype
+        if isReferenceType(dtype):
+            values, changed = remapReferences(src.attrs[name], resolve)
+            if changed:
+                dst.attrs.create(name, values, dtype=h5.ref_dtype)
+    if isinstance(src, h5.Dataset) and isReferenceType(src.dtype) \
+       and src.shape is not None and src.size > 0:
+        values, changed = remapReferences(src[()], resolve)
+        if changed:
+            dst[()] = values
+
+
+def hasReferences(obj):
+    """True if `obj` holds object references outside the dimension
+    scale attributes"""
+    if isinstance(obj, h5.Dataset) and isReferenceType(obj.dtype):
+        return True
+    return any(isReferenceType(obj.attrs.get_id(name).dtype) for name in obj.attrs)
+
+
+def replaceReferences(fd, old, new):
+    """Make the object references to dataset `old` anywhere in file
+    `fd` refer to dataset `new`"""
+    oldAddress = objectAddress(old)
+
+    def resolve(ref):
+        try:
+            if objectAddress(fd[ref]) == oldAddress:
+                return new.ref
+        except (KeyError, ValueError):
+            pass    # dangling reference
+        return ref
+
+    def visit(name, obj):
+        if hasReferences(obj):
+            rewriteReferences(obj, obj, resolve)
+    visit('/', fd)
+    fd.visititems(visit)
+
+
+def swap(group, name, tempName):
+    """Replace dataset `name` in `group` by `tempName`, keeping the
+    original under a backup name until the new one is in place.
+
+    Object references to the original and its dimension scales, in
+    both directions, are moved to the new one.
+
+    """
+    old = group[name]
+    new = group[tempName]
+    oldAddress = objectAddress(old)
+    replaceReferences(group.file, old, new)
+    scales = dimensionScales(old)
+    for dim, attached in zip(old.dims, scales):
+        for scale in attached:
+            dim.detach_scale(scale)
+    # The other scales of these dimensions are detached too, to
+    # reattach them in the same order
+    users = []
+    for dset, dim in scaledDimensions(old):
+        attached = dset.dims[dim].values()
+        for scale in attached:
+            dset.dims[dim].detach_scale(scale)
+        users.append((dset, dim, attached))
+    backupName = backupPrefix + name
+    group.move(name, backupName)
+    group.move(tempName, name)
+    del group[backupName]
+    new = group[name]
+    for dim, attached in zip(new.dims, scales):
+        for scale in attached:
+            dim.attach_scale(scale)
+    for dset, dim, attached in users:
+        for scale in attached:
+            dset.dims[dim].attach_scale(new if objectAddress(scale) == oldAddress
+                                        else scale)
+    return new
+
+
+def repackDataset(dset, layout, blockBytes=32*1024*1024, progress=None, cancelled=None):
+    """Rewrite `dset` in place with `layout`. Its file must be open for
+    writing. Returns the new dataset, or None if cancelled (see
+    copyDataset).
+
+    A dataset with several hard links is refused: the others would
+    keep the old data. The space of the old data stays in the file.
+
+    """
+    links = h5.h5o.get_info(dset.id).rc
+    if links > 1:
+        raise ValueError('{} has {} hard links, the others would keep the old data.'
+                         ' Use h5repackds on the file.'.format(dset.name, links))
+    group = dset.parent
+    name = dset.name.rpartition('/')[-1]
+    tempName = tempPrefix + name
+    if tempName in group:
+        del group[tempName]     # left by an earlier failure
+    copy = copyDataset(dset, group, tempName, layout, blockBytes, progress, cancelled)
+    if copy is None:
+        return None
+    return swap(group, name, tempName)
+
+
+def repackToFile(path, name, options, tempPath, blockBytes=32*1024*1024):
+    """Copy dataset `name` of file `path` to dataset 'data' in a new
+    file `tempPath`. Runs in the worker processes of `repackFile`.
+
+    options: dict with either the plan to use as 'layout' or the
+    'access' and 'axis' to plan for (see chooseLayout).
+
+    Returns the plan used and the storage size before and after.
+
+    """
+    with h5.File(path, 'r', rdcc_nbytes=sourceCacheBytes) as fd:
+        src = fd[name]
+        layout = options.get('layout')
+        if layout is None:
+            layout = chooseLayout(src, options.get('access', 'rows'),
+                                  options.get('axis', 0))
+        with h5.File(tempPath, 'w') as out:
+            dst = copyDataset(src, out, 'data', layout, blockBytes)
+            return layout, src.id.get_storage_size(), dst.id.get_storage_size()
+
+
+def tracksOrder(group):
+    return group.id.get_create_plist().get_link_creation_order() != 0
+
+
+def copyLinks(src, dst, replacements, paths, copies):
+    """Copy the links of group `src` into group `dst` of another file,
+    recursively. Datasets and named datatypes are copied with H5Ocopy,
+    groups are created with their attributes.
+
+    replacements: dict of the address of datasets in the source to
+    the dataset to copy instead.
+
+    paths: dict of the address of the objects copied so far to their
+    path in the new file. Further hard links to them are linked to the
+    copy.
+
+    copies: list of (source path, copy path) to which the objects
+    copied are appended.
+
+    """
+    for name in src:
+        link = src.get(name, getlink=True)
+        if isinstance(link, (h5.SoftLink, h5.ExternalLink)):
+            dst[name] = link
+            continue
+        obj = src[name]
+        address = objectAddress(obj)
+        if address in paths:
+            dst[name] = dst.file[paths[address]]
+            continue
+        if isinstance(obj, h5.Group):
+            copy = dst.create_group(name, track_order=tracksOrder(obj))
+            copyAttributes(obj, copy)
+            paths[address] = copy.name
+            copies.append((obj.name, copy.name))
+            copyLinks(obj, copy, replacements, paths, copies)
+        else:
+            # The compressed chunks are copied as they are
+            dst.copy(replacements.get(address, obj), name)
+            paths[address] = dst[name].name
+            copies.append((obj.name, paths[address]))
+
+
+def copyFile(src, dst, replacements={}):
+    """Copy all the objects of open file `src` into the new file `dst`,
+    with the datasets in `replacements` (dict of path in `src` to the
+    dataset to copy instead). Hard links, object references and
+    dimension scales are kept."""
+    replacements = {objectAddress(src[name]): dset for name, dset in replacements.items()}
+    paths = {objectAddress(src): '/'}
+    copies = [('/', '/')]
+    copyAttributes(src, dst)
+    copyLinks(src, dst, replacements, paths, copies)
+
+    def resolve(ref):
+        try:
+            return dst[paths[objectAddress(src[ref])]].ref
+        except (KeyError, ValueError):
+            return None     # dangling reference
+
+    scaled = []
+    for srcName, dstName in copies:
+        obj = src[srcName]
+        if hasReferences(obj):
+            rewriteReferences(obj, dst[dstName], resolve)
+        if isinstance(obj, h5.Dataset):
+            # H5Ocopy leaves them referring to nothing
+            copy = dst[dstName]
+            for name in scaleAttributes:
+                if name in copy.attrs:
+                    del copy.attrs[name]
+            if 'DIMENSION_LIST' in obj.attrs:
+                scaled.append((obj, copy))
+    for obj, copy in scaled:
+        for dim, attached in zip(copy.dims, dimensionScales(obj)):
+            for scale in attached:
+                dim.attach_scale(dst[paths[objectAddress(scale)]])
+
+
+def datasetNames(fd, names=None):
+    """Paths of datasets `names` of open file `fd`, or of all its
+    chunkable datasets (not scalar, not empty) if None"""
+    if names is not None:
+        return list(names)
+    found = []
+
+    def visit(name, obj):
+        if isinstance(obj, h5.Dataset) and obj.shape != () and obj.size > 0:
+            found.append('/' + name)
+    fd.visititems(visit)
+    return found
+
+
+def repackFile(path, names=None, options={}, jobs=None, blockBytes=32*1024*1024,
+               report=None):
+    """Repack datasets `names` (all if None) of the file at `path`,
+    which must not be open elsewhere, on `jobs` worker processes.
+
+    The file is rewritten as a whole to a temporary file that then
+    replaces it, so the space of the old data is returned and the
+    file is either the old or the new one if interrupted.
+
+    options: as for repackToFile.
+
+    report: callable taking (name, plan, bytes before, bytes after)
+    for each dataset done, or (name, None, message, None) on failure.
+
+    Returns the number of datasets that failed.
+
+    """
+    with h5.File(path, 'r') as fd:
+        names = datasetNames(fd, names)
+        userblock = fd.userblock_size
+    tempdir = tempfile.mkdtemp(prefix='.repack-', dir=os.path.dirname(os.path.abspath(path)))
+    failures = 0
+    try:
+        # Do not fork a process with HDF5 state
+        with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('spawn')) \
+             as executor:
+            futures = {}
+            for ii, name in enumerate(names):
+                tempPath = os.path.join(tempdir, '{}.h5'.format(ii))
+                future = executor.submit(repackToFile, path, name, options, tempPath,
+                                         blockBytes)
+                futures[future] = (name, tempPath)
+            results = []
+            for future in as_completed(futures):
+                name, tempPath = futures[future]
+                try:
+                    results.append((name, tempPath) + future.result())
+                except (IOError, OSError, ValueError, KeyError) as e:
+                    failures += 1
+                    if report is not None:
+                        report(name, None, str(e), None)
+                    else:
+                        print(e)
+        newPath = os.path.join(tempdir, 'file.h5')
+        copied = [h5.File(tempPath, 'r') for name, tempPath, *rest in results]
+        try:
+            with h5.File(path, 'r') as fd, \
+                 h5.File(newPath, 'w', userblock_size=userblock) as out:
+                copyFile(fd, out, {result[0]: copy['data']
+                                   for result, copy in zip(results, copied)})
+        finally:
+            for copy in copied:
+                copy.close()
+        if userblock > 0:
+            with open(path, 'rb') as fd, open(newPath, 'r+b') as out:
+                out.write(fd.read(userblock))
+        shutil.copymode(path, newPath)
+        os.replace(newPath, path)
+        if report is not None:
+            for name, tempPath, layout, before, after in results:
+                report(name, layout, before, after)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+    return failures
+
+
+def parseLayout(args):
+    """Plan from the explicit layout options of the command line, None
+    if chunks are not given"""
+    if args.chunks is None:
+        return None
+    compression = None if args.compression == 'none' else args.compression
+    return {'chunks': tuple(int(size) for size in args.chunks.split(',')),
+            'compression': compression,
+            'compression_opts': args.level if compression == 'gzip' else None,
+            'shuffle': args.shuffle}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Rewrite datasets of an HDF5 file with a new chunk shape and compression')
+    parser.add_argument('file', help='HDF5 file, modified in place')
+    parser.add_argument('datasets', nargs='*',
+                        help='paths of the datasets, all if none given')
+    parser.add_argument('-p', dest='access', choices=planner.accessPatterns, default='rows',
+                        help='plan the layout for this access on a sample of each dataset')
+    parser.add_argument('--axis', type=int, default=0,
+                        help='axis of the series for -p series')
+    parser.add_argument('-k', dest='chunks', default=None,
+                        help='chunk shape, comma separated (instead of planning)')
+    parser.add_argument('-c', dest='compression', default='gzip',
+                        choices=['none', 'gzip', 'lzf'],
+                        help='compression filter with -k')
+    parser.add_argument('-l', dest='level', type=int, default=4,
+                        help='gzip level with -k')
+    parser.add_argument('--shuffle', action='store_true',
+                        help='shuffle filter with -k')
+    parser.add_argument('-j', dest='jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    args = parser.parse_args(argv)
+    layout = parseLayout(args)
+    options = {'access': args.access, 'axis': args.axis} if layout is None \
+        else {'layout': layout}
+
+    def report(name, layout, before, after):
+        if layout is None:
+            print('{}: failed: {}'.format(name, before))
+        else:
+            print('{}: {}, {:.1f} MB -> {:.1f} MB'.format(
+                name, planner.describe(layout), before / 1e6, after / 1e6))
+
+    try:
+        failures = repackFile(args.file, args.datasets or None, options, args.jobs,
+                              report=report)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        print(e)
+        return 1
+    return 1 if failures > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# repack.py ends here
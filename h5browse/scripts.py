@@ -0,0 +1,116 @@
+# scripts.py --- 
+# 
+# Filename: scripts.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 17:55:48 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 17:55:48 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Entry points of the installed scripts.
+# 
+# The modules import each other by their own names, as they are run
+# from the package directory. Importing this module makes those names
+# resolve to the modules of the package directory, ahead of anything
+# installed under the same name (there are generic ones like
+# `profiler` and `planner`). This is done with a finder on
+# sys.meta_path rather than by putting the directory on sys.path, so
+# that the h5browse package still wins over h5browse.py. Spawned
+# worker processes import the script, and hence this module, again
+# before unpickling their tasks, so they get the same finder.
+# 
+# Plain `import h5browse` leaves the import system alone.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Entry points of the installed scripts"""
+
+import os
+import sys
+import importlib
+import importlib.machinery
+
+packageDir = os.path.dirname(os.path.abspath(__file__))
+
+
+class SiblingFinder(object):
+    """Import finder resolving top level module names to the modules
+    in the package directory"""
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        if '.' in name or name == 'h5browse':
+            return None
+        return importlib.machinery.PathFinder.find_spec(name, [packageDir])
+
+
+if SiblingFinder not in sys.meta_path:
+    sys.meta_path.insert(0, SiblingFinder)
+
+
+def runMain(name):
+    """Run the `main` function of module `name` of the package"""
+    return importlib.import_module(name).main()
+
+
+def browse():
+    return runMain('h5browse.h5browse')
+
+
+def spikerate():
+    return runMain('spikerate')
+
+
+def crosscorr():
+    return runMain('crosscorr')
+
+
+def synstat():
+    return runMain('synstat')
+
+
+def importData():
+    return runMain('importer')
+
+
+def repack():
+    return runMain('repack')
+
+
+def export():
+    return runMain('exporter')
+
+
+# 
+# scripts.py ends here
@@ -0,0 +1,830 @@
+# searchindex.py --- 
+# 
+# Filename: searchindex.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 17:23:49 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 17:23:49 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Search index of the objects in an HDF5 file: their paths, types,
+# shapes, dtypes and attribute names and values, so that finding a
+# node does not mean expanding the tree by hand.
+# 
+# `buildIndex` walks the file once with low level link iteration, in
+# name order like the tree, so the index also records the row of each
+# object under its parent and a match can be shown in the tree by
+# loading just the groups on its path (see HDFTreeModel.findNode).
+# 
+# The texts are not kept as a million Python strings. Each column is
+# one bytes object with one entry per line (TextColumn), searched with
+# bytes.find and regular expressions in a single pass, and the
+# positions found are mapped to entries with searchsorted. Texts that
+# repeat a lot (dtypes, shapes, attribute names and values) are stored
+# once and referred to by integer codes, so that predicates on them
+# are numpy comparisons over the code arrays. A query is a list of
+# terms (see `parseQuery`), each turned into a mask over the objects.
+# 
+# Indexes that took longer than `persistSeconds` to build are stored
+# in the sidecar cache, keyed on the path, size and modification time
+# of the file, and loaded from there the next time the file is
+# opened. The index is a snapshot: nodes created in the browser are
+# not in it until the file is opened again.
+# 
+# FileIndexer builds the indexes of the files open in the tree in the
+# background. As with statistics (see statswidget.executorFor), files
+# open read-only are indexed by a worker process that opens the file
+# itself, so that walking a big file does not hold up the GUI thread
+# on h5py's lock, others on a thread of this process. Walking a file
+# with a million objects takes a minute or two, so each file gets a
+# process of its own (IndexProcess) that is stopped when the file is
+# closed or the browser quits, rather than a task of a process pool,
+# which would have to run to completion.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Search index of paths, types and attributes of HDF5 files"""
+
+import os
+import re
+import time
+import shlex
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import h5py as h5
+from qtcompat import QtCore
+
+import sidecar
+
+
+# Types of objects, in the order of the codes in the index
+kinds = ['group', 'dataset', 'datatype', 'link']
+
+# Bump when the arrays change, to ignore indexes stored before
+indexVersion = 1
+
+# Store indexes that took longer than this to build
+persistSeconds = 1.0
+
+# Attributes with more items than this are indexed by shape only
+attrItems = 64
+
+# Longest attribute value text kept
+valueChars = 256
+
+# Operators of attribute predicates, longest first for the parser
+operators = ['!=', '<=', '>=', '=', '~', '<', '>']
+
+_attrTerm = re.compile(r'@([^=!<>~]+)(?:({})(.*))?$'.format(
+    '|'.join(re.escape(op) for op in operators)))
+
+_threadPool = None
+
+
+def toBlob(texts):
+    """Bytes of `texts`, one per line, with a newline before the first
+    and after the last, as a uint8 array"""
+    texts = list(texts)
+    if len(texts) == 0:
+        return np.frombuffer(b'\n', dtype=np.uint8)
+    lines = (text.encode('utf-8', 'replace').replace(b'\n', b' ') for text in texts)
+    return np.frombuffer(b'\n' + b'\n'.join(lines) + b'\n', dtype=np.uint8)
+
+
+def globPattern(pattern):
+    """Regular expression (bytes) matching whole lines against glob
+    `pattern`: * and ? do not match across lines"""
+    out = []
+    ii = 0
+    while ii < len(pattern):
+        char = pattern[ii:ii+1]
+        if char == b'*':
+            out.append(b'[^\n]*')
+        elif char == b'?':
+            out.append(b'[^\n]')
+        elif char == b'[' and pattern.find(b']', ii + 2) > 0:
+            end = pattern.find(b']', ii + 2)
+            body = pattern[ii+1:end]
+            if body.startswith(b'!'):
+                body = b'^' + body[1:]
+            out.append(b'[' + body.replace(b'\\', b'\\\\') + b']')
+            ii = end
+        else:
+            out.append(re.escape(char))
+        ii += 1
+    return re.compile(b'^' + b''.join(out) + b'$', re.MULTILINE)
+
+
+def isGlob(text):
+    return any(char in text for char in '*?[')
+
+
+class TextColumn(object):
+    """Texts stored one per line in a single bytes object.
+
+    Lookups are case-insensitive and return the sorted indices of the
+    matching entries.
+
+    """
+    def __init__(self, blob):
+        if isinstance(blob, np.ndarray):
+            blob = blob.tobytes()
+        self.blob = blob
+        newlines = np.flatnonzero(np.frombuffer(blob, dtype=np.uint8) == 10)
+        self.textStarts = newlines[:-1] + 1
+        # Lower case may differ in length beyond ASCII: positions in
+        # the lower case text have their own line starts
+        self.lower = blob.decode('utf-8', 'replace').lower().encode('utf-8')
+        newlines = np.flatnonzero(np.frombuffer(self.lower, dtype=np.uint8) == 10)
+        self.starts = newlines[:-1] + 1
+        self.ends = newlines[1:]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def text(self, index):
+        start = self.textStarts[index]
+        return self.blob[start:self.blob.find(b'\n', start)].decode('utf-8', 'replace')
+
+    def entries(self, positions):
+        """Indices of the entries containing byte `positions`"""
+        positions = np.asarray(positions, dtype=np.int64)
+        # Drop the empty lines before the first and after the last
+        # newline, which an empty glob match may find
+        positions = positions[(positions > 0) & (positions < len(self.lower))]
+        return np.searchsorted(self.starts, positions, side='right') - 1
+
+    def contains(self, needle):
+        # The match runs to the end of the line, so that each entry
+        # is found once
+        pattern = re.compile(re.escape(needle) + b'[^\n]*')
+        return self.entries([match.start() for match in pattern.finditer(self.lower)])
+
+    def startswith(self, needle):
+        """Entries starting with `needle`, or equal to it if `needle`
+        ends with a newline"""
+        pattern = re.compile(b'\n' + re.escape(needle))
+        return self.entries([match.start() + 1 for match in pattern.finditer(self.lower)])
+
+    def glob(self, needle):
+        """Entries matching glob `needle` (bytes). The entries starting
+        with the literal text before the first wildcard, or containing
+        the longest literal part, are found first, and only those
+        matched against the pattern if they are few."""
+        if needle.endswith(b'*') and not isGlob(needle[:-1].decode('utf-8', 'replace')):
+            return self.startswith(needle[:-1])
+        regex = globPattern(needle)
+        literals = re.split(rb'[*?]', re.sub(rb'\[[^\]]*\]', b'?', needle))
+        if len(literals[0]) > 0:
+            candidates = self.startswith(literals[0])
+        elif len(max(literals, key=len)) > 0:
+            candidates = self.contains(max(literals, key=len))
+        else:
+            candidates = None
+        if candidates is None or len(candidates) > len(self) // 8:
+            return self.entries([match.start() for match in regex.finditer(self.lower)])
+        text = self.lower
+        ends = self.ends
+        return np.array([ii for ii in candidates
+                         if regex.match(text, self.starts[ii], ends[ii] + 1)],
+                        dtype=np.int64)
+
+    def lookup(self, pattern, how='contains'):
+        """Entries matching `pattern` (str): `how` is 'contains',
+        'exact' or 'glob'"""
+        needle = pattern.lower().encode('utf-8')
+        if how == 'glob':
+            return self.glob(needle)
+        if how == 'exact':
+            return self.startswith(needle + b'\n')
+        if len(needle) == 0:
+            return np.arange(len(self), dtype=np.int64)
+        return self.contains(needle)
+
+
+class Coder(object):
+    """Integer codes of texts, in the order first seen"""
+    def __init__(self):
+        self.codes = {}
+
+    def __call__(self, text):
+        return self.codes.setdefault(text, len(self.codes))
+
+    def blob(self):
+        return toBlob(self.codes)
+
+
+def shapeText(shape):
+    if shape is None:           # null dataspace, see h5py.Empty
+        return 'empty'
+    if len(shape) == 0:
+        return 'scalar'
+    return 'x'.join(str(size) for size in shape)
+
+
+def dtypeText(dtype):
+    if dtype.names is not None:
+        return str(dtype)
+    if h5.check_string_dtype(dtype) is not None and dtype.kind == 'O':
+        return 'str'          # variable length
+    if dtype.kind in 'SUV':
+        return dtype.str[1:]
+    return dtype.name
+
+
+def typeText(tid):
+    """dtypeText of HDF5 type `tid`, without converting the common
+    numeric types to numpy"""
+    cls = tid.get_class()
+    if cls == h5.h5t.INTEGER:
+        sign = '' if tid.get_sign() != h5.h5t.SGN_NONE else 'u'
+        return '{}int{}'.format(sign, 8 * tid.get_size())
+    if cls == h5.h5t.FLOAT:
+        return 'float{}'.format(8 * tid.get_size())
+    return dtypeText(tid.dtype)
+
+
+def valueText(value):
+    """Text and number (NaN if not a number) for attribute `value`"""
+    array = np.asarray(value)
+    items = [item.decode('utf-8', 'replace') if isinstance(item, bytes) else item
+             for item in array.reshape(-1).tolist()]
+    number = np.nan
+    if len(items) == 1:
+        text = str(items[0])
+        if array.dtype.kind in 'biuf':
+            number = float(items[0])
+    else:
+        text = ' '.join(str(item) for item in items)
+    return text[:valueChars], number
+
+
+def buildIndex(fd, progress=None, cancelled=None):
+    """Walk open file `fd` and return the arrays of its search index
+    (see SearchIndex).
+
+    progress: callable taking the number of objects indexed so far.
+
+    cancelled: callable returning True if the walk should be
+    abandoned, in which case None is returned.
+
+    """
+    paths, names, parents, rows, kindCodes = ['/'], [''], [-1], [-1], [0]
+    dtypes, shapes = [-1], [-1]
+    dtypeCoder, shapeCoder = Coder(), Coder()
+    attrOwners, attrNames, attrValues, attrNumbers = [], [], [], []
+    nameCoder, valueCoder = Coder(), Coder()
+
+    def addAttributes(owner, oid, cls):
+        if h5.h5a.get_num_attrs(oid) == 0:
+            return
+        attrs = cls(oid).attrs
+        for name in attrs:
+            try:
+                aid = attrs.get_id(name)
+                size = 0 if aid.shape is None else int(np.prod(aid.shape))
+                if size > attrItems:
+                    text, number = '{} {}'.format(shapeText(aid.shape),
+                                                  dtypeText(aid.dtype)), np.nan
+                else:
+                    text, number = valueText(attrs[name])
+            except (OSError, IOError, TypeError, ValueError):
+                # e.g. types h5py cannot read
+                text, number = '', np.nan
+            attrOwners.append(owner)
+            attrNames.append(nameCoder(name))
+            attrValues.append(valueCoder(text))
+            attrNumbers.append(number)
+
+    addAttributes(0, fd.id, h5.Group)
+    # Groups to list: (path, index of the group), walked depth first
+    # so that entries come in the order of the tree
+    visited = {h5.h5o.get_info(fd.id).addr}
+    stack = [('/', 0)]
+    while len(stack) > 0:
+        if cancelled is not None and cancelled():
+            return None
+        prefix, parent = stack.pop()
+        gid = fd.id if prefix == '/' else h5.h5o.open(fd.id, prefix.encode('utf-8'))
+        linkNames = []
+        gid.links.iterate(linkNames.append, idx_type=h5.h5.INDEX_NAME,
+                          order=h5.h5.ITER_INC)
+        groups = []
+        for row, link in enumerate(linkNames):
+            name = link.decode('utf-8', 'replace')
+            path = prefix + name if prefix == '/' else prefix + '/' + name
+            index = len(paths)
+            paths.append(path)
+            names.append(name)
+            parents.append(parent)
+            rows.append(row)
+            dtype = shape = -1
+            oid = None
+            if gid.links.get_info(link).type == h5.h5l.TYPE_HARD:
+                oid = h5.h5o.open(gid, link)
+                typ = h5.h5i.get_type(oid)
+            if oid is None:
+                kind = 3
+            elif typ == h5.h5i.GROUP:
+                kind = 0
+                cls = h5.Group
+                addr = h5.h5o.get_info(oid).addr
+                if addr not in visited:     # hard links may make cycles
+                    visited.add(addr)
+                    groups.append((path, index))
+            elif typ == h5.h5i.DATASET:
+                kind = 1
+                cls = h5.Dataset
+                shape = shapeCoder(shapeText(oid.get_space().get_simple_extent_dims()))
+                dtype = dtypeCoder(typeText(oid.get_type()))
+            else:
+                kind = 2
+                cls = h5.Datatype
+                dtype = dtypeCoder(typeText(oid))
+            kindCodes.append(kind)
+            dtypes.append(dtype)
+            shapes.append(shape)
+            if oid is not None:
+                addAttributes(index, oid, cls)
+            if index % 10000 == 0:
+                if cancelled is not None and cancelled():
+                    return None
+                if progress is not None:
+                    progress(index)
+        stack.extend(reversed(groups))
+    return {'paths': toBlob(paths), 'names': toBlob(names),
+            'parents': np.array(parents, dtype=np.int64),
+            'rows': np.array(rows, dtype=np.int64),
+            'kinds': np.array(kindCodes, dtype=np.int8),
+            'dtypes': np.array(dtypes, dtype=np.int32), 'dtypeTexts': dtypeCoder.blob(),
+            'shapes': np.array(shapes, dtype=np.int32), 'shapeTexts': shapeCoder.blob(),
+            'attrOwners': np.array(attrOwners, dtype=np.int64),
+            'attrNames': np.array(attrNames, dtype=np.int32),
+            'attrNameTexts': nameCoder.blob(),
+            'attrValues': np.array(attrValues, dtype=np.int32),
+            'attrValueTexts': valueCoder.blob(),
+            'attrNumbers': np.array(attrNumbers, dtype=np.float64)}
+
+
+def parseQuery(query):
+    """Split `query` into terms, all of which must match. Terms are
+    separated by spaces, quotes keep spaces in a term:
+
+    text: the name contains text (case-insensitive), or the path if
+    text has a /.
+
+    glob (with *, ? or [...]): the name matches it. With a /, the
+    path matches it, or ends with a match if it does not start with
+    /. E.g. `spike*` for names starting with spike (prefix),
+    `/data/*/rate`, `cells/*/vm` or `*.npy`.
+
+    @name: has attribute `name` (may be a glob).
+
+    @name=value, @name!=value: attribute `name` is (not) `value`, as
+    text (may be a glob) or number.
+
+    @name~text: the value of attribute `name` contains text.
+
+    @name<number, also <=, >, >=: numeric comparison.
+
+    type:kind: group, dataset, datatype or link (a prefix will do).
+
+    dtype:text, shape:text: the dtype (e.g. float32, S16) or shape
+    (e.g. 1000x64, scalar) contains text, or matches it if a glob.
+
+    Returns a list of (field, operator, value) with field one of
+    'path', 'name', 'attr', 'type', 'dtype', 'shape'. For
+    attributes, value is (name, operand).
+
+    """
+    try:
+        words = shlex.split(query)
+    except ValueError as e:
+        raise ValueError('bad query: {}'.format(e))
+    terms = []
+    for word in words:
+        if word.startswith('@'):
+            match = _attrTerm.match(word)
+            if match is None:
+                raise ValueError('bad attribute term: {}'.format(word))
+            name, op, operand = match.groups()
+            if op in ('<', '<=', '>', '>='):
+                try:
+                    operand = float(operand)
+                except ValueError:
+                    raise ValueError('not a number in {}'.format(word))
+            terms.append(('attr', op, (name, operand)))
+            continue
+        field, sep, value = word.partition(':')
+        if sep and field in ('type', 'dtype', 'shape'):
+            terms.append((field, 'glob' if isGlob(value) else 'contains', value))
+        elif isGlob(word) and '/' in word:
+            if not word.startswith('/'):
+                word = '*/' + word
+            terms.append(('path', 'glob', word))
+        elif isGlob(word):
+            terms.append(('name', 'glob', word))
+        else:
+            terms.append(('path' if '/' in word else 'name', 'contains', word))
+    return terms
+
+
+class SearchIndex(object):
+    """Index of the objects of a file, built by `buildIndex`.
+
+    Object 0 is the root group. For each object the arrays have its
+    path and name (as TextColumn), the index of its parent group
+    (`parents`), its row under it in name order (`rows`), its kind
+    (index into `kinds`) and the codes of its dtype and shape (-1 if
+    none). Attributes are listed in `attrOwners` (index of the object),
+    `attrNames`, `attrValues` (codes) and `attrNumbers` (the value if
+    it is a number, else NaN).
+
+    """
+    def __init__(self, arrays):
+        self.paths = TextColumn(arrays['paths'])
+        self.names = TextColumn(arrays['names'])
+        self.parents = np.asarray(arrays['parents'])
+        self.rows = np.asarray(arrays['rows'])
+        self.kinds = np.asarray(arrays['kinds'])
+        self.dtypes = np.asarray(arrays['dtypes'])
+        self.dtypeTexts = TextColumn(arrays['dtypeTexts'])
+        self.shapes = np.asarray(arrays['shapes'])
+        self.shapeTexts = TextColumn(arrays['shapeTexts'])
+        self.attrOwners = np.asarray(arrays['attrOwners'])
+        self.attrNames = np.asarray(arrays['attrNames'])
+        self.attrNameTexts = TextColumn(arrays['attrNameTexts'])
+        self.attrValues = np.asarray(arrays['attrValues'])
+        self.attrValueTexts = TextColumn(arrays['attrValueTexts'])
+        self.attrNumbers = np.asarray(arrays['attrNumbers'])
+        self.cached = False     # set if loaded from the sidecar cache
+        self.seconds = 0.0      # time to build or load
+
+    def __len__(self):
+        return len(self.parents)
+
+    def mask(self, indices):
+        ret = np.zeros(len(self), dtype=bool)
+        ret[indices] = True
+        return ret
+
+    def attrMask(self, op, name, operand):
+        how = 'glob' if isGlob(name) else 'exact'
+        selected = np.isin(self.attrNames, self.attrNameTexts.lookup(name, how))
+        if op is None:
+            return self.mask(self.attrOwners[selected])
+        if op in ('=', '!='):
+            how = 'glob' if isGlob(operand) else 'exact'
+            equal = np.isin(self.attrValues, self.attrValueTexts.lookup(operand, how))
+            try:
+                equal |= self.attrNumbers == float(operand)
+            except ValueError:
+                pass
+            selected &= equal if op == '=' else ~equal
+        elif op == '~':
+            selected &= np.isin(self.attrValues, self.attrValueTexts.lookup(operand))
+        else:
+            with np.errstate(invalid='ignore'):
+                if op == '<':
+                    selected &= self.attrNumbers < operand
+                elif op == '<=':
+                    selected &= self.attrNumbers <= operand
+                elif op == '>':
+                    selected &= self.attrNumbers > operand
+                else:
+                    selected &= self.attrNumbers >= operand
+        return self.mask(self.attrOwners[selected])
+
+    def termMask(self, term):
+        field, op, value = term
+        if field == 'attr':
+            return self.attrMask(op, *value)
+        if field == 'type':
+            codes = [code for code, kind in enumerate(kinds) if kind.startswith(value.lower())]
+            return np.isin(self.kinds, codes)
+        if field == 'dtype':
+            return np.isin(self.dtypes, self.dtypeTexts.lookup(value, op))
+        if field == 'shape':
+            return np.isin(self.shapes, self.shapeTexts.lookup(value, op))
+        column = self.paths if field == 'path' else self.names
+        return self.mask(column.lookup(value, op))
+
+    def search(self, query, limit=None):
+        """Indices of the objects matching `query` (see parseQuery), in
+        the order of the tree, up to `limit` of them"""
+        terms = query if isinstance(query, list) else parseQuery(query)
+        if len(terms) == 0:
+            return np.zeros(0, dtype=np.int64)
+        mask = self.termMask(terms[0])
+        for term in terms[1:]:
+            mask &= self.termMask(term)
+        found = np.flatnonzero(mask)
+        return found if limit is None else found[:limit]
+
+    def path(self, index):
+        return self.paths.text(index)
+
+    def kind(self, index):
+        return kinds[self.kinds[index]]
+
+    def describe(self, index):
+        """Short text for object `index`: kind, shape and dtype"""
+        parts = [self.kind(index)]
+        if self.shapes[index] >= 0:
+            parts.append(self.shapeTexts.text(self.shapes[index]))
+        if self.dtypes[index] >= 0:
+            parts.append(self.dtypeTexts.text(self.dtypes[index]))
+        return ' '.join(parts)
+
+    def rowPath(self, index):
+        """Rows of the nodes on the path to object `index`, from the
+        child of the root down"""
+        rows = []
+        while index > 0:
+            rows.append(int(self.rows[index]))
+            index = self.parents[index]
+        return rows[::-1]
+
+
+def loadArrays(fd, cache=None, progress=None, cancelled=None):
+    """Arrays of the index of open file `fd` from the sidecar `cache`
+    if they are there, else built (see buildIndex) and stored in it if
+    that took longer than `persistSeconds`. Returns the arrays and
+    whether they came from the cache, None if cancelled."""
+    if cache is None:
+        cache = sidecar.defaultCache()
+    arrays = cache.load(fd, 'searchindex', version=indexVersion)
+    if arrays is not None:
+        return arrays, True
+    start = time.perf_counter()
+    arrays = buildIndex(fd, progress, cancelled)
+    if arrays is None:
+        return None
+    if time.perf_counter() - start > persistSeconds:
+        cache.store(fd, 'searchindex', arrays, version=indexVersion)
+    return arrays, False
+
+
+def loadIndex(fd, cache=None, progress=None, cancelled=None):
+    """SearchIndex of open file `fd` (see loadArrays), None if
+    cancelled"""
+    start = time.perf_counter()
+    loaded = loadArrays(fd, cache, progress, cancelled)
+    if loaded is None:
+        return None
+    index = SearchIndex(loaded[0])
+    index.cached = loaded[1]
+    index.seconds = time.perf_counter() - start
+    return index
+
+
+def indexProcess(conn, path, cacheDirectory=None, cacheBytes=1024*1024*1024):
+    """Send the arrays of the index of the file at `path`, whether
+    they were cached and the seconds taken through `conn`, or the
+    error message. Runs in the worker process of IndexProcess."""
+    start = time.perf_counter()
+    try:
+        with h5.File(path, 'r') as fd:
+            arrays, cached = loadArrays(fd, sidecar.SidecarCache(cacheDirectory,
+                                                                 cacheBytes))
+        conn.send((arrays, cached, time.perf_counter() - start))
+    except (OSError, IOError, ValueError, KeyError) as e:
+        conn.send(str(e))
+    conn.close()
+
+
+class IndexProcess(object):
+    """Index a file open read-only in a worker process of its own,
+    which opens the file itself. Unlike a task of a process pool, it
+    can be stopped at any time."""
+    def __init__(self, path, cache):
+        self.path = path
+        self.cache = cache
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        # Do not fork a process with Qt and HDF5 state
+        context = multiprocessing.get_context('spawn')
+        self.conn, childConn = context.Pipe(duplex=False)
+        self.process = context.Process(target=indexProcess,
+                                       args=(childConn, self.path, self.cache.directory,
+                                             self.cache.maxBytes),
+                                       daemon=True)
+        self.process.start()
+        childConn.close()
+
+    def started(self):
+        return self.process is not None
+
+    def done(self):
+        return self.started() and (self.conn.poll() or not self.process.is_alive())
+
+    def result(self):
+        """The SearchIndex. Call once done."""
+        try:
+            message = self.conn.recv()
+        except EOFError:
+            raise OSError('indexing process exited with code {}'.format(
+                self.process.exitcode))
+        finally:
+            self.conn.close()
+            self.process.join()
+        if isinstance(message, str):
+            raise OSError(message)
+        arrays, cached, seconds = message
+        index = SearchIndex(arrays)
+        index.cached = cached
+        index.seconds = seconds
+        return index
+
+    def cancel(self):
+        if self.started() and self.process.is_alive():
+            self.process.terminate()
+
+
+class IndexThread(object):
+    """Index an open file on the thread shared by such jobs, for files
+    that a worker process cannot open (open for writing, in SWMR mode
+    or in memory)"""
+    def __init__(self, fd, cache):
+        self.fd = fd
+        self.cache = cache
+        self.future = None
+        self.cancelEvent = threading.Event()
+
+    def start(self):
+        global _threadPool
+        if _threadPool is None:
+            _threadPool = ThreadPoolExecutor(1)
+        self.future = _threadPool.submit(loadIndex, self.fd, self.cache, None,
+                                         self.cancelEvent.is_set)
+
+    def started(self):
+        return self.future is not None
+
+    def done(self):
+        return self.started() and self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def cancel(self):
+        self.cancelEvent.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+def indexJob(fd, cache=None):
+    """Job to index open file `fd`: in a worker process if the file is
+    open read-only (HDF5 file locking does not permit other processes
+    to open it otherwise), else on a thread"""
+    if cache is None:
+        cache = sidecar.defaultCache()
+    if fd.id.get_intent() == h5.h5f.ACC_RDONLY and fd.driver in ('sec2', 'stdio'):
+        return IndexProcess(fd.filename, cache)
+    return IndexThread(fd, cache)
+
+
+class FileIndexer(QtCore.QObject):
+    """Build the search indexes of open files in the background and
+    search them together.
+
+    At most `maxProcesses` worker processes run at a time, the other
+    files wait for their turn. All the jobs are stopped when the
+    application quits.
+
+    Signals
+    -------
+
+    sigIndexed(filename): the index of the file is ready.
+
+    sigFailed(filename, message): indexing the file failed.
+
+    """
+    sigIndexed = QtCore.pyqtSignal(str)
+    sigFailed = QtCore.pyqtSignal(str, str)
+
+    maxProcesses = os.cpu_count() or 1
+
+    def __init__(self, parent=None):
+        super(FileIndexer, self).__init__(parent)
+        self.indexes = {}    # filename -> SearchIndex
+        self.pending = {}    # filename -> job, in the order added
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(100)
+        self.timer.timeout.connect(self.poll)
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.stop)
+
+    def addFile(self, fd):
+        """Start indexing open file `fd`"""
+        self.removeFile(fd.filename)
+        self.pending[fd.filename] = indexJob(fd)
+        self.startJobs()
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def removeFile(self, filename):
+        """Drop the index of `filename` and stop building it. Call
+        before closing the file."""
+        self.indexes.pop(filename, None)
+        job = self.pending.pop(filename, None)
+        if job is not None:
+            job.cancel()
+
+    def stop(self):
+        """Stop all the jobs"""
+        self.timer.stop()
+        for job in self.pending.values():
+            job.cancel()
+        self.pending.clear()
+
+    def startJobs(self):
+        running = sum(1 for job in self.pending.values()
+                      if isinstance(job, IndexProcess) and job.started())
+        for job in self.pending.values():
+            if job.started():
+                continue
+            if isinstance(job, IndexProcess):
+                if running >= self.maxProcesses:
+                    continue
+                running += 1
+            job.start()
+
+    def poll(self):
+        for filename, job in list(self.pending.items()):
+            if not job.done():
+                continue
+            self.pending.pop(filename)
+            try:
+                index = job.result()
+            except Exception as e:
+                print('Could not index {}: {}'.format(filename, e))
+                self.sigFailed.emit(filename, str(e))
+                continue
+            if index is not None:
+                self.indexes[filename] = index
+                self.sigIndexed.emit(filename)
+        self.startJobs()
+        if len(self.pending) == 0:
+            self.timer.stop()
+
+    def indexing(self):
+        """Files whose index is not ready yet"""
+        return list(self.pending)
+
+    def search(self, query, limit=None):
+        """Matches of `query` (see parseQuery) in all the indexed
+        files, as a list of (filename, SearchIndex, object indices),
+        up to `limit` objects in all"""
+        terms = parseQuery(query)
+        ret = []
+        for filename, index in list(self.indexes.items()):
+            found = index.search(terms, limit)
+            if len(found) > 0:
+                ret.append((filename, index, found))
+            if limit is not None:
+                limit -= len(found)
+                if limit <= 0:
+                    break
+        return ret
+
+
+# 
+# searchindex.py ends here
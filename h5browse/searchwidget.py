@@ -0,0 +1,191 @@
+# searchwidget.py --- 
+# 
+# Filename: searchwidget.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 17:23:49 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 17:23:49 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Search box above the file tree. The query (see
+# searchindex.parseQuery) is run against the indexes of all the open
+# files as it is typed, and the matches listed below it. Activating a
+# match, or pressing Enter for the first one, selects its node in the
+# tree.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Search box for the nodes of the open files"""
+
+import os
+import time
+from qtcompat import (QtCore, QtGui)
+
+
+class SearchWidget(QtGui.QWidget):
+    """Search box with the list of matches for an HDFTreeWidget.
+
+    At most `maxResults` matches are listed. The search is run
+    `delay` ms after the last key press, and again when the index of
+    a file becomes ready.
+
+    """
+    maxResults = 1000
+    delay = 150
+
+    def __init__(self, tree, parent=None):
+        super(SearchWidget, self).__init__(parent)
+        self.tree = tree
+        self.indexer = tree.model().indexer
+        self.queryEdit = QtGui.QLineEdit()
+        self.queryEdit.setPlaceholderText('Search: name, glob*, /path/*, @attr=value, type:dataset')
+        self.queryEdit.setToolTip(
+            'text: name contains text (path if text has a /)\n'
+            'name*, a?c, x[0-9]: name matches the glob\n'
+            '/path/*, grp/*/name: path matches the glob\n'
+            '@attr: has the attribute\n'
+            '@attr=value, @attr!=value, @attr~text, @attr>number (also <, <=, >=)\n'
+            'type:group|dataset|datatype|link, dtype:float32, shape:100x3\n'
+            'All the terms must match.')
+        self.queryEdit.setClearButtonEnabled(True)
+        self.queryEdit.textChanged.connect(self.queryChanged)
+        self.queryEdit.returnPressed.connect(self.showFirst)
+        self.queryEdit.installEventFilter(self)
+        self.status = QtGui.QLabel()
+        self.results = QtGui.QListWidget()
+        self.results.itemActivated.connect(self.showItem)
+        self.results.itemClicked.connect(self.showItem)
+        self.results.hide()
+        self.status.hide()
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.delay)
+        self.timer.timeout.connect(self.search)
+        self.indexer.sigIndexed.connect(self.indexChanged)
+        self.indexer.sigFailed.connect(self.indexFailed)
+        layout = QtGui.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.queryEdit)
+        layout.addWidget(self.status)
+        layout.addWidget(self.results)
+        self.setLayout(layout)
+
+    def eventFilter(self, obj, event):
+        # Keep Enter from the main window's shortcut on it
+        if obj is self.queryEdit and event.type() == QtCore.QEvent.ShortcutOverride \
+           and event.key() in (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter):
+            event.accept()
+            return True
+        return super(SearchWidget, self).eventFilter(obj, event)
+
+    def focusSearch(self):
+        self.queryEdit.setFocus()
+        self.queryEdit.selectAll()
+
+    def queryChanged(self, text):
+        self.timer.start()
+
+    def indexChanged(self, filename):
+        if self.queryEdit.text().strip():
+            self.search()
+
+    def indexFailed(self, filename, message):
+        self.showStatus('Could not index {}: {}'.format(os.path.basename(filename),
+                                                         message))
+
+    def showStatus(self, message):
+        self.status.setText(message)
+        self.status.setVisible(len(message) > 0)
+
+    def search(self):
+        self.timer.stop()
+        self.results.clear()
+        query = self.queryEdit.text().strip()
+        if not query:
+            self.results.hide()
+            self.showStatus('')
+            return
+        start = time.perf_counter()
+        try:
+            matches = self.indexer.search(query, self.maxResults + 1)
+        except ValueError as e:
+            self.results.hide()
+            self.showStatus(str(e))
+            return
+        milliseconds = (time.perf_counter() - start) * 1e3
+        count = 0
+        several = len(self.indexer.indexes) > 1
+        for filename, index, found in matches:
+            for entry in found:
+                if count == self.maxResults:
+                    break
+                path = index.path(entry)
+                text = path
+                if several:
+                    text = '{}: {}'.format(os.path.basename(filename), path)
+                item = QtGui.QListWidgetItem(text)
+                item.setToolTip('{}\n{}'.format(filename, index.describe(entry)))
+                item.setData(QtCore.Qt.UserRole, (filename, path, index.rowPath(entry)))
+                self.results.addItem(item)
+                count += 1
+        if count == 0:
+            message = 'No match'
+        elif count == self.maxResults:
+            message = 'First {} matches'.format(count)
+        else:
+            message = '{} match(es)'.format(count)
+        message += ' in {:.1f} ms'.format(milliseconds)
+        indexing = self.indexer.indexing()
+        if len(indexing) > 0:
+            message += ', still indexing {}'.format(
+                ', '.join(os.path.basename(filename) for filename in indexing))
+        self.showStatus(message)
+        self.results.setVisible(count > 0)
+
+    def showFirst(self):
+        if self.timer.isActive():
+            self.search()
+        if self.results.count() > 0:
+            self.results.setCurrentRow(0)
+            self.showItem(self.results.item(0))
+
+    def showItem(self, item):
+        filename, path, rows = item.data(QtCore.Qt.UserRole)
+        if not self.tree.showNode(filename, path, rows):
+            self.showStatus('{} is no longer in {}'.format(path, os.path.basename(filename)))
+
+
+# 
+# searchwidget.py ends here
@@ -0,0 +1,184 @@
+# sidecar.py --- 
+# 
+# Filename: sidecar.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:08:00 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:08:00 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Overview data computed from large datasets (decimation pyramids,
+# statistics, histograms) require a full scan of the dataset. We
+# keep them on local disk between sessions, next to nothing in the
+# HDF5 file itself.
+#
+# Each entry is a directory of .npy files, named after a hash of
+# the file path, dataset path, modification time and size of the
+# file, kind of entry and the parameters used to compute it. If the
+# file changes, the old entries are simply not found anymore and
+# eventually get evicted. Arrays are loaded memory-mapped.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Persistent on-disk cache of dataset summaries"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+
+def defaultDirectory():
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'h5browse')
+
+
+class SidecarCache(object):
+    """Directory of cached arrays computed from HDF5 datasets.
+
+    directory: where the entries are stored.
+
+    maxBytes: disk budget. When exceeded after storing an entry, the
+    least recently used entries are removed.
+
+    """
+    def __init__(self, directory=None, maxBytes=1024*1024*1024):
+        super(SidecarCache, self).__init__()
+        if directory is None:
+            directory = defaultDirectory()
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+    def key(self, dataset, kind, **params):
+        """Return the key for entry `kind` of `dataset` computed with
+        `params`, None if the dataset is not backed by a file on disk"""
+        try:
+            path = os.path.abspath(dataset.file.filename)
+            stat = os.stat(path)
+        except (AttributeError, OSError):
+            return None
+        ident = json.dumps([path, dataset.name, stat.st_mtime_ns, stat.st_size,
+                            kind, sorted(params.items())], default=str)
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def load(self, dataset, kind, **params):
+        """Return dict of arrays (memory-mapped) stored for `dataset`,
+        `kind` and `params`, None if there is no such entry"""
+        key = self.key(dataset, kind, **params)
+        if key is None:
+            return None
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            arrays = {name[:-len('.npy')]: np.load(os.path.join(entry, name),
+                                                   mmap_mode='r')
+                      for name in os.listdir(entry) if name.endswith('.npy')}
+            os.utime(entry)   # mark as recently used
+        except (OSError, IOError, ValueError) as e:
+            print('Could not load cache entry {}: {}'.format(entry, e))
+            return None
+        return arrays
+
+    def store(self, dataset, kind, arrays, **params):
+        """Store dict of `arrays` for `dataset`, `kind` and `params`"""
+        key = self.key(dataset, kind, **params)
+        if key is None:
+            return False
+        entry = os.path.join(self.directory, key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmpdir = tempfile.mkdtemp(dir=self.directory, prefix='.tmp')
+            for name, array in arrays.items():
+                np.save(os.path.join(tmpdir, name + '.npy'), np.asarray(array))
+            with open(os.path.join(tmpdir, 'meta.json'), 'w') as fd:
+                json.dump({'file': dataset.file.filename, 'dataset': dataset.name,
+                           'kind': kind, 'params': params}, fd, default=str)
+            if os.path.exists(entry):
+                shutil.rmtree(tmpdir)
+            else:
+                os.rename(tmpdir, entry)
+        except (OSError, IOError) as e:
+            print('Could not store cache entry {}: {}'.format(entry, e))
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """Return list of (last used time, size, path) of the entries"""
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, fname))
+                       for fname in os.listdir(path))
+            result.append((os.path.getmtime(path), size, path))
+        return result
+
+    def evict(self, maxBytes=None):
+        """Remove least recently used entries until total size is
+        within `maxBytes` (default: self.maxBytes)"""
+        if maxBytes is None:
+            maxBytes = self.maxBytes
+        entries = sorted(self.entries())
+        total = sum(entry[1] for entry in entries)
+        for _, size, path in entries:
+            if total <= maxBytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        self.evict(0)
+
+
+_defaultCache = None
+
+def defaultCache():
+    """Sidecar cache shared by the application, created on first use"""
+    global _defaultCache
+    if _defaultCache is None:
+        _defaultCache = SidecarCache()
+    return _defaultCache
+
+
+# 
+# sidecar.py ends here
@@ -0,0 +1,311 @@
+# spikerate.py --- 
+# 
+# Filename: spikerate.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:20:54 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:20:54 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Spike rates from the spike trains under /spikes of a simulation
+# data file, by cell, by cell type, by layer or over all cells. This
+# is a port of compute_spiking_rate and dump_spike_rates in
+# c/connfinder.cpp and writes the same output.
+# 
+# Window i is centred at t_i = start + i * dt and a spike at time s
+# falls into it if t_i - binsize/2 < s <= t_i + binsize/2. Spikes
+# before `start` are ignored. The rate is the spike count divided by
+# binsize, and for groups of cells also by the number of cells in the
+# group.
+# 
+# Instead of scanning all spikes for every window, the windows
+# containing each spike are found with searchsorted on the window
+# bounds. A spike falls into a contiguous range of windows, so each
+# spike adds +1 at the first and -1 after the last window of its
+# group in a difference array, built for all spikes of all groups
+# with a single bincount. A cumulative sum then gives the counts.
+# 
+# The window centres are accumulated by repeated addition of dt as
+# in the C++ code, so that spikes on window boundaries are counted
+# the same way.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Spike rates of cells, cell types and layers from spike trains"""
+
+import sys
+import argparse
+import numpy as np
+import h5py as h5
+
+
+# Values of spikerate_mode_t in connfinder.cpp
+BY_TYPE, BY_LAYER, ALL, BY_CELL = range(4)
+
+modeNames = {BY_TYPE: 'by-celltype',
+             BY_LAYER: 'by-layer',
+             ALL: 'all',
+             BY_CELL: 'by-cell'}
+
+# The deep interneurons actually belong to L4 to L6. They are assigned
+# to L4 as it has only SpinyStellate cells, which may not be the
+# dominant type in overall spike rate. Thalamus is arbitrarily
+# assigned L7.
+layerMap = {'SupPyrRS': '3',
+            'SupPyrFRB': '3',
+            'SupBasket': '3',
+            'SupAxoaxonic': '3',
+            'SupLTS': '3',
+            'SpinyStellate': '4',
+            'TuftedIB': '5',
+            'TuftedRS': '5',
+            'NontuftedRS': '6',
+            'DeepBasket': '4',
+            'DeepAxoaxonic': '4',
+            'DeepLTS': '4',
+            'TCR': '7',
+            'nRT': '7'}
+layerMap.update({'ectopic_{}'.format(celltype): layer
+                 for celltype, layer in list(layerMap.items())})
+
+
+def cellType(cell):
+    """Cell type from cell name: the part before the last `_`"""
+    return cell.rpartition('_')[0] if '_' in cell else cell
+
+
+def simulationTime(fd):
+    """Simulation time from the /runconfig/scheduling table of open
+    file `fd`, None if it is not there"""
+    try:
+        table = fd['/runconfig/scheduling'][()]
+    except KeyError:
+        return None
+    for key, value in table:
+        if key.decode() == 'simtime':
+            return float(value)
+    return None
+
+
+def windowCount(tTotal, dt, start=0.0, end=-1.0):
+    """Number of windows as computed in connfinder.cpp"""
+    if end < 0:
+        end = tTotal
+    return max(0, int((end - start) / dt - 1))
+
+
+def accumulate(first, step, count):
+    """[first, first + step, first + step + step, ...] with `count`
+    entries, summed one step at a time like `t += dt` in a loop"""
+    steps = np.full(count, step, dtype=np.float64)
+    if count > 0:
+        steps[0] = first
+    return np.add.accumulate(steps)
+
+
+def windowTimes(count, binsize, dt, start=0.0):
+    """Time stamps written with the rates: the window centres shifted
+    by binsize/2, as in the output of connfinder.cpp"""
+    return accumulate(start + binsize / 2.0, dt, count)
+
+
+def spikeCounts(spikes, groups, numGroups, count, binsize=1.0, dt=1.0, start=0.0):
+    """Count spikes in each of `count` windows for each group.
+
+    spikes: 1D array of spike times of all cells.
+
+    groups: group index of each spike.
+
+    Returns a (numGroups, count) array.
+
+    """
+    centre = accumulate(start, dt, count)
+    lo = centre - binsize / 2.0
+    hi = centre + binsize / 2.0
+    valid = spikes >= start
+    spikes = spikes[valid]
+    groups = np.asarray(groups)[valid]
+    # First window with hi >= s and last window with lo < s. Window
+    # bounds increase with the index, so these delimit the windows
+    # containing s.
+    first = np.searchsorted(hi, spikes, side='left')
+    last = np.searchsorted(lo, spikes, side='left')
+    inside = first < last
+    offset = groups[inside] * (count + 1)
+    delta = np.bincount(offset + first[inside], minlength=numGroups * (count + 1))
+    delta -= np.bincount(offset + last[inside], minlength=numGroups * (count + 1))
+    counts = np.cumsum(delta.reshape(numGroups, count + 1), axis=1)
+    return counts[:, :count].astype(np.float64)
+
+
+def groupName(cell, mode, layers=None):
+    """Name of the group `cell` belongs to in `mode`, None if it
+    cannot be assigned to one"""
+    if mode == BY_CELL:
+        return cell
+    if mode == ALL:
+        return 'all'
+    celltype = cellType(cell)
+    if mode == BY_TYPE:
+        return celltype
+    if layers is None:
+        layers = layerMap
+    return layers.get(celltype)
+
+
+def readSpikes(group, names=None):
+    """Read the spike trains in `group`, all datasets in it if `names`
+    is None. Returns the names, the concatenated spike times and the
+    number of spikes of each train."""
+    if names is None:
+        names = [name for name, node in group.items()
+                 if isinstance(node, h5.Dataset)]
+    trains = [np.asarray(group[name][()], dtype=np.float64).ravel()
+              for name in names]
+    lengths = np.array([len(train) for train in trains], dtype=np.int64)
+    if len(trains) == 0:
+        return names, np.zeros(0), lengths
+    return names, np.concatenate(trains), lengths
+
+
+def spikeRates(spikeGroup, tTotal, binsize=1.0, dt=1.0, start=0.0, end=-1.0,
+               mode=BY_TYPE, layers=None):
+    """Compute spike rates from the datasets in `spikeGroup`.
+
+    Returns a dict mapping group name (cell, cell type, layer or
+    'all', depending on `mode`) to an array of rates in successive
+    windows. Rates of groups are averaged over the cells in the
+    group.
+
+    """
+    if mode not in modeNames:
+        raise ValueError('Unknown mode {}'.format(mode))
+    names, spikes, lengths = readSpikes(spikeGroup)
+    groupNames = []
+    groupIndex = {}
+    cellGroup = np.empty(len(names), dtype=np.int64)
+    keep = np.ones(len(names), dtype=bool)
+    for ii, cell in enumerate(names):
+        group = groupName(cell, mode, layers)
+        if group is None:
+            print('No layer for cell type of {}, skipping it'.format(cell))
+            keep[ii] = False
+            cellGroup[ii] = 0
+            continue
+        if group not in groupIndex:
+            groupIndex[group] = len(groupNames)
+            groupNames.append(group)
+        cellGroup[ii] = groupIndex[group]
+    spikeGroups = np.repeat(cellGroup, lengths)
+    selected = np.repeat(keep, lengths)
+    count = windowCount(tTotal, dt, start, end)
+    counts = spikeCounts(spikes[selected], spikeGroups[selected],
+                         len(groupNames), count, binsize, dt, start)
+    rates = counts / binsize
+    if mode != BY_CELL:
+        cells = np.bincount(cellGroup[keep], minlength=len(groupNames))
+        rates /= cells[:, np.newaxis]
+    return {group: rates[ii] for ii, group in enumerate(groupNames)}
+
+
+def dumpSpikeRates(infile, outfile, binsize=1.0, dt=1.0, start=0.0, end=-1.0,
+                   mode=BY_TYPE, group='spikerate'):
+    """Compute spike rates from the data in `infile` and save them in
+    `group` of `outfile`.
+
+    Each rate is saved as an N x 2 dataset of (time, rate) rows.
+    Attributes binsize, dt and datasource are set on the root of
+    `outfile`. `infile` and `outfile` can be file names or open h5py
+    Files.
+
+    """
+    fd = h5.File(infile, 'r') if isinstance(infile, str) else infile
+    out = h5.File(outfile, 'w-') if isinstance(outfile, str) else outfile
+    try:
+        tTotal = simulationTime(fd)
+        if tTotal is None:
+            raise ValueError('Could not obtain simulation time from {}'.format(
+                fd.filename))
+        rates = spikeRates(fd['/spikes'], tTotal, binsize, dt, start, end, mode)
+        rateGroup = out.require_group(group)
+        for name in sorted(rates):
+            rate = rates[name]
+            data = np.column_stack((windowTimes(len(rate), binsize, dt, start), rate))
+            rateGroup.create_dataset(name, data=data)
+        out.attrs['binsize'] = float(binsize)
+        out.attrs['dt'] = float(dt)
+        out.attrs['datasource'] = fd.filename
+    finally:
+        if out is not outfile:
+            out.close()
+        if fd is not infile:
+            fd.close()
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compute spike rates from spike trains in a simulation data file')
+    parser.add_argument('-i', dest='infile', required=True, help='input file')
+    parser.add_argument('-o', dest='outfile', required=True,
+                        help='output file, must not exist')
+    parser.add_argument('-b', dest='binsize', type=float, default=1.0,
+                        help='window size in seconds')
+    parser.add_argument('-d', dest='dt', type=float, default=100e-3,
+                        help='interval between successive windows')
+    parser.add_argument('-s', dest='start', type=float, default=0.0,
+                        help='ignore spikes before this time')
+    parser.add_argument('-e', dest='end', type=float, default=-1.0,
+                        help='end time, simulation time if negative')
+    parser.add_argument('-m', dest='mode', type=int, default=BY_TYPE,
+                        choices=sorted(modeNames),
+                        help=', '.join('{}: {}'.format(value, name)
+                                       for value, name in sorted(modeNames.items())))
+    args = parser.parse_args(argv)
+    try:
+        dumpSpikeRates(args.infile, args.outfile, args.binsize, args.dt,
+                       args.start, args.end, args.mode)
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# spikerate.py ends here
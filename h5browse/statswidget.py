@@ -0,0 +1,316 @@
+# statswidget.py --- 
+# 
+# Filename: statswidget.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:15:50 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:15:50 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# GUI for datasetstats: running the computation in the background
+# with progress and cancel, and showing the results.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Widget computing and displaying dataset statistics"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import h5py as h5
+import pyqtgraph as pg
+from pyqtgraph import (QtCore, QtGui)
+
+import datasetstats
+
+
+_processPool = None
+_threadPool = None
+
+def executorFor(dataset):
+    """Return the executor to compute statistics of `dataset` on.
+
+    Worker processes open the file on their own, which HDF5 file
+    locking only permits if we have it open read-only. Files open for
+    writing (or being followed in SWMR mode) are processed on a
+    thread in this process instead.
+
+    """
+    global _processPool, _threadPool
+    if dataset.file.id.get_intent() == h5.h5f.ACC_RDONLY \
+       and dataset.file.driver in ('sec2', 'stdio'):
+        if _processPool is None:
+            # Do not fork a process with Qt and HDF5 state
+            _processPool = ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context('spawn'))
+        return _processPool
+    if _threadPool is None:
+        _threadPool = ThreadPoolExecutor(1)
+    return _threadPool
+
+
+class StatsJob(QtCore.QObject):
+    """Compute statistics of a dataset on an executor.
+
+    Each pass submits one task per slab (see datasetstats.slabs) and
+    the partial results are merged in the GUI thread as the tasks
+    finish. Results are stored in the sidecar cache and taken from
+    there if available.
+
+    Signals
+    -------
+
+    sigProgress(done, total): number of slabs processed so far and
+    total number of slabs in both passes.
+
+    sigFinished(stats): the result, as of
+    datasetstats.datasetStatistics.
+
+    sigFailed(message): a task raised an exception.
+
+    """
+    sigProgress = QtCore.pyqtSignal(int, int)
+    sigFinished = QtCore.pyqtSignal(object)
+    sigFailed = QtCore.pyqtSignal(str)
+
+    def __init__(self, dataset, axis=None, bins=64, executor=None, parent=None):
+        super(StatsJob, self).__init__(parent)
+        self.dataset = dataset
+        self.axis = axis
+        self.bins = bins
+        if executor is None:
+            executor = executorFor(dataset)
+        self.executor = executor
+        self.fields = datasetstats.numericFields(dataset.dtype)
+        self.selections = datasetstats.slabs(dataset.shape, dataset.chunks,
+                                             dataset.dtype.itemsize)
+        self.totals = None
+        self.edges = None
+        self.futures = []
+        self.done = 0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(50)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        stats = datasetstats.cachedStatistics(self.dataset, self.axis, self.bins)
+        if stats is not None:
+            QtCore.QTimer.singleShot(0, lambda: self.sigFinished.emit(stats))
+            return
+        groups = datasetstats.groupCount(self.dataset.shape, self.axis)
+        self.totals = {field: datasetstats.emptyAggregate(groups, self.bins)
+                       for field in self.fields}
+        self.done = 0
+        self.submitPass(None)
+        self.timer.start()
+
+    def submitPass(self, edges):
+        self.edges = edges
+        if isinstance(self.executor, ProcessPoolExecutor):
+            args = (datasetstats.computeSlab, self.dataset.file.filename,
+                    self.dataset.name)
+        else:
+            args = (datasetstats.slabPartials, self.dataset)
+        self.futures = [(selection, self.executor.submit(
+            *(args + (selection, self.fields, self.axis, edges))))
+                        for selection in self.selections]
+
+    def poll(self):
+        pending = []
+        for selection, future in self.futures:
+            if not future.done():
+                pending.append((selection, future))
+                continue
+            try:
+                part = future.result()
+            except Exception as e:
+                print(e)
+                self.cancel()
+                self.sigFailed.emit(str(e))
+                return
+            for field in self.fields:
+                datasetstats.merge(self.totals[field], part[field],
+                                   datasetstats.groupSlice(selection, self.axis))
+            self.done += 1
+        self.futures = pending
+        self.sigProgress.emit(self.done, 2 * len(self.selections))
+        if len(pending) > 0:
+            return
+        if self.edges is None:
+            self.submitPass({field: datasetstats.histogramEdges(self.totals[field],
+                                                               self.bins)
+                             for field in self.fields})
+            return
+        self.timer.stop()
+        stats = {field: datasetstats.finalize(self.totals[field], self.edges[field])
+                 for field in self.fields}
+        datasetstats.storeStatistics(self.dataset, stats, self.axis, self.bins)
+        self.sigFinished.emit(stats)
+
+    def cancel(self):
+        """Drop the tasks not started yet. Running ones are left to
+        finish and their results ignored."""
+        self.timer.stop()
+        for _, future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    def isRunning(self):
+        return self.timer.isActive()
+
+
+class DatasetStatsWidget(QtGui.QWidget):
+    """Widget showing statistics of the numeric fields of a dataset,
+    either for the whole dataset or for each index along a chosen
+    dimension, with the histogram of the selected row.
+
+    Signals
+    -------
+
+    sigStatsComputed(dataset): emitted when the statistics are
+    available (and stored in the sidecar cache).
+
+    """
+    sigStatsComputed = QtCore.pyqtSignal(object)
+    columns = ['count', 'nan', 'inf', 'min', 'max', 'mean', 'std']
+    bins = 64
+
+    def __init__(self, parent=None, dataset=None):
+        super(DatasetStatsWidget, self).__init__(parent)
+        self.name = ''
+        self.dataset = None
+        self.job = None
+        self.stats = None
+        self.rows = []      # (field, group) for each table row
+        self.axisCombo = QtGui.QComboBox()
+        self.axisCombo.activated.connect(self.compute)
+        self.progress = QtGui.QProgressBar()
+        self.cancelButton = QtGui.QPushButton('Cancel')
+        self.cancelButton.clicked.connect(self.cancel)
+        self.table = QtGui.QTableWidget()
+        self.table.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+        self.table.itemSelectionChanged.connect(self.showHistogram)
+        self.histogram = pg.PlotWidget()
+        controls = QtGui.QHBoxLayout()
+        controls.addWidget(QtGui.QLabel('Statistics of'))
+        controls.addWidget(self.axisCombo)
+        controls.addWidget(self.progress)
+        controls.addWidget(self.cancelButton)
+        layout = QtGui.QVBoxLayout()
+        layout.addLayout(controls)
+        splitter = QtGui.QSplitter(QtCore.Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.histogram)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+        if dataset is not None:
+            self.setDataset(dataset)
+
+    def setDataset(self, dataset):
+        self.dataset = dataset
+        self.name = '{}:{} statistics'.format(dataset.file.filename,
+                                              dataset.name)
+        self.axisCombo.clear()
+        self.axisCombo.addItem('whole dataset', None)
+        for axis, size in enumerate(dataset.shape):
+            # Each index has its own histogram
+            if size <= datasetstats.maxGroups:
+                self.axisCombo.addItem('each index along dimension {}'.format(axis), axis)
+        self.compute()
+
+    def compute(self, *args):
+        self.cancel()
+        self.job = StatsJob(self.dataset, axis=self.axisCombo.currentData(),
+                            bins=self.bins, parent=self)
+        self.job.sigProgress.connect(self.showProgress)
+        self.job.sigFinished.connect(self.setStats)
+        self.job.sigFailed.connect(self.showFailure)
+        self.progress.setValue(0)
+        self.progress.setFormat('%p%')
+        self.cancelButton.setEnabled(True)
+        self.job.start()
+
+    def cancel(self):
+        if self.job is not None and self.job.isRunning():
+            self.job.cancel()
+            self.progress.setFormat('Cancelled')
+        self.cancelButton.setEnabled(False)
+
+    def showProgress(self, done, total):
+        self.progress.setMaximum(total)
+        self.progress.setValue(done)
+
+    def showFailure(self, message):
+        self.progress.setFormat('Failed: {}'.format(message))
+        self.cancelButton.setEnabled(False)
+
+    def setStats(self, stats):
+        self.stats = stats
+        self.cancelButton.setEnabled(False)
+        self.progress.setMaximum(1)
+        self.progress.setValue(1)
+        self.rows = [(field, group) for field in stats
+                     for group in range(len(stats[field]['count']))]
+        self.table.clear()
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setRowCount(len(self.rows))
+        labels = []
+        for row, (field, group) in enumerate(self.rows):
+            label = field
+            if self.axisCombo.currentData() is not None:
+                label = '{}[{}]'.format(field, group)
+            labels.append(label)
+            for column, key in enumerate(self.columns):
+                item = QtGui.QTableWidgetItem('{:g}'.format(stats[field][key][group]))
+                self.table.setItem(row, column, item)
+        self.table.setVerticalHeaderLabels(labels)
+        if len(self.rows) > 0:
+            self.table.selectRow(0)
+        self.sigStatsComputed.emit(self.dataset)
+
+    def showHistogram(self):
+        self.histogram.clear()
+        rows = self.table.selectionModel().selectedRows()
+        if self.stats is None or len(rows) == 0:
+            return
+        field, group = self.rows[rows[0].row()]
+        values = self.stats[field]
+        self.histogram.plot(values['edges'], values['hist'][group],
+                            stepMode='center', fillLevel=0, brush=(0, 0, 255, 80))
+
+
+# 
+# statswidget.py ends here
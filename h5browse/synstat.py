@@ -0,0 +1,362 @@
+# synstat.py --- 
+# 
+# Filename: synstat.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:27:05 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:27:05 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# Statistics of the synapses in a network model: total Gbar of each
+# synapse type on each cell, and mean and standard deviation of those
+# over the cells of each cell type. This is a port of c/synstat.cpp.
+# 
+# The synapse table (/network/synapse, with fields src, dest, type,
+# Gbar, ...) is read in slabs of whole chunks, and only the fields
+# needed. In each slab the compartment paths in `dest` and the
+# synapse types are factorized into integer codes (see factorize), so
+# that only the distinct values are converted to cell names in
+# Python. The per-synapse codes then go into a bincount weighted by
+# Gbar. The slabs can be processed on a pool of worker processes,
+# their totals are merged by cell name.
+# 
+# As in synstat.cpp the cell is the part of `dest` before the last
+# `/` and the cell type the part of the cell name before the first
+# `_`. Cell types and synapse types are taken from the data instead
+# of a fixed list. The statistics of a synapse type for a cell type
+# are over the cells that have synapses of that type.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Total synaptic conductance by cell and cell type"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import h5py as h5
+
+import datasetstats
+
+
+fields = ['dest', 'type', 'Gbar']
+
+# Synapse types are listed in this order, others after them
+typeOrder = ['ampa', 'nmda', 'gaba']
+
+
+def isSynapseTable(node):
+    """True if `node` is a dataset with the fields of a synapse table"""
+    return isinstance(node, h5.Dataset) and node.dtype.names is not None \
+        and all(field in node.dtype.names for field in fields)
+
+
+def cellName(path):
+    """Cell from the path of a compartment"""
+    return path.rpartition('/')[0]
+
+
+def cellType(cell):
+    return cell.partition('_')[0]
+
+
+def cellSortKey(cell):
+    """Order of cells in synstat.cpp: by cell type, then by number"""
+    celltype, _, number = cell.partition('_')
+    digits = ''
+    for char in number:
+        if not char.isdigit():
+            break
+        digits += char
+    return (celltype, int(digits) if digits else 0, cell)
+
+
+def typeSortKey(synType):
+    if synType in typeOrder:
+        return (typeOrder.index(synType), synType)
+    return (len(typeOrder), synType)
+
+
+def decode(value):
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def codes(values, index, names, convert):
+    """Integer codes of `values` in `index` (dict mapping name to code),
+    appending names not seen before to `names`"""
+    ret = np.empty(len(values), dtype=np.int64)
+    for ii, value in enumerate(values):
+        name = convert(decode(value))
+        code = index.get(name)
+        if code is None:
+            code = index[name] = len(names)
+            names.append(name)
+        ret[ii] = code
+    return ret
+
+
+def factorize(values):
+    """Distinct entries of the byte string array `values` and the index
+    of each entry in them, like np.unique(values, return_inverse=True)
+    but without the order.
+
+    Sorting strings is slow, so the strings are hashed into 64 bit
+    integers, which are sorted instead. Should two strings hash to the
+    same integer we fall back to np.unique.
+
+    """
+    values = np.ascontiguousarray(values)
+    size = values.dtype.itemsize
+    if size in (1, 2, 4, 8):
+        keys = values.view('u{}'.format(size))
+    else:
+        words = -(-size // 8)
+        raw = np.zeros((len(values), words * 8), dtype=np.uint8)
+        raw[:, :size] = values.view(np.uint8).reshape(len(values), size)
+        raw = raw.view(np.uint64)
+        keys = np.zeros(len(values), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for ii in range(words):
+                keys = (keys ^ raw[:, ii]) * np.uint64(0x9E3779B97F4A7C15)
+                keys ^= keys >> np.uint64(29)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    uniques = values[first]
+    if size > 8 and not np.array_equal(uniques[inverse], values):
+        return np.unique(values, return_inverse=True)
+    return uniques, inverse.ravel()
+
+
+def slabStatistics(dataset, selection):
+    """Total Gbar and synapse count by cell and synapse type over the
+    rows `selection` of synapse table `dataset`. Cells and synapse
+    types are in the order of first appearance."""
+    data = dataset.fields(fields)[selection]
+    paths, pathCode = factorize(data['dest'])
+    # There are many compartments per cell, cut the paths in numpy
+    # before going to Python strings
+    cellPaths, cellCode = factorize(np.char.rpartition(paths, b'/')[:, 0])
+    kinds, typeCode = factorize(data['type'])
+    cells = [decode(cell) for cell in cellPaths]
+    types = [decode(kind) for kind in kinds]
+    cellCode = cellCode[pathCode]
+    shape = (len(cells), len(types))
+    index = cellCode * shape[1] + typeCode
+    size = shape[0] * shape[1]
+    return {'cells': cells,
+            'types': types,
+            'gbar': np.bincount(index, weights=data['Gbar'],
+                                minlength=size).reshape(shape),
+            'count': np.bincount(index, minlength=size).reshape(shape)}
+
+
+def computeSlab(filename, name, selection):
+    """Worker process entry point: `slabStatistics` for dataset `name`
+    in `filename`"""
+    with h5.File(filename, 'r') as fd:
+        return slabStatistics(fd[name], selection)
+
+
+def emptyStatistics():
+    """Identity element for `merge`"""
+    return {'cells': [], 'types': [], 'cellIndex': {}, 'typeIndex': {},
+            'gbar': np.zeros((0, 0)), 'count': np.zeros((0, 0), dtype=np.int64)}
+
+
+def merge(total, part):
+    """Add the result of `slabStatistics` to `total` in place"""
+    cellCode = codes(part['cells'], total['cellIndex'], total['cells'], str)
+    typeCode = codes(part['types'], total['typeIndex'], total['types'], str)
+    shape = (len(total['cells']), len(total['types']))
+    for key in ('gbar', 'count'):
+        array = total[key]
+        if array.shape != shape:
+            array = np.pad(array, [(0, new - old) for old, new
+                                   in zip(array.shape, shape)])
+        array[np.ix_(cellCode, typeCode)] += part[key]
+        total[key] = array
+    return total
+
+
+def finalize(total):
+    """Sort cells and synapse types of a merged result"""
+    cells, types = total['cells'], total['types']
+    cellOrder = sorted(range(len(cells)), key=lambda ii: cellSortKey(cells[ii]))
+    typeOrder = sorted(range(len(types)), key=lambda ii: typeSortKey(types[ii]))
+    return {'cells': [cells[ii] for ii in cellOrder],
+            'types': [types[ii] for ii in typeOrder],
+            'gbar': total['gbar'][cellOrder][:, typeOrder],
+            'count': total['count'][cellOrder][:, typeOrder]}
+
+
+def synapseStatistics(dataset, executor=None, progress=None, cancelled=None):
+    """Compute total Gbar of each synapse type on each cell from the
+    synapse table `dataset`.
+
+    executor: a concurrent.futures executor to process the slabs on.
+    If None, they are processed in this process.
+
+    progress: callable taking (rows done, total rows).
+
+    cancelled: callable returning True if the computation should be
+    abandoned, in which case None is returned.
+
+    Returns a dict with the keys:
+
+    cells: names of the cells, in the order of synstat.cpp.
+
+    types: synapse types.
+
+    gbar: cells x types array of total Gbar.
+
+    count: cells x types array of number of synapses.
+
+    """
+    selections = datasetstats.slabs(dataset.shape, dataset.chunks,
+                                    dataset.dtype.itemsize)
+    if executor is None:
+        parts = (slabStatistics(dataset, selection) for selection in selections)
+    else:
+        parts = executor.map(computeSlab, [dataset.file.filename] * len(selections),
+                             [dataset.name] * len(selections), selections)
+    total = emptyStatistics()
+    done = 0
+    for selection, part in zip(selections, parts):
+        if cancelled is not None and cancelled():
+            return None
+        merge(total, part)
+        done += selection[0].stop - selection[0].start
+        if progress is not None:
+            progress(done, dataset.shape[0])
+    return finalize(total)
+
+
+def cellTypeStatistics(stats, absent=False):
+    """Mean and standard deviation over the cells of each cell type of
+    the total Gbar from `synapseStatistics`.
+
+    As in celltype_syn_stat of synstat.cpp, the statistics of a
+    synapse type are over the cells that have synapses of that type.
+    With `absent` True the other cells of the cell type count as 0,
+    which is what the synstat.cpp program prints: writing the totals
+    by cell adds them as 0 to its maps before the statistics.
+
+    Returns a dict with the keys celltypes, cellcount (number of cells
+    of each type), typecount (number of cells averaged over) and mean
+    and std (the last two celltypes x synapse types).
+
+    """
+    celltypes = []
+    typeIndex = {}
+    cellCode = codes(stats['cells'], typeIndex, celltypes, cellType)
+    cellcount = np.bincount(cellCode, minlength=len(celltypes))
+    gbar = stats['gbar']
+    present = np.ones(gbar.shape) if absent else (stats['count'] > 0).astype(float)
+    shape = (len(celltypes), gbar.shape[1])
+    typecount = np.zeros(shape, dtype=int)
+    mean = np.zeros(shape)
+    square = np.zeros(shape)
+    for column in range(gbar.shape[1]):
+        typecount[:, column] = np.bincount(cellCode, weights=present[:, column],
+                                           minlength=len(celltypes))
+        mean[:, column] = np.bincount(cellCode, weights=gbar[:, column] * present[:, column],
+                                      minlength=len(celltypes))
+    mean /= np.maximum(typecount, 1)
+    deviation = (gbar - mean[cellCode]) * present
+    for column in range(gbar.shape[1]):
+        square[:, column] = np.bincount(cellCode, weights=deviation[:, column] ** 2,
+                                        minlength=len(celltypes))
+    std = np.sqrt(square / np.maximum(typecount, 1))
+    return {'celltypes': celltypes,
+            'cellcount': cellcount,
+            'typecount': typecount,
+            'mean': mean,
+            'std': std}
+
+
+def writeReport(stats, out, absent=False):
+    """Write `stats` as text in the format of synstat.cpp to file
+    object `out`: a line with the total Gbar of each synapse type for
+    each cell, then mean and standard deviation by cell type (see
+    cellTypeStatistics for `absent`)."""
+    for cell, row in zip(stats['cells'], stats['gbar']):
+        out.write(', '.join([cell] + ['{:g}'.format(value) for value in row]) + '\n')
+    out.write('###############################\n')
+    typeStats = cellTypeStatistics(stats, absent)
+    for ii, celltype in enumerate(typeStats['celltypes']):
+        out.write('{}\n------------------\n'.format(celltype))
+        for jj, synType in enumerate(stats['types']):
+            out.write('{}\t{:g}\t{:g}\n'.format(synType, typeStats['mean'][ii, jj],
+                                                typeStats['std'][ii, jj]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Statistics of synaptic conductances in a network model')
+    parser.add_argument('infile', help='input file')
+    parser.add_argument('outfile', help='output text file')
+    parser.add_argument('-d', dest='dataset', default='/network/synapse',
+                        help='path of the synapse table')
+    parser.add_argument('-j', dest='jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('--absent', action='store_true',
+                        help='count cells without synapses of a type as 0 in'
+                        ' its statistics, as the synstat.cpp program does')
+    args = parser.parse_args(argv)
+    executor = None
+    if args.jobs > 1:
+        executor = ProcessPoolExecutor(args.jobs,
+                                       mp_context=multiprocessing.get_context('spawn'))
+    try:
+        with h5.File(args.infile, 'r') as fd:
+            stats = synapseStatistics(fd[args.dataset], executor)
+        with open(args.outfile, 'w') as out:
+            writeReport(stats, out, args.absent)
+    except (IOError, OSError, KeyError, ValueError) as e:
+        print(e)
+        return 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# 
+# synstat.py ends here
@@ -0,0 +1,189 @@
+# synstatwidget.py --- 
+# 
+# Filename: synstatwidget.py
+# Description: 
+# Author: Subhasis Ray
+# Maintainer: 
+# Created: Sun Oct 18 16:27:05 2026 (-0400)
+# Version: 
+# Package-Requires: ()
+# Last-Updated: Sun Oct 18 16:27:05 2026 (-0400)
+#           By: Subhasis Ray
+#     Update #: 0
+# URL: 
+# Doc URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# GUI for synstat: computing synapse statistics of a synapse table in
+# the background and showing them by cell type and by cell.
+# 
+
+# Change Log: 
+# 
+# 
+# 
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with GNU Emacs.  If not, see <http://www.gnu.org/licenses/>.
+# 
+# 
+
+# Code:
+"""Widget showing synapse statistics of a synapse table"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pyqtgraph import (QtCore, QtGui)
+
+import datasetstats
+import synstat
+from statswidget import executorFor
+
+
+class SynapseStatsWidget(QtGui.QWidget):
+    """Widget showing total Gbar of each synapse type by cell, and
+    its mean and standard deviation by cell type.
+
+    The slabs of the table are processed on the executor of
+    statswidget.executorFor and merged in the GUI thread as they
+    finish.
+
+    """
+    def __init__(self, parent=None, dataset=None):
+        super(SynapseStatsWidget, self).__init__(parent)
+        self.name = ''
+        self.dataset = None
+        self.stats = None
+        self.futures = []
+        self.total = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(50)
+        self.timer.timeout.connect(self.poll)
+        self.progress = QtGui.QProgressBar()
+        self.cancelButton = QtGui.QPushButton('Cancel')
+        self.cancelButton.clicked.connect(self.cancel)
+        self.celltypeTable = QtGui.QTableWidget()
+        self.cellTable = QtGui.QTableWidget()
+        for table in (self.celltypeTable, self.cellTable):
+            table.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
+            table.setSortingEnabled(True)
+        self.tabs = QtGui.QTabWidget()
+        self.tabs.addTab(self.celltypeTable, 'By cell type')
+        self.tabs.addTab(self.cellTable, 'By cell')
+        controls = QtGui.QHBoxLayout()
+        controls.addWidget(self.progress)
+        controls.addWidget(self.cancelButton)
+        layout = QtGui.QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.tabs)
+        self.setLayout(layout)
+        if dataset is not None:
+            self.setDataset(dataset)
+
+    def setDataset(self, dataset):
+        self.dataset = dataset
+        self.name = '{}:{} synapse statistics'.format(dataset.file.filename,
+                                                      dataset.name)
+        self.compute()
+
+    def compute(self):
+        self.cancel()
+        executor = executorFor(self.dataset)
+        selections = datasetstats.slabs(self.dataset.shape, self.dataset.chunks,
+                                        self.dataset.dtype.itemsize)
+        if isinstance(executor, ProcessPoolExecutor):
+            args = (synstat.computeSlab, self.dataset.file.filename, self.dataset.name)
+        else:
+            args = (synstat.slabStatistics, self.dataset)
+        self.futures = [executor.submit(*(args + (selection,)))
+                        for selection in selections]
+        self.total = synstat.emptyStatistics()
+        self.progress.setMaximum(max(len(self.futures), 1))
+        self.progress.setValue(0)
+        self.progress.setFormat('%p%')
+        self.cancelButton.setEnabled(True)
+        self.timer.start()
+
+    def poll(self):
+        pending = []
+        for future in self.futures:
+            if not future.done():
+                pending.append(future)
+                continue
+            try:
+                synstat.merge(self.total, future.result())
+            except Exception as e:
+                print(e)
+                self.cancel()
+                self.progress.setFormat('Failed: {}'.format(e))
+                return
+            self.progress.setValue(self.progress.value() + 1)
+        self.futures = pending
+        if len(pending) == 0:
+            self.timer.stop()
+            self.cancelButton.setEnabled(False)
+            self.setStats(synstat.finalize(self.total))
+
+    def cancel(self):
+        """Drop the slabs not processed yet"""
+        if self.timer.isActive():
+            self.timer.stop()
+            self.progress.setFormat('Cancelled')
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.cancelButton.setEnabled(False)
+
+    def fillTable(self, table, labels, columns, rows):
+        table.setSortingEnabled(False)
+        table.clear()
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setRowCount(len(labels))
+        for ii, (label, values) in enumerate(zip(labels, rows)):
+            table.setItem(ii, 0, QtGui.QTableWidgetItem(label))
+            for jj, value in enumerate(values):
+                item = QtGui.QTableWidgetItem()
+                item.setData(QtCore.Qt.DisplayRole, float(value))
+                table.setItem(ii, jj + 1, item)
+        table.setSortingEnabled(True)
+
+    def setStats(self, stats):
+        self.stats = stats
+        types = stats['types']
+        typeStats = synstat.cellTypeStatistics(stats)
+        columns = ['cell type', 'cells']
+        for synType in types:
+            columns += ['{} cells'.format(synType), '{} mean'.format(synType),
+                        '{} std'.format(synType)]
+        rows = []
+        for ii in range(len(typeStats['celltypes'])):
+            row = [typeStats['cellcount'][ii]]
+            for jj in range(len(types)):
+                row += [typeStats['typecount'][ii, jj], typeStats['mean'][ii, jj],
+                        typeStats['std'][ii, jj]]
+            rows.append(row)
+        self.fillTable(self.celltypeTable, typeStats['celltypes'], columns, rows)
+        columns = ['cell'] + ['{} Gbar'.format(synType) for synType in types] \
+                  + ['{} count'.format(synType) for synType in types]
+        rows = [list(gbar) + list(count) for gbar, count
+                in zip(stats['gbar'], stats['count'])]
+        self.fillTable(self.cellTable, stats['cells'], columns, rows)
+
+
+# 
+# synstatwidget.py ends here
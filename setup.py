@@ -46,7 +46,7 @@ Python2.7.
       author_email='lastname dot firstname at gmail dot com',
       url='',
       license='GPL',
-      packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
+      packages=find_packages(exclude=['ez_setup', 'examples', 'tests', 'benchmarks']),
       include_package_data=True,
       zip_safe=False,
       install_requires=[
@@ -57,7 +57,15 @@ Python2.7.
       ],
       entry_points={
           'gui_scripts': [
-              'h5browse=h5browse.h5browse:main',
+              'h5browse=h5browse.scripts:browse',
+          ],
+          'console_scripts': [
+              'h5spikerate=h5browse.scripts:spikerate',
+              'h5crosscorr=h5browse.scripts:crosscorr',
+              'h5synstat=h5browse.scripts:synstat',
+              'h5import=h5browse.scripts:importData',
+              'h5repackds=h5browse.scripts:repack',
+              'h5export=h5browse.scripts:export',
           ]
       },
       )